@@ -8,14 +8,1729 @@ bl_info = {
     "category": "Render",
 }
 
-import bpy
 import os
 import platform
 import re
 import subprocess
 import shlex
-from bpy.props import (StringProperty, IntProperty, PointerProperty, 
-                      CollectionProperty, IntProperty, BoolProperty)
+import sys
+import threading
+import time
+
+try:
+    import bpy
+    from bpy.props import (StringProperty, IntProperty, PointerProperty, 
+                          CollectionProperty, IntProperty, BoolProperty, EnumProperty)
+    from bpy.app.handlers import persistent
+except ImportError:
+    # Blenderの外（通常のPython）から実行された場合はスタンドアロンのランナーとして動作する
+    bpy = None
+
+# このスクリプト自身の絶対パス（CLIコマンドの -P に渡す）
+SCRIPT_PATH = os.path.realpath(__file__)
+
+# ---------------------------------------------------------------------------
+# CLIレンダリングジョブの並列実行
+# bpyに依存しないため、Blenderの外からスタンドアロンのスクリプトとしても使用できる
+# ---------------------------------------------------------------------------
+
+def make_render_job(name, blend_filepath, profile_index, camera_name="", output_path=None,
+                    start_frame=None, end_frame=None, blender_path="blender", extra_args=()):
+    """render_from_cliで1プロファイルをレンダリングするジョブを作成する
+
+    extra_argsは「--」以降に渡すrender_from_cliのオプション（--resumeなど）。
+    """
+    return {
+        "name": name,
+        "blender": blender_path,
+        "blend": blend_filepath,
+        "profile_index": profile_index,
+        "camera": camera_name,
+        "output_path": output_path,
+        "start": start_frame,
+        "end": end_frame,
+        "extra_args": list(extra_args),
+    }
+
+def split_frame_range(start, end, chunk_size=0, chunk_count=0):
+    """フレーム範囲を固定サイズ（chunk_size）またはN等分（chunk_count）のチャンクに分割する
+
+    [(start, end), ...] を返す。どちらも0の場合は範囲全体を1チャンクとする。
+    """
+    total = end - start + 1
+    if total <= 0:
+        return []
+    if chunk_size > 0:
+        return [(s, min(s + chunk_size - 1, end)) for s in range(start, end + 1, chunk_size)]
+    if chunk_count > 1:
+        # 各チャンクのフレーム数の差が1以下になるように分割する
+        count = min(chunk_count, total)
+        base, extra = divmod(total, count)
+        chunks = []
+        s = start
+        for i in range(count):
+            size = base + (1 if i < extra else 0)
+            chunks.append((s, s + size - 1))
+            s += size
+        return chunks
+    return [(start, end)]
+
+def align_chunks_to_step(chunks, origin, step):
+    """各チャンクの先頭をorigin + k*stepのフレームまで進める（frame_stepおきにレンダリングする場合）
+
+    チャンクごとに先頭からstepおきにレンダリングしても、全体でoriginからstepおきのフレームになる。
+    整列後に空になったチャンクは除く。
+    """
+    if step <= 1:
+        return list(chunks)
+    aligned = []
+    for start, end in chunks:
+        start = origin + -(-(start - origin) // step) * step
+        if start <= end:
+            aligned.append((start, end))
+    return aligned
+
+def progressive_passes(start, end, coarsest=16, step=1):
+    """粗い順にフレームをレンダリングするためのパスのリスト [(pass_step, [frame, ...]), ...] を返す
+
+    coarsest=16なら最初に0, 16, 32...、次に8, 24...、4, 12, 20...のように間を埋めていき、
+    最後のパスですべてのフレーム（stepおき）がそろう。各フレームは1回だけ現れる。
+    """
+    level = 1
+    while level * 2 <= coarsest:
+        level *= 2
+    passes = [(level * step, list(range(start, end + 1, level * step)))]
+    while level > 1:
+        level //= 2
+        passes.append((2 * level * step, list(range(start + level * step, end + 1, 2 * level * step))))
+    return [(pass_step, frames) for pass_step, frames in passes if frames]
+
+def plan_balanced_chunks(ranges, workers, chunks_per_worker=4):
+    """計測済みの1フレームあたりの時間からチャンクを作成し、LPT（長い順）で並べる
+
+    rangesは {"key", "start", "end", "frame_cost", "fallback"} のリスト。frame_costは秒/フレーム
+    （履歴がなければNone）、fallbackは履歴がない場合に使う均等分割のチャンク。
+    ワーカーあたりchunks_per_worker個程度の同じコストのチャンクになるように分割し、
+    コストの大きい順に並べた [{"key", "start", "end", "cost"}, ...] を返す。
+    この順にワーカーへ割り当てると、すべてのワーカーがほぼ同時に終わる。
+    """
+    known = sorted(r["frame_cost"] for r in ranges if r["frame_cost"])
+    # 履歴のないプロファイルのコストは計測済みのプロファイルの中央値で見積もる
+    default_cost = known[len(known) // 2] if known else 1.0
+    total = sum((r["end"] - r["start"] + 1) * (r["frame_cost"] or default_cost) for r in ranges)
+    target = total / max(1, workers * chunks_per_worker)
+    
+    tasks = []
+    for r in ranges:
+        cost = r["frame_cost"] or default_cost
+        if r["frame_cost"]:
+            count = max(1, int(round((r["end"] - r["start"] + 1) * cost / target))) if target > 0 else 1
+            chunks = split_frame_range(r["start"], r["end"], chunk_count=count)
+        else:
+            chunks = r["fallback"]
+        for start, end in chunks:
+            tasks.append({"key": r["key"], "start": start, "end": end, "cost": (end - start + 1) * cost})
+    tasks.sort(key=lambda task: task["cost"], reverse=True)
+    return tasks
+
+def assign_lanes(costs, workers):
+    """コストを与えられた順に、その時点で負荷の最も小さいワーカーへ割り当てる。ワーカー番号のリストを返す
+
+    costsをplan_balanced_chunksのように大きい順に並べておくとLPTスケジューリングになる。
+    """
+    import heapq
+    loads = [(0.0, worker) for worker in range(max(1, workers))]
+    assigned = []
+    for cost in costs:
+        load, worker = heapq.heappop(loads)
+        assigned.append(worker)
+        heapq.heappush(loads, (load + cost, worker))
+    return assigned
+
+def estimate_makespan(costs, workers):
+    """コストを与えられた順に空いたワーカーへ割り当てた場合の全体の所要時間を見積もる"""
+    loads = [0.0] * max(1, workers)
+    for cost, worker in zip(costs, assign_lanes(costs, workers)):
+        loads[worker] += cost
+    return max(loads)
+
+def frames_to_ranges(frames, step=1):
+    """フレーム番号の集合を連続した範囲 [(start, end), ...] にまとめる
+
+    stepを指定するとstepおきに続くフレームを1つの範囲にまとめる（frame_stepでレンダリングする場合）。
+    """
+    ranges = []
+    for frame in sorted(frames):
+        if ranges and frame == ranges[-1][1] + step:
+            ranges[-1] = (ranges[-1][0], frame)
+        else:
+            ranges.append((frame, frame))
+    return ranges
+
+# 連番ファイル名（接頭辞 + 最後の数字列 + 数字を含まない接尾辞）。拡張子は先に分けておく
+_FRAME_NAME_RE = re.compile(r'^(.*?)(\d+)(\D*)$')
+
+# ディレクトリごとの連番インデックスのキャッシュ
+_sequence_index_cache = {}
+
+def scan_frame_sequences(directory):
+    """ディレクトリを1回のos.scandirで走査し、連番ファイルをシーケンスごとにまとめたインデックスを返す
+
+    戻り値は {"directory", "sizes": {ファイル名: サイズ}, "sequences": {(接頭辞, 接尾辞): シーケンス}}。
+    シーケンスは {"prefix", "suffix", "padding", "frames"（昇順のリスト）, "gaps"（欠けている番号）}。
+    結果はディレクトリのmtimeでキャッシュする。ファイルの上書きではmtimeが変わらないため、
+    0バイトだったファイル（プレースホルダー）はキャッシュ使用時にサイズを確認し直す。
+    """
+    directory = os.path.abspath(directory)
+    try:
+        mtime = os.stat(directory).st_mtime
+    except OSError:
+        return {"directory": directory, "sizes": {}, "sequences": {}}
+    
+    cached = _sequence_index_cache.get(directory)
+    # mtimeの精度が粗いファイルシステムに備え、変更直後に作ったインデックスは使わない
+    if cached is not None and cached["mtime"] == mtime and cached["scanned_at"] - mtime > 2.0:
+        for name, size in cached["sizes"].items():
+            if size == 0:
+                try:
+                    cached["sizes"][name] = os.path.getsize(os.path.join(directory, name))
+                except OSError:
+                    pass
+        return cached
+    
+    scanned_at = time.time()
+    sizes = {}
+    groups = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            # .jp2や.j2cなど拡張子の数字をフレーム番号とみなさない（拡張子のない shot.0001 はそのまま）
+            stem, extension = os.path.splitext(entry.name)
+            if extension[1:].isdigit():
+                stem, extension = entry.name, ""
+            match = _FRAME_NAME_RE.match(stem)
+            if not match or not entry.is_file():
+                continue
+            sizes[entry.name] = entry.stat().st_size
+            prefix, digits, suffix = match.groups()
+            groups.setdefault((prefix, suffix + extension), []).append(digits)
+    
+    sequences = {}
+    for (prefix, suffix), numbers in groups.items():
+        frames = sorted(int(d) for d in numbers)
+        frame_set = set(frames)
+        sequences[(prefix, suffix)] = {
+            "prefix": prefix,
+            "suffix": suffix,
+            "padding": min(len(d) for d in numbers),
+            "frames": frames,
+            "gaps": [f for f in range(frames[0], frames[-1] + 1) if f not in frame_set],
+        }
+    
+    index = {"directory": directory, "mtime": mtime, "scanned_at": scanned_at,
+             "sizes": sizes, "sequences": sequences}
+    _sequence_index_cache[directory] = index
+    return index
+
+def find_frame_sequence(index, prefix, suffix=None, extension=None):
+    """インデックスから接頭辞と接尾辞（または拡張子）が一致するシーケンスを探す
+
+    見つからない場合は拡張子が一致する最もフレーム数の多いシーケンスを返す。
+    """
+    sequences = index["sequences"]
+    if suffix is not None and (prefix, suffix) in sequences:
+        return sequences[(prefix, suffix)]
+    matches_extension = [seq for seq in sequences.values()
+                         if extension is None or seq["suffix"].lower().endswith(f".{extension}")]
+    same_prefix = [seq for seq in matches_extension if seq["prefix"] == prefix]
+    candidates = same_prefix or matches_extension
+    if not candidates:
+        return None
+    return max(candidates, key=lambda seq: len(seq["frames"]))
+
+def sequence_file_pattern(sequence):
+    """シーケンスのFFmpeg用ファイル名パターン（例: frame_%04d.png）"""
+    return f"{sequence['prefix']}%0{sequence['padding']}d{sequence['suffix']}"
+
+# 共有ファイルシステムモード（--shared）の既定値
+SHARED_CHUNK_SIZE = 10
+SHARED_LOCK_STALE_SECONDS = 600
+
+def chunk_lock_paths(output_path, start, end):
+    """チャンクのロックファイルと完了マーカーのパスを返す（出力先ディレクトリに置く）"""
+    directory, name = os.path.split(output_path)
+    stem = name.replace("#", "") or "frame_"
+    base = os.path.join(directory, f".{stem}{start}-{end}")
+    return base + ".lock", base + ".done"
+
+def _lock_owner(owner=None):
+    """ロックファイルに書き込む所有者名（省略時は ホスト名:PID）"""
+    import socket
+    return owner or f"{socket.gethostname()}:{os.getpid()}"
+
+def claim_chunk_lock(lock_path, stale_seconds=SHARED_LOCK_STALE_SECONDS, owner=None):
+    """ロックファイルをO_CREAT|O_EXCLで作成してチャンクを確保する。確保できればTrue
+
+    更新がstale_seconds以上止まっているロックは、クラッシュしたマシンのものとみなして奪う。
+    奪う処理は一意な名前へのrenameで行うので、複数のマシンが同時に試しても1台だけが成功する。
+    """
+    owner = _lock_owner(owner)
+    for _ in range(3):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                age = time.time() - os.path.getmtime(lock_path)
+            except FileNotFoundError:
+                continue  # 確認の間に解放された
+            if age < stale_seconds:
+                return False
+            stale_path = lock_path + ".stale." + re.sub(r'[^\w.-]', '_', owner)
+            try:
+                os.rename(lock_path, stale_path)
+            except FileNotFoundError:
+                continue  # 他のマシンが先に奪った
+            # renameまでの間に他のマシンが奪って新しいロックを作っていた場合は元に戻す
+            if time.time() - os.path.getmtime(stale_path) < stale_seconds:
+                # さらに別のマシンが新しいロックを作っていた場合は上書きせずにそのまま残す
+                try:
+                    os.link(stale_path, lock_path)
+                except FileExistsError:
+                    pass
+                except OSError:
+                    # ハードリンクを作れないファイルシステムではrenameで戻す（戻せなければ残す）
+                    try:
+                        os.rename(stale_path, lock_path)
+                    except OSError:
+                        pass
+                else:
+                    os.remove(stale_path)
+                return False
+            os.remove(stale_path)
+            print(f"Reclaimed stale lock: {lock_path}")
+            continue
+        with os.fdopen(fd, 'w') as f:
+            f.write(f"{owner} {time.time():.0f}\n")
+        return True
+    return False
+
+def refresh_chunk_lock(lock_path):
+    """ロックの更新時刻を進めて、他のマシンに期限切れと判断されないようにする"""
+    try:
+        os.utime(lock_path, None)
+    except OSError:
+        pass
+
+def release_chunk_lock(lock_path, done_path=None, owner=None):
+    """ロックを解放する。done_pathを指定するとチャンクの完了マーカーを作成する
+
+    ロックが他のマシンに奪われていた場合は、そのマシンのロックを消さずにFalseを返す
+    （完了マーカーも奪ったマシンが作成する）。
+    """
+    owner = _lock_owner(owner)
+    try:
+        with open(lock_path, 'r', encoding='utf-8', errors='replace') as f:
+            holder = (f.read().split() or [""])[0]
+    except FileNotFoundError:
+        holder = owner
+    if holder != owner:
+        print(f"Lock was taken over by {holder or 'another machine'}, leaving it: {lock_path}")
+        return False
+    if done_path:
+        with open(done_path, 'w') as f:
+            f.write(f"{time.time():.0f}\n")
+    try:
+        os.remove(lock_path)
+    except FileNotFoundError:
+        pass
+    return True
+
+# フレームごとのレンダリング時間のログ（出力先ディレクトリに作成）
+TIMING_LOG_NAME = "render_timing.jsonl"
+
+_STATS_PEAK_RE = re.compile(r'Peak(?: Memory)?[:\s]+([\d.]+)\s*([KMG])', re.IGNORECASE)
+
+def timing_log_path(output_path):
+    """出力パス（絶対パス）に対応するタイミングログのパスを返す"""
+    return os.path.join(os.path.dirname(output_path) or ".", TIMING_LOG_NAME)
+
+def parse_stats_peak_mb(stats):
+    """render_statsの文字列（"... | Peak: 1234.56M | ..."）からピークメモリ（MB）を取得する"""
+    match = _STATS_PEAK_RE.search(stats or "")
+    if match is None:
+        return None
+    value = float(match.group(1))
+    return value * {"K": 1.0 / 1024, "M": 1.0, "G": 1024.0}[match.group(2).upper()]
+
+def process_peak_memory_mb():
+    """このプロセスの最大常駐メモリ（MB）。取得できない環境（Windows）ではNone"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # LinuxはKB、macOSはバイト単位
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+def load_timing_log(path):
+    """タイミングログ（JSONL）のレコードのリストを返す。壊れた行は無視する"""
+    import json
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+def summarize_timings(records):
+    """プロファイルごとのフレーム数、合計時間、1フレームの平均時間、ピークメモリを集計する"""
+    summary = {}
+    for record in records:
+        entry = summary.setdefault(record["profile"], {"frames": 0, "total_s": 0.0, "avg_s": 0.0,
+                                                       "peak_mem_mb": None})
+        entry["frames"] += 1
+        entry["total_s"] += record["wall_s"]
+        entry["avg_s"] = entry["total_s"] / entry["frames"]
+        if record.get("peak_mem_mb") is not None:
+            entry["peak_mem_mb"] = max(entry["peak_mem_mb"] or 0.0, record["peak_mem_mb"])
+    return summary
+
+def frame_cost_history(records):
+    """タイミングログのレコードから (プロファイル名, カメラ) ごとの平均秒/フレームを求める"""
+    totals = {}
+    for record in records:
+        key = (record["profile"], record["camera"])
+        total, count = totals.get(key, (0.0, 0))
+        totals[key] = (total + record["wall_s"], count + 1)
+    return {key: total / count for key, (total, count) in totals.items()}
+
+def estimate_sync_savings(records):
+    """永続データで省けたシーン同期の時間（秒）を見積もる
+
+    recordsはレンダリング順のタイミングレコード。最初のプロファイルの1フレーム目と以降のフレームの
+    差をシーン同期の時間とし、2つ目以降のプロファイルの1フレーム目でそれがどれだけ短くなったかを合計する。
+    (省けた秒数, シーン同期の秒数) を返す。見積もれない場合はNone。
+    """
+    profiles = []
+    for record in records:
+        if not profiles or profiles[-1][0] != record["profile"]:
+            profiles.append((record["profile"], []))
+        profiles[-1][1].append(record["wall_s"])
+    
+    def overhead(times):
+        steady = sorted(times[1:])
+        return times[0] - steady[len(steady) // 2]
+    
+    if len(profiles) < 2 or len(profiles[0][1]) < 2:
+        return None
+    cold = overhead(profiles[0][1])
+    if cold <= 0:
+        return None
+    saved = 0.0
+    for name, times in profiles[1:]:
+        warm = overhead(times) if len(times) >= 2 else 0.0
+        saved += max(0.0, cold - max(0.0, warm))
+    return saved, cold
+
+def format_duration(seconds):
+    """秒数を h:mm:ss 形式にする"""
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+# ドラフトレンダリングの出力先（各出力フォルダの下に作成）
+DRAFT_SUBDIR = "drafts"
+
+def draft_output_path(output_path):
+    """出力パスに対応するドラフトの出力パス（出力フォルダ/drafts/ファイル名）を返す"""
+    directory, name = os.path.split(output_path)
+    return os.path.join(directory, DRAFT_SUBDIR, name) if directory else os.path.join(DRAFT_SUBDIR, name)
+
+# 入力のハッシュが変わっていないフレームをスキップするためのサイドカー（出力先ディレクトリに作成）
+RENDER_CACHE_NAME = "render_cache.json"
+RENDER_CACHE_VERSION = 1
+
+def render_cache_path(output_path):
+    """出力パス（絶対パス）に対応するレンダーキャッシュのパスを返す"""
+    return os.path.join(os.path.dirname(output_path) or ".", RENDER_CACHE_NAME)
+
+def load_render_cache(path):
+    """レンダーキャッシュ {"version", "frames": {ファイル名: {"hash", "size"}}} を読み込む"""
+    import json
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = None
+    if not isinstance(cache, dict) or cache.get("version") != RENDER_CACHE_VERSION:
+        cache = {"version": RENDER_CACHE_VERSION, "frames": {}}
+    return cache
+
+def save_render_cache(path, cache, lock_timeout=30.0):
+    """レンダーキャッシュを書き出す（途中で止まっても壊れないように一時ファイルから置き換える）
+
+    同じ出力先のキャッシュには並列のチャンクや他のプロファイルも書き込むので、ロックファイルの下で
+    ファイルを読み直し、フレームごとに記録の新しい方を残して（"time"）マージする。
+    cacheもマージ後の内容に更新する。
+    """
+    import json
+    lock_path = path + ".lock"
+    deadline = time.time() + lock_timeout
+    locked = claim_chunk_lock(lock_path, stale_seconds=lock_timeout * 2)
+    while not locked and time.time() < deadline:
+        time.sleep(0.05)
+        locked = claim_chunk_lock(lock_path, stale_seconds=lock_timeout * 2)
+    try:
+        merged = load_render_cache(path)["frames"]
+        for name, entry in cache["frames"].items():
+            current = merged.get(name)
+            if current is None or entry.get("time", 0.0) >= current.get("time", 0.0):
+                merged[name] = entry
+        cache["frames"] = merged
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=1)
+        os.replace(tmp_path, path)
+    finally:
+        if locked:
+            release_chunk_lock(lock_path)
+
+def files_digest(paths):
+    """ファイルのパス・更新時刻・サイズのハッシュ（存在しないファイルも区別する）"""
+    import hashlib
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+            digest.update(f"{path}|{stat.st_mtime_ns}|{stat.st_size}\n".encode('utf-8'))
+        except OSError:
+            digest.update(f"{path}|missing\n".encode('utf-8'))
+    return digest.hexdigest()
+
+def find_static_spans(digests):
+    """入力が同じフレームが続く区間を探す
+
+    digestsはフレーム順の [(frame, digest), ...]。2フレーム以上続く区間ごとに
+    (最初のフレーム, [残りのフレーム, ...]) のリストを返す。
+    """
+    spans = []
+    previous = None
+    for frame, digest in digests:
+        if previous is not None and digest == previous:
+            spans[-1][1].append(frame)
+        else:
+            spans.append((frame, []))
+        previous = digest
+    return [(first, duplicates) for first, duplicates in spans if duplicates]
+
+def link_or_copy(src, dst):
+    """dstをsrcのハードリンクにする（別のファイルシステムなどでリンクできない場合はコピー）"""
+    import shutil
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def break_hardlink(path):
+    """pathが他のファイルとハードリンクを共有していれば削除する
+
+    Blenderは既存のファイルをそのまま開いて書き込むので、リンクしたままレンダリングすると
+    同じ区間のすべてのフレームが書き換わってしまう。
+    """
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.remove(path)
+    except OSError:
+        pass
+
+def job_command(job):
+    """ジョブからBlenderのコマンドライン引数リストを作成する"""
+    cmd = [job["blender"], "-b", job["blend"]]
+    # スレッド数は-Pでスクリプトが実行される前に指定する
+    if job.get("threads"):
+        cmd += ["-t", str(job["threads"])]
+    cmd += ["-P", SCRIPT_PATH]
+    if job.get("output_path"):
+        cmd += ["-o", job["output_path"]]
+    if job.get("start") is not None:
+        cmd += ["-s", str(job["start"])]
+    if job.get("end") is not None:
+        cmd += ["-e", str(job["end"])]
+    # render_from_cliは「--」の後にカメラ名とプロファイルインデックスを受け取る
+    # （ワーカーモードなどプロファイルを指定しないジョブではオプションのみ）
+    cmd += ["--"]
+    if job["profile_index"] is not None:
+        cmd += [job.get("camera") or "", str(job["profile_index"])]
+    cmd += job.get("extra_args", [])
+    return cmd
+
+# 並列レンダリングで空けておくメモリ（MB）
+MEMORY_RESERVE_MB = 1024
+
+def available_memory_mb():
+    """/proc/meminfoのMemAvailable（MB）。取得できない環境（Linux以外）ではNone"""
+    try:
+        with open("/proc/meminfo", 'r') as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024.0
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def process_rss_mb(pid):
+    """/proc/<pid>/statusのVmRSS（MB）。取得できない場合（終了済みなど）はNone"""
+    try:
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+class MemoryAdmission:
+    """空きメモリに収まる場合だけ次のジョブの起動を許可するアドミッション制御
+
+    ジョブのピークメモリは job["mem_mb"]（タイミングログに記録された過去のピーク）と、
+    このセッションで観測した同じプロファイルのワーカーの最大RSSの大きい方で見積もる。
+    実行中のワーカーがピークに達するまでに増える分も確保済みとして扱い、空きメモリから
+    reserve_mbを引いた残りに収まらないジョブは保留する。実行中のワーカーは止めない。
+    """
+
+    def __init__(self, reserve_mb=MEMORY_RESERVE_MB, log=print):
+        self.reserve_mb = reserve_mb
+        self.log = log
+        self.peaks = {}
+        self.holding = None
+
+    @staticmethod
+    def _key(job):
+        if job["profile_index"] is None:
+            return job["name"]
+        return (job["blend"], job["profile_index"])
+
+    def estimate(self, job):
+        """ジョブのピークメモリの見積もり（MB）。履歴も観測値もなければ0"""
+        return max(job.get("mem_mb") or 0.0, self.peaks.get(self._key(job), 0.0))
+
+    def observe(self, job, pid):
+        """実行中のワーカーのRSS（MB）を取得し、プロファイルの最大値として記録する"""
+        rss = process_rss_mb(pid)
+        if rss is not None:
+            key = self._key(job)
+            self.peaks[key] = max(self.peaks.get(key, 0.0), rss)
+        return rss
+
+    def admit(self, job, running):
+        """jobを今起動してよいか判定する。runningは実行中の [(pid, job), ...]"""
+        available = available_memory_mb()
+        # 空きメモリが分からない環境や、実行中のワーカーがない場合は常に起動する（進まなくなるのを防ぐ）
+        if available is None or not running:
+            self.holding = None
+            return True
+        growth = 0.0
+        for pid, running_job in running:
+            rss = self.observe(running_job, pid) or 0.0
+            growth += max(0.0, self.estimate(running_job) - rss)
+        free = available - self.reserve_mb - growth
+        needed = self.estimate(job)
+        if free > 0 and free >= needed:
+            self.holding = None
+            return True
+        if self.holding != job["name"]:
+            self.log(f"Holding {job['name']}: needs ~{needed:.0f} MB, {max(0.0, free):.0f} MB free "
+                     f"after the {self.reserve_mb:.0f} MB reserve")
+            self.holding = job["name"]
+        return False
+
+def parse_cpu_list(text):
+    """"0-3,8,10-11" 形式のCPUリストをCPU番号のリストにする"""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+def format_cpu_list(cpus):
+    """CPU番号のリストを "0-3,8" 形式にする（tasksetの-cに渡す）"""
+    parts = []
+    for cpu in sorted(cpus):
+        if parts and parts[-1][1] == cpu - 1:
+            parts[-1][1] = cpu
+        else:
+            parts.append([cpu, cpu])
+    return ",".join(str(first) if first == last else f"{first}-{last}" for first, last in parts)
+
+def available_cpus():
+    """このプロセスが使用できるCPU番号のリスト"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def numa_nodes():
+    """NUMAノードごとのCPU番号のリスト（/sys/devices/system/node）。取得できない環境では空のリスト"""
+    nodes = []
+    root = "/sys/devices/system/node"
+    try:
+        names = sorted((name for name in os.listdir(root) if re.match(r'node\d+$', name)), key=lambda n: int(n[4:]))
+        for name in names:
+            with open(os.path.join(root, name, "cpulist"), 'r') as f:
+                nodes.append(parse_cpu_list(f.read()))
+    except (OSError, ValueError):
+        return []
+    return [node for node in nodes if node]
+
+def plan_thread_slots(workers, mode, cpus=None, nodes=None):
+    """同時に実行するワーカーごとのスレッド数（-t）とCPUの割り当てを計画する
+
+    mode='THROUGHPUT' はworkers個の狭いワーカーでCPUを分け合い、'LATENCY' はNUMAノードごとに
+    最大1つの広いワーカーにする（ノードが1つなら全CPUを使う1ワーカー）。CPUはノード順に
+    連続して割り当てるので、ワーカーはできるだけ1つのノードに収まる。
+    [{"threads", "cpus"}, ...] を返す（要素数が同時実行数）。'NONE' の場合はNone。
+    """
+    if mode == 'NONE':
+        return None
+    cpus = sorted(cpus if cpus is not None else available_cpus())
+    allowed = set(cpus)
+    nodes = [[cpu for cpu in node if cpu in allowed] for node in (nodes if nodes is not None else numa_nodes())]
+    nodes = [node for node in nodes if node]
+    if not nodes or sum(len(node) for node in nodes) != len(cpus):
+        nodes = [cpus]
+    if mode == 'LATENCY':
+        count = max(1, min(workers, len(nodes)))
+        if count == len(nodes):
+            return [{"threads": len(node), "cpus": node} for node in nodes]
+    else:
+        count = max(1, min(workers, len(cpus)))
+    ordered = [cpu for node in nodes for cpu in node]
+    return [{"threads": end - start + 1, "cpus": ordered[start:end + 1]}
+            for start, end in split_frame_range(0, len(ordered) - 1, chunk_count=count)]
+
+# render_from_cliがフレームごとに標準出力に出す進捗の行（スーパーバイザーのウォッチドッグ用）
+FRAME_START_PREFIX = "MultiRenders: frame start "
+FRAME_DONE_PREFIX = "MultiRenders: frame done "
+# フレームのレンダリング前の準備（キャッシュのハッシュ計算など）の開始を知らせる行
+PREPARE_PREFIX = "MultiRenders: preparing "
+
+# 最初のフレームまで（ファイルの読み込みと準備中）のタイムアウトはframe_timeoutのこの倍数
+STARTUP_TIMEOUT_FACTOR = 4
+
+# 失敗したジョブのレポート（ランナーがログディレクトリまたはカレントディレクトリに作成）
+FAILURE_REPORT_NAME = "render_failures.json"
+
+class RenderJobPool:
+    """CLIレンダリングジョブを最大max_workers個のプロセスで同時に実行するプール
+
+    poll()を繰り返し呼ぶことでブロックせずに進行できる（Blenderのモーダルオペレータ用）。
+    run()はすべてのジョブが終わるまでブロックする（スタンドアロン実行用）。
+    memory（MemoryAdmission）を指定すると、空きメモリに収まらないジョブの起動を保留する。
+    slots（plan_thread_slotsの結果）を指定すると、同時実行数をスロット数までにして各ジョブに
+    空いているスロットのスレッド数（-t）を渡し、pin_cpusならそのCPUに固定する（Linuxのみ）。
+    frame_timeoutかmax_retriesを指定するとワーカーを監視する。標準出力のフレームの進捗が
+    frame_timeout秒途切れたワーカーは終了させ、異常終了したジョブは書きかけのフレームを削除してから
+    --resume（足りないフレームだけ）でmax_retries回まで再起動する。起動直後と準備中（PREPARE_PREFIXの
+    行から次のフレームの開始まで）はstartup_timeout（省略時はframe_timeoutのSTARTUP_TIMEOUT_FACTOR倍）を使う。
+    """
+
+    def __init__(self, jobs, max_workers=2, log_dir=None, log=print, memory=None, slots=None, pin_cpus=False,
+                 frame_timeout=0, max_retries=0, startup_timeout=None):
+        self.pending = list(jobs)
+        self.total = len(self.pending)
+        self.max_workers = max(1, int(max_workers))
+        if slots:
+            self.max_workers = min(self.max_workers, len(slots))
+        self.log_dir = log_dir
+        self.log = log
+        self.memory = memory
+        self.slots = slots
+        self.pin_cpus = pin_cpus
+        self.frame_timeout = frame_timeout
+        if startup_timeout is None:
+            startup_timeout = frame_timeout * STARTUP_TIMEOUT_FACTOR
+        self.startup_timeout = max(startup_timeout, frame_timeout)
+        self.max_retries = max(0, int(max_retries))
+        self.running = []
+        self.results = []
+        self.failures = []
+        self.cancelled = False
+
+    @staticmethod
+    def _watch_output(proc, progress, log_file):
+        """ワーカーの出力をログに書きながらフレームの進捗を記録する（スレッドで実行）"""
+        for line in proc.stdout:
+            if log_file:
+                log_file.write(line)
+            else:
+                sys.stdout.write(line)
+            if line.startswith(FRAME_START_PREFIX):
+                frame, _, path = line[len(FRAME_START_PREFIX):].strip().partition(" ")
+                progress.update(frame=int(frame), path=path or None, last=time.time(), preparing=False)
+            elif line.startswith(PREPARE_PREFIX):
+                progress.update(last=time.time(), preparing=True)
+            elif line.startswith(FRAME_DONE_PREFIX):
+                progress["done"] += 1
+                progress.update(frame=None, path=None, last=time.time())
+
+    def _launch(self, job):
+        cpus = None
+        if self.slots:
+            used = {running_job["slot"] for proc, running_job, started, log_file in self.running}
+            slot = next(i for i in range(len(self.slots)) if i not in used)
+            job = dict(job, slot=slot, threads=self.slots[slot]["threads"])
+            if self.pin_cpus and hasattr(os, "sched_setaffinity"):
+                cpus = self.slots[slot]["cpus"]
+        supervised = self.frame_timeout > 0 or self.max_retries > 0
+        if supervised:
+            job = dict(job, progress={"last": time.time(), "done": 0, "frame": None, "path": None,
+                                      "hung": False, "preparing": True, "thread": None})
+        cmd = job_command(job)
+        self.log(f"[{len(self.results) + len(self.running) + 1}/{self.total}] Starting {job['name']}")
+        log_file = None
+        if self.log_dir:
+            os.makedirs(self.log_dir, exist_ok=True)
+            safe_name = re.sub(r'[<>:"/\\|?* ]', '_', job["name"])
+            job = dict(job, log_path=os.path.join(self.log_dir, f"{safe_name}.log"))
+            # 再起動したジョブは前回のログの後に追記する
+            log_file = open(job["log_path"], 'a' if job.get("attempt", 1) > 1 else 'w', encoding='utf-8')
+        # POSIXでは各ワーカーを別のプロセスグループで起動し、終了時に子プロセスもまとめて止める
+        session = {"start_new_session": True} if os.name == 'posix' else {}
+        try:
+            if supervised:
+                proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        universal_newlines=True, errors='replace', **session)
+            else:
+                proc = subprocess.Popen(cmd, stdout=log_file, stderr=subprocess.STDOUT if log_file else None,
+                                        **session)
+        except OSError as e:
+            if log_file:
+                log_file.close()
+            self.log(f"Failed to start {job['name']}: {e}")
+            self.results.append({"name": job["name"], "returncode": -1, "elapsed": 0.0})
+            self._record_failure(job, f"could not start: {e}")
+            return
+        # preexec_fnはスレッドのあるプロセスでは安全でないので、起動後にPIDで固定する
+        if cpus:
+            try:
+                os.sched_setaffinity(proc.pid, cpus)
+            except OSError as e:
+                self.log(f"{job['name']}: could not pin to CPUs {format_cpu_list(cpus)}: {e}")
+        if supervised:
+            thread = threading.Thread(target=self._watch_output, args=(proc, job["progress"], log_file), daemon=True)
+            thread.start()
+            job["progress"]["thread"] = thread
+        self.running.append((proc, job, time.time(), log_file))
+
+    def _check_watchdog(self, proc, job):
+        """フレームの進捗がframe_timeout秒途切れたワーカーを終了させる"""
+        progress = job.get("progress")
+        if not self.frame_timeout or progress is None or progress["hung"]:
+            return
+        # ファイルの読み込みやハッシュ計算の間は長いタイムアウトを使う
+        timeout = self.startup_timeout if progress["preparing"] else self.frame_timeout
+        if time.time() - progress["last"] <= timeout:
+            return
+        progress["hung"] = True
+        where = f" on frame {progress['frame']}" if progress["frame"] is not None else ""
+        self.log(f"{job['name']}: no progress for {timeout:.0f}s{where}, stopping the worker")
+        self._stop_worker(proc, force=True)
+
+    def _stop_worker(self, proc, force=False):
+        """ワーカーとそのプロセスグループ（子プロセスが標準出力を開いたままにしないように）を終了させる"""
+        if hasattr(os, "killpg"):
+            import signal
+            try:
+                os.killpg(proc.pid, signal.SIGKILL if force else signal.SIGTERM)
+                return
+            except OSError:
+                pass
+        if force:
+            proc.kill()
+        else:
+            proc.terminate()
+
+    def _failure_reason(self, job, returncode):
+        progress = job.get("progress")
+        if progress is not None and progress["hung"]:
+            if progress["preparing"]:
+                return "hung before the first frame" if progress["frame"] is None else "hung while preparing"
+            return f"hung on frame {progress['frame']}"
+        if progress is not None and progress["frame"] is not None:
+            return f"crashed on frame {progress['frame']} (exit code {returncode})"
+        return f"exit code {returncode}"
+
+    def _record_failure(self, job, reason):
+        progress = job.get("progress") or {}
+        self.failures.append({
+            "profile": job.get("profile") or job["name"],
+            "job": job["name"],
+            "start": job.get("start"),
+            "end": job.get("end"),
+            "attempts": job.get("attempt", 1),
+            "reason": reason,
+            "frame": progress.get("frame"),
+            "frames_done": progress.get("done"),
+            "log": job.get("log_path"),
+        })
+
+    def _retry(self, job, reason):
+        """異常終了したジョブを足りないフレームだけで再起動するためにキューの先頭に戻す。戻した場合はTrue"""
+        progress = job["progress"]
+        # 書きかけのフレームは壊れている可能性があるので削除し、再開時にレンダリングさせる
+        if progress["path"]:
+            try:
+                os.remove(progress["path"])
+            except OSError:
+                pass
+        attempt = job.get("attempt", 1)
+        if self.cancelled or attempt > self.max_retries:
+            return False
+        retry = {key: value for key, value in job.items() if key not in ("progress", "slot", "threads")}
+        retry["attempt"] = attempt + 1
+        if "--resume" not in retry["extra_args"]:
+            retry["extra_args"] = retry["extra_args"] + ["--resume"]
+        self.pending.insert(0, retry)
+        self.log(f"{job['name']}: {reason}, restarting from the first unfinished frame "
+                 f"(attempt {attempt + 1}/{self.max_retries + 1})")
+        return True
+
+    def poll(self):
+        """終了したプロセスを回収し、空いた枠に次のジョブを起動する。処理が残っていればTrueを返す"""
+        still_running = []
+        for proc, job, started, log_file in self.running:
+            returncode = proc.poll()
+            if returncode is None:
+                if self.memory is not None:
+                    self.memory.observe(job, proc.pid)
+                self._check_watchdog(proc, job)
+                still_running.append((proc, job, started, log_file))
+                continue
+            progress = job.get("progress")
+            if progress is not None:
+                # 出力を開いたままの子プロセスが残っていても監視のループを止めない
+                progress["thread"].join(5.0)
+                if progress["thread"].is_alive():
+                    self.log(f"{job['name']}: output still open after exit, not waiting for it")
+                if progress["hung"] and returncode == 0:
+                    returncode = -9
+            if log_file:
+                log_file.close()
+            elapsed = time.time() - started
+            if returncode != 0:
+                reason = self._failure_reason(job, returncode)
+                if progress is not None and self._retry(job, reason):
+                    continue
+                self._record_failure(job, reason)
+            status = "done" if returncode == 0 else f"FAILED ({self._failure_reason(job, returncode)})"
+            self.log(f"{job['name']}: {status} in {elapsed:.1f}s")
+            self.results.append({"name": job["name"], "returncode": returncode, "elapsed": elapsed})
+        self.running = still_running
+
+        while self.pending and len(self.running) < self.max_workers and not self.cancelled:
+            if self.memory is not None and not self.memory.admit(
+                    self.pending[0], [(proc.pid, job) for proc, job, started, log_file in self.running]):
+                break
+            self._launch(self.pending.pop(0))
+
+        return bool(self.running or (self.pending and not self.cancelled))
+
+    def cancel(self):
+        """未開始のジョブを破棄し、実行中のプロセスを終了させる"""
+        self.cancelled = True
+        for proc, job, started, log_file in self.running:
+            if proc.poll() is None:
+                self._stop_worker(proc)
+        self.log(f"Cancelled, {len(self.pending)} queued jobs discarded")
+
+    def run(self, poll_interval=0.5):
+        while self.poll():
+            time.sleep(poll_interval)
+        return self.exit_code()
+
+    @property
+    def failed(self):
+        return [r for r in self.results if r["returncode"] != 0]
+
+    @property
+    def holding(self):
+        """メモリ不足で起動を保留しているジョブ名（保留していなければNone）"""
+        if self.memory is None or not self.pending:
+            return None
+        return self.memory.holding
+
+    def exit_code(self):
+        """全ジョブが成功した場合のみ0を返す"""
+        if self.cancelled or self.failed or len(self.results) < self.total:
+            return 1
+        return 0
+
+    def summary(self):
+        lines = [f"{len(self.results) - len(self.failed)}/{self.total} jobs succeeded"]
+        reasons = {failure["job"]: failure["reason"] for failure in self.failures}
+        for result in self.failed:
+            reason = reasons.get(result["name"], f"exit code {result['returncode']}")
+            lines.append(f"  FAILED: {result['name']} ({reason})")
+        return lines
+
+    def failure_report(self):
+        """失敗したジョブをプロファイルごとにまとめたレポート（JSONに書き出すdict）"""
+        profiles = {}
+        for failure in self.failures:
+            profiles.setdefault(failure["profile"], []).append(failure)
+        return {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "failed_jobs": len(self.failures),
+                "profiles": profiles}
+
+# ジョブマニフェストの形式のバージョン
+MANIFEST_VERSION = 1
+
+def load_job_manifest(path):
+    """RENDER_OT_export_batch_fileが書き出したJSONのジョブマニフェストを読み込む"""
+    import json
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version: {manifest.get('version')}")
+    return manifest
+
+def manifest_jobs(manifest, blender_path="blender", chunk_size=0, chunk_count=0, extra_args=()):
+    """マニフェストのプロファイルからレンダリングジョブのリストを作成する
+
+    chunk_size/chunk_countが指定されない場合はマニフェストに記録されたチャンクを使用する。
+    """
+    # ドラフトのマニフェストはrender_from_cliに--draftを渡す
+    if manifest.get("draft") and "--draft" not in extra_args:
+        extra_args = list(extra_args) + ["--draft"]
+    jobs = []
+    for profile in manifest["profiles"]:
+        if chunk_size or chunk_count:
+            chunks = split_frame_range(profile["start"], profile["end"], chunk_size, chunk_count)
+            if manifest.get("draft"):
+                chunks = align_chunks_to_step(chunks, profile["start"], profile.get("draft_frame_step", 1))
+        else:
+            chunks = [tuple(chunk) for chunk in profile["chunks"]]
+        for start, end in chunks:
+            name = profile["name"] if len(chunks) == 1 else f"{profile['name']} [{start}-{end}]"
+            job = make_render_job(name, manifest["blend"], profile["index"],
+                                  camera_name=profile["camera"],
+                                  output_path=profile["output_path"],
+                                  start_frame=start,
+                                  end_frame=end,
+                                  blender_path=blender_path,
+                                  extra_args=extra_args)
+            job["cost"] = (end - start + 1) * (profile.get("frame_cost") or 0.0)
+            job["mem_mb"] = profile.get("peak_mem_mb")
+            job["profile"] = profile["name"]
+            jobs.append(job)
+    # 計測済みの時間があればコストの大きいチャンクから実行する（LPT）
+    if any(job["cost"] for job in jobs):
+        jobs.sort(key=lambda job: job["cost"], reverse=True)
+    return jobs
+
+class ChunkCoordinator:
+    """複数のレンダリングノードにフレームチャンクをリースで貸し出すコーディネーター
+
+    ワーカーはlease()でチャンクを借り、レンダリング中はheartbeat()でリースを延長し、
+    終了したらcomplete()で結果を報告する。期限切れのリースのチャンクはキューに戻す。
+    失敗したチャンクはmax_attempts回まで再試行する。
+    """
+
+    def __init__(self, jobs, lease_seconds=600, max_attempts=3, log=print):
+        self.chunks = []
+        for i, job in enumerate(jobs):
+            chunk = dict(job)
+            chunk.update({"id": i, "state": 'QUEUED', "attempts": 0, "lease_id": None,
+                          "worker": None, "expires": 0.0})
+            self.chunks.append(chunk)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.log = log
+        self.lock = threading.Lock()
+        self.next_lease = 0
+
+    def _expire_leases(self):
+        # ノードを落とし続けるチャンクを貸し出し続けないように、complete()の失敗と同じく試行回数を数える
+        now = time.time()
+        for chunk in self.chunks:
+            if chunk["state"] == 'LEASED' and chunk["expires"] < now:
+                if chunk["attempts"] < self.max_attempts:
+                    chunk["state"] = 'QUEUED'
+                    self.log(f"Lease expired: {chunk['name']} ({chunk['worker']}), "
+                             f"attempt {chunk['attempts']}, requeued")
+                else:
+                    chunk["state"] = 'FAILED'
+                    self.log(f"Lease expired: {chunk['name']} ({chunk['worker']}), "
+                             f"giving up after {chunk['attempts']} attempts")
+                chunk["lease_id"] = None
+
+    def lease(self, worker):
+        """次のチャンクを貸し出す。{"chunk": ...}、{"wait": 秒}、{"done": True} のいずれかを返す"""
+        with self.lock:
+            self._expire_leases()
+            for chunk in self.chunks:
+                if chunk["state"] == 'QUEUED':
+                    self.next_lease += 1
+                    chunk.update({"state": 'LEASED', "lease_id": f"{chunk['id']}-{self.next_lease}",
+                                  "worker": worker, "expires": time.time() + self.lease_seconds})
+                    chunk["attempts"] += 1
+                    self.log(f"Leased {chunk['name']} to {worker}")
+                    leased = {key: chunk[key] for key in ("lease_id", "name", "profile_index", "camera",
+                                                          "output_path", "start", "end")}
+                    leased["draft"] = "--draft" in chunk["extra_args"]
+                    return {"chunk": leased, "lease_seconds": self.lease_seconds}
+            if self._all_finished():
+                return {"done": True}
+            # 貸し出し中のチャンクが期限切れで戻ってくる可能性があるので待たせる
+            return {"wait": min(30.0, self.lease_seconds / 4)}
+
+    def _find_lease(self, lease_id):
+        for chunk in self.chunks:
+            if chunk["state"] == 'LEASED' and chunk["lease_id"] == lease_id:
+                return chunk
+        return None
+
+    def heartbeat(self, lease_id):
+        """リースを延長する。リースが無効（期限切れで再貸し出し済みなど）ならFalse"""
+        with self.lock:
+            chunk = self._find_lease(lease_id)
+            if chunk is None:
+                return False
+            chunk["expires"] = time.time() + self.lease_seconds
+            return True
+
+    def complete(self, lease_id, ok):
+        with self.lock:
+            chunk = self._find_lease(lease_id)
+            if chunk is None:
+                return False
+            if ok:
+                chunk["state"] = 'DONE'
+                self.log(f"Done: {chunk['name']} ({chunk['worker']})")
+            elif chunk["attempts"] < self.max_attempts:
+                chunk["state"] = 'QUEUED'
+                self.log(f"Failed: {chunk['name']} ({chunk['worker']}), attempt {chunk['attempts']}, requeued")
+            else:
+                chunk["state"] = 'FAILED'
+                self.log(f"Failed: {chunk['name']} ({chunk['worker']}), giving up after {chunk['attempts']} attempts")
+            chunk["lease_id"] = None
+            return True
+
+    def _all_finished(self):
+        return all(chunk["state"] in ('DONE', 'FAILED') for chunk in self.chunks)
+
+    @property
+    def finished(self):
+        # ワーカーがいなくなっても期限切れのリースで終了を判断できるようにここでも期限を確認する
+        with self.lock:
+            self._expire_leases()
+            return self._all_finished()
+
+    def status(self):
+        with self.lock:
+            self._expire_leases()
+            counts = {}
+            for chunk in self.chunks:
+                counts[chunk["state"]] = counts.get(chunk["state"], 0) + 1
+            return {"total": len(self.chunks), "counts": counts,
+                    "leases": [{"name": c["name"], "worker": c["worker"], "expires_in": round(c["expires"] - time.time())}
+                               for c in self.chunks if c["state"] == 'LEASED']}
+
+def serve_coordinator(coordinator, host="127.0.0.1", port=8765):
+    """コーディネーターのHTTP APIを別スレッドで開始し、サーバーを返す
+
+    POST /lease {"worker"}、POST /heartbeat {"lease_id"}、POST /complete {"lease_id", "ok"}、GET /status
+    """
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/status":
+                self._reply(200, coordinator.status())
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._reply(400, {"error": "invalid JSON"})
+                return
+            if self.path == "/lease":
+                self._reply(200, coordinator.lease(body.get("worker", self.client_address[0])))
+            elif self.path == "/heartbeat":
+                self._reply(200, {"ok": coordinator.heartbeat(body.get("lease_id"))})
+            elif self.path == "/complete":
+                self._reply(200, {"ok": coordinator.complete(body.get("lease_id"), bool(body.get("ok")))})
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def log_message(self, format, *args):
+            # リクエストごとのログは出さない（リースの状態変化はコーディネーターが出力する）
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def coordinator_request(url, path, body, timeout=30.0):
+    """コーディネーターのAPIを呼び出してJSONの応答を返す"""
+    import json
+    import urllib.request
+    request = urllib.request.Request(url.rstrip("/") + path, data=json.dumps(body).encode('utf-8'),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+def coordinator_main(args):
+    """コーディネーターを起動し、すべてのチャンクが終わるまで待つ。--local-workersでローカルのワーカーも起動する"""
+    import socket
+    
+    manifest = load_job_manifest(args.manifest)
+    jobs = manifest_jobs(manifest, args.blender, args.chunk_size, args.chunk_count)
+    coordinator = ChunkCoordinator(jobs, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    server = serve_coordinator(coordinator, args.host, args.port)
+    host = socket.gethostname() if args.host in ("0.0.0.0", "") else args.host
+    url = f"http://{host}:{server.server_address[1]}"
+    print(f"Coordinator serving {len(jobs)} chunks at {url}")
+    print(f"Start workers with: blender -b \"{manifest['blend']}\" -P \"{SCRIPT_PATH}\" -- --worker {url}")
+    
+    # 同じマシン上のワーカープロセス
+    pool = None
+    if args.local_workers > 0:
+        extra_args = ["--worker", url] + (["--resume"] if args.resume else [])
+        slots = plan_thread_slots(args.local_workers, args.threads_mode.upper())
+        count = len(slots) if slots else args.local_workers
+        workers = [make_render_job(f"worker_{i + 1}", manifest["blend"], None, blender_path=args.blender,
+                                   extra_args=extra_args)
+                   for i in range(count)]
+        pool = RenderJobPool(workers, count, log_dir=args.log_dir, slots=slots, pin_cpus=args.pin_cpus)
+    
+    try:
+        while not coordinator.finished:
+            if pool is not None and not pool.poll():
+                print("All local workers exited before the work was finished")
+                break
+            time.sleep(1.0)
+        if pool is not None:
+            pool.run()
+    except KeyboardInterrupt:
+        if pool is not None:
+            pool.cancel()
+    finally:
+        server.shutdown()
+    
+    status = coordinator.status()
+    print(f"Chunks: {status['counts']}")
+    for chunk in coordinator.chunks:
+        if chunk["state"] != 'DONE':
+            print(f"  {chunk['state']}: {chunk['name']}")
+    return 0 if status["counts"].get('DONE', 0) == status["total"] else 1
+
+class FFmpegJobQueue:
+    """FFmpegの変換ジョブをバックグラウンドのワーカースレッドで順番に実行するキュー
+
+    進捗はFFmpegの -progress 出力から取得する。stderrはメモリに保持せずログファイルに書き出す。
+    """
+
+    def __init__(self, max_workers=1):
+        import queue
+        self.queue = queue.Queue()
+        self.jobs = []
+        self.max_workers = max(1, max_workers)
+        self.threads = []
+        self.lock = threading.Lock()
+        self.next_id = 0
+
+    def submit(self, name, cmd, total_frames=0, output=None, segments=None, parallel=1, cleanup=()):
+        """ジョブをキューに追加してジョブ（dict）を返す
+
+        segmentsを指定すると分割エンコードのジョブになる。segmentsは [(cmd, frames), ...] で、
+        最大parallel個を同時にエンコードし、すべて成功したらcmd（連結コマンド）を実行する。
+        cleanupのパスはジョブの終了後（失敗・キャンセルを含む）に削除する。
+        """
+        with self.lock:
+            job = {
+                "id": self.next_id,
+                "name": name,
+                "cmd": list(cmd),
+                "output": output,
+                "total_frames": total_frames,
+                "frame": 0,
+                "status": 'QUEUED',
+                "error": "",
+                "log_path": None,
+                "processes": [],
+                "segments": segments,
+                "parallel": max(1, parallel),
+                "cleanup": list(cleanup),
+            }
+            self.next_id += 1
+            self.jobs.append(job)
+            self.queue.put(job)
+            self._ensure_workers()
+        return job
+
+    def _ensure_workers(self):
+        """ワーカースレッドを起動する（self.lockを取得した状態で呼ぶ）"""
+        self.threads = [t for t in self.threads if t.is_alive()]
+        while len(self.threads) < self.max_workers:
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _worker(self):
+        import queue
+        while True:
+            try:
+                job = self.queue.get(timeout=5.0)
+            except queue.Empty:
+                # submit()と同じロックの下で確認してから終了する（終了直前に追加されたジョブを取り残さない）
+                with self.lock:
+                    if self.queue.empty():
+                        self.threads.remove(threading.current_thread())
+                        return
+                continue
+            if self._start(job):
+                if job["segments"]:
+                    self._run_segmented(job)
+                else:
+                    self._run(job)
+            else:
+                # 開始前にキャンセルされたジョブ（連結リストは投入時に作成済み）
+                self._cleanup(job)
+
+    def _run_process(self, job, cmd, on_frame=None):
+        """FFmpegを実行して終了コードを返す（起動できない場合はNone）。進捗のフレーム番号をon_frameに渡す"""
+        import tempfile
+        # -progress pipe:1 で標準出力に key=value 形式の進捗を出力させる
+        cmd = cmd[:1] + ['-progress', 'pipe:1', '-nostats'] + cmd[1:]
+        if job["status"] == 'CANCELLED':
+            return None
+        log_file = tempfile.NamedTemporaryFile('w', prefix="mp4_convert_", suffix=".log", delete=False)
+        try:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=log_file,
+                                       stdin=subprocess.DEVNULL, universal_newlines=True)
+        except OSError as e:
+            log_file.close()
+            job["error"] = str(e)
+            return None
+        with self.lock:
+            job["processes"].append(process)
+            # 起動中にキャンセルされた場合はすぐに終了させる
+            if job["status"] == 'CANCELLED':
+                process.terminate()
+        for line in process.stdout:
+            key, _, value = line.strip().partition('=')
+            if key == 'frame' and value.isdigit() and on_frame is not None:
+                on_frame(int(value))
+        process.wait()
+        log_file.close()
+        with self.lock:
+            job["processes"].remove(process)
+        if process.returncode != 0 and job["status"] != 'CANCELLED':
+            job["log_path"] = log_file.name
+            job["error"] = _read_log_tail(log_file.name)
+        elif job["log_path"] is None:
+            job["log_path"] = log_file.name
+        return process.returncode
+
+    def _cleanup(self, job):
+        for path in job["cleanup"]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _finish(self, job, ok):
+        # 一時ファイルは成功・失敗・キャンセルのどの場合も削除する（ジョブのプロセスは終了済み）
+        self._cleanup(job)
+        if job["status"] == 'CANCELLED':
+            return
+        if ok:
+            job["status"] = 'DONE'
+            job["frame"] = max(job["frame"], job["total_frames"])
+        else:
+            job["status"] = 'FAILED'
+
+    def _start(self, job):
+        """キャンセルされていなければジョブをRUNNINGにしてTrueを返す"""
+        with self.lock:
+            if job["status"] != 'QUEUED':
+                return False
+            job["status"] = 'RUNNING'
+            return True
+
+    def _run(self, job):
+        returncode = self._run_process(job, job["cmd"], lambda frame: job.update(frame=frame))
+        self._finish(job, returncode == 0)
+
+    def _run_segmented(self, job):
+        """セグメントを並列にエンコードしてから連結する"""
+        from concurrent.futures import ThreadPoolExecutor
+        progress = [0] * len(job["segments"])
+        
+        def encode(i):
+            if job["status"] == 'CANCELLED':
+                return False
+            def on_frame(frame):
+                progress[i] = frame
+                job["frame"] = sum(progress)
+            return self._run_process(job, job["segments"][i][0], on_frame) == 0
+        
+        with ThreadPoolExecutor(max_workers=job["parallel"]) as executor:
+            results = list(executor.map(encode, range(len(job["segments"]))))
+        if not all(results) or job["status"] == 'CANCELLED':
+            self._finish(job, False)
+            return
+        # 再エンコードせずに連結する（-c copy）
+        self._finish(job, self._run_process(job, job["cmd"]) == 0)
+
+    def cancel(self, job_id=None):
+        """ジョブをキャンセルする。job_idがNoneの場合は未完了のすべてのジョブ"""
+        with self.lock:
+            for job in self.jobs:
+                if job_id is not None and job["id"] != job_id:
+                    continue
+                if job["status"] in ('QUEUED', 'RUNNING'):
+                    job["status"] = 'CANCELLED'
+                    for process in job["processes"]:
+                        if process.poll() is None:
+                            process.terminate()
+
+    def clear_finished(self):
+        with self.lock:
+            self.jobs = [j for j in self.jobs if j["status"] in ('QUEUED', 'RUNNING')]
+
+    @property
+    def active(self):
+        return any(j["status"] in ('QUEUED', 'RUNNING') for j in self.jobs)
+
+def mp4_encode_args(extension):
+    """画像シーケンスをMP4にエンコードするFFmpegの出力オプション（RENDER_OT_convert_to_mp4と同じ設定）"""
+    if extension == 'exr':
+        return ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-crf', '18', '-preset', 'slow', '-colorspace', 'bt709']
+    return ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-vf', 'format=yuv420p', '-crf', '23', '-preset', 'medium']
+
+# 分割エンコードの1セグメントの最小フレーム数（短すぎると圧縮効率が落ちる）
+MP4_MIN_SEGMENT_FRAMES = 250
+
+def segmented_mp4_commands(ffmpeg_path, input_pattern, start_number, frame_count, fps, encode_args,
+                           output, segment_count):
+    """連番を分割してエンコードし、concat demuxerで連結するためのコマンドを作成する
+
+    各セグメントは -start_number と -frames:v で正確なフレーム数を読み込み、クローズドGOPで
+    エンコードする（セグメントの先頭は必ずキーフレーム）。連結リストに各セグメントの長さを
+    書いておくので、連結後のフレーム数とタイミングは1回でエンコードした場合と一致する。
+    (segments, concat_cmd, temp_paths) を返す。segmentsは [(cmd, frames), ...]。
+    """
+    segment_dir = os.path.dirname(output) or "."
+    base = os.path.splitext(os.path.basename(output))[0]
+    segments = []
+    temp_paths = []
+    list_lines = ["ffconcat version 1.0"]
+    for i, (first, last) in enumerate(split_frame_range(start_number, start_number + frame_count - 1,
+                                                        chunk_count=segment_count)):
+        frames = last - first + 1
+        segment_path = os.path.join(segment_dir, f".{base}_segment_{i:03d}.mp4")
+        cmd = [ffmpeg_path, '-framerate', str(fps), '-start_number', str(first), '-i', input_pattern,
+               '-frames:v', str(frames)] + encode_args + ['-flags', '+cgop', '-y', segment_path]
+        segments.append((cmd, frames))
+        temp_paths.append(segment_path)
+        escaped = os.path.basename(segment_path).replace("'", "'\\''")
+        list_lines.append(f"file '{escaped}'")
+        list_lines.append(f"duration {frames / fps:.6f}")
+    
+    list_path = os.path.join(segment_dir, f".{base}_segments.ffconcat")
+    with open(list_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(list_lines) + "\n")
+    temp_paths.append(list_path)
+    concat_cmd = [ffmpeg_path, '-f', 'concat', '-safe', '0', '-i', list_path, '-c', 'copy',
+                  '-movflags', '+faststart', '-y', output]
+    return segments, concat_cmd, temp_paths
+
+# image2pipeで読み込む際の拡張子ごとのデコーダ
+PIPE_DECODERS = {
+    'png': 'png',
+    'jpg': 'mjpeg',
+    'jpeg': 'mjpeg',
+    'exr': 'exr',
+    'tif': 'tiff',
+    'tiff': 'tiff',
+    'tga': 'targa',
+    'bmp': 'bmp',
+}
+
+class StreamingEncoder:
+    """レンダリング中に書き出されたフレームを順番にFFmpegの標準入力へ送り、MP4を逐次エンコードする
+
+    フレームは次の場合に送信できるとみなす: notify()で書き込み完了が通知された
+    （render_writeハンドラ）、またはファイルが0バイトでなく最終更新からsettle_time秒経過した
+    （別プロセスのレンダリングを監視する場合）。
+    """
+
+    def __init__(self, ffmpeg_path, frame_paths, output, fps, settle_time=1.0, log=print):
+        import tempfile
+        self.frame_paths = list(frame_paths)
+        self.index_by_path = {os.path.normcase(os.path.abspath(p)): i for i, p in enumerate(self.frame_paths)}
+        self.output = output
+        self.settle_time = settle_time
+        self.log = log
+        self.next_index = 0
+        self.notified = set()
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.thread = None
+        
+        extension = os.path.splitext(self.frame_paths[0])[1].lower().lstrip('.') if self.frame_paths else 'png'
+        cmd = [ffmpeg_path, '-f', 'image2pipe', '-framerate', str(fps),
+               '-c:v', PIPE_DECODERS.get(extension, 'png'), '-i', '-']
+        cmd += mp4_encode_args(extension) + ['-y', output]
+        self.log_file = tempfile.NamedTemporaryFile('w', prefix="mp4_stream_", suffix=".log", delete=False)
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self.log_file)
+
+    def notify(self, path):
+        """フレームの書き込み完了を通知する"""
+        index = self.index_by_path.get(os.path.normcase(os.path.abspath(path)))
+        if index is not None:
+            self.notified.add(index)
+
+    def _is_ready(self, index, force):
+        path = self.frame_paths[index]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size == 0:
+            return False
+        return force or index in self.notified or time.time() - stat.st_mtime >= self.settle_time
+
+    def pump(self, force=False):
+        """送信可能なフレームをフレーム順にFFmpegへ送る。送信したフレーム数を返す"""
+        sent = 0
+        with self.lock:
+            while self.next_index < len(self.frame_paths) and self.process.poll() is None:
+                if not self._is_ready(self.next_index, force):
+                    break
+                with open(self.frame_paths[self.next_index], 'rb') as f:
+                    data = f.read()
+                try:
+                    self.process.stdin.write(data)
+                except (BrokenPipeError, OSError):
+                    break
+                self.next_index += 1
+                sent += 1
+        return sent
+
+    def watch(self, interval=0.5):
+        """出力ディレクトリを監視するスレッドを開始する（別プロセスでレンダリングする場合）"""
+        def loop():
+            while not self.finished.wait(interval):
+                self.pump()
+        self.thread = threading.Thread(target=loop, daemon=True)
+        self.thread.start()
+
+    def finish(self, wait=False):
+        """残りのフレームを送ってエンコードを完了する。wait=Falseの場合はバックグラウンドで完了させる"""
+        def close():
+            self.finished.set()
+            if self.thread is not None and self.thread is not threading.current_thread():
+                self.thread.join()
+            self.pump(force=True)
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+            self.process.wait()
+            self.log_file.close()
+            total = len(self.frame_paths)
+            if self.process.returncode != 0:
+                self.log(f"Streaming MP4 encode failed: {_read_log_tail(self.log_file.name)}")
+            elif self.next_index < total:
+                self.log(f"Streaming MP4 stopped at frame {self.next_index}/{total}: {self.output}")
+            else:
+                self.log(f"Streaming MP4 created ({total} frames): {self.output}")
+        if wait:
+            close()
+        else:
+            threading.Thread(target=close, daemon=True).start()
+
+    def cancel(self):
+        self.finished.set()
+        if self.process.poll() is None:
+            self.process.kill()
+
+def _read_log_tail(path, max_lines=5):
+    """ログファイルの最後の数行を返す（エラーメッセージ用）"""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            lines = [line.strip() for line in f if line.strip()]
+    except OSError:
+        return ""
+    return " / ".join(lines[-max_lines:])
+
+def runner_main(argv):
+    """スタンドアロンのランナー
+
+    python MultiRenders.py --blend scene.blend --profiles 0 1 2 -j 4
+    python MultiRenders.py --manifest scene_render.json --chunk-size 50 -j 8
+    python MultiRenders.py --manifest scene_render.json --coordinator --host 0.0.0.0 --local-workers 2
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Run Multi Render Settings Manager profiles as concurrent Blender processes")
+    parser.add_argument("--manifest", help="JSON job manifest exported with the batch file")
+    parser.add_argument("--blend", help=".blend file containing the render profiles (without --manifest)")
+    parser.add_argument("--profiles", type=int, nargs="+", help="Profile indices to render (without --manifest)")
+    parser.add_argument("--chunk-size", type=int, default=0, help="Split frame ranges into chunks of this size "
+                                                                  "(requires --manifest)")
+    parser.add_argument("--chunk-count", type=int, default=0, help="Split each frame range into this many chunks "
+                                                                   "(requires --manifest)")
+    parser.add_argument("-j", "--jobs", type=int, default=2, help="Maximum number of concurrent Blender processes")
+    parser.add_argument("--blender", default="blender", help="Path to the Blender executable")
+    parser.add_argument("--log-dir", default=None, help="Write each job's output to a log file in this directory")
+    parser.add_argument("--resume", action="store_true", help="Render only frames that are missing or empty on disk")
+    # メモリに応じた同時実行数の制御
+    parser.add_argument("--memory-reserve", type=float, default=MEMORY_RESERVE_MB,
+                        help="MB of RAM to keep free; queued jobs wait while the next job would not fit")
+    parser.add_argument("--no-memory-check", action="store_true",
+                        help="Always run --jobs processes regardless of available memory")
+    # ワーカーのスレッド数とCPUの割り当て
+    parser.add_argument("--threads-mode", choices=["none", "throughput", "latency"], default="none",
+                        help="throughput: split the cores between --jobs narrow workers (-t); "
+                             "latency: at most one wide worker per NUMA node; none: Blender's default")
+    parser.add_argument("--pin-cpus", action="store_true",
+                        help="Pin each worker to its own CPU set (Linux, requires --threads-mode)")
+    # ワーカーの監視と再起動
+    parser.add_argument("--frame-timeout", type=float, default=0.0,
+                        help="Stop a worker that writes no frame for this many seconds (0 disables the watchdog)")
+    parser.add_argument("--startup-timeout", type=float, default=None,
+                        help="Timeout while Blender loads the file and prepares a profile, before its first frame "
+                             f"(default: {STARTUP_TIMEOUT_FACTOR}x --frame-timeout)")
+    parser.add_argument("--retries", type=int, default=0,
+                        help="Restart a crashed or hung worker from its first unfinished frame up to this many times")
+    parser.add_argument("--failure-report", default=None,
+                        help=f"Where to write the per-profile failure report (default: {FAILURE_REPORT_NAME} "
+                             "in --log-dir or the current directory)")
+    # 複数ノードでの分散レンダリング
+    parser.add_argument("--coordinator", action="store_true",
+                        help="Serve the manifest's frame chunks to workers (render_from_cli -- --worker URL)")
+    parser.add_argument("--host", default="127.0.0.1", help="Coordinator address (0.0.0.0 to accept other nodes)")
+    parser.add_argument("--port", type=int, default=8765, help="Coordinator port")
+    parser.add_argument("--lease-seconds", type=float, default=600.0,
+                        help="Seconds without a heartbeat before a chunk is given to another worker")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Attempts per chunk before it is marked failed")
+    parser.add_argument("--local-workers", type=int, default=0,
+                        help="Number of worker processes to start on this machine")
+    args = parser.parse_args(argv)
+
+    if args.coordinator:
+        if not args.manifest:
+            parser.error("--coordinator requires --manifest")
+        return coordinator_main(args)
+
+    extra_args = ["--resume"] if args.resume else []
+    if args.manifest:
+        jobs = manifest_jobs(load_job_manifest(args.manifest), args.blender,
+                             args.chunk_size, args.chunk_count, extra_args)
+    elif args.blend and args.profiles:
+        jobs = [make_render_job(f"profile_{idx}", os.path.abspath(args.blend), idx, blender_path=args.blender,
+                                extra_args=extra_args)
+                for idx in args.profiles]
+    else:
+        parser.error("either --manifest or both --blend and --profiles are required")
+    memory = None if args.no_memory_check else MemoryAdmission(args.memory_reserve)
+    slots = plan_thread_slots(args.jobs, args.threads_mode.upper())
+    pool = RenderJobPool(jobs, args.jobs, log_dir=args.log_dir, memory=memory, slots=slots, pin_cpus=args.pin_cpus,
+                         frame_timeout=args.frame_timeout, max_retries=args.retries,
+                         startup_timeout=args.startup_timeout)
+    try:
+        exit_code = pool.run()
+    except KeyboardInterrupt:
+        pool.cancel()
+        exit_code = 1
+    for line in pool.summary():
+        print(line)
+    if pool.failures:
+        import json
+        report_path = args.failure_report or os.path.join(args.log_dir or ".", FAILURE_REPORT_NAME)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(pool.failure_report(), f, indent=2, ensure_ascii=False)
+        print(f"Failure report: {report_path}")
+    return exit_code
+
+# 通常のPythonから実行された場合はここでランナーを起動して終了する
+if bpy is None:
+    if __name__ == "__main__":
+        sys.exit(runner_main(sys.argv[1:]))
+    raise ImportError("MultiRenders.py requires Blender's bpy module unless run as a standalone runner")
+
+# パネル描画用のキャッシュ
+# カメラ名の集合（depsgraph_update_post/load_postで無効化）と、
+# プロファイルごとの出力パス・CLIコマンド（プロパティのupdateコールバックで無効化）
+_camera_names_cache = None
+_panel_cache = {}
+
+def camera_names():
+    """シーン内のカメラオブジェクト名の集合を返す（キャッシュ済み）"""
+    global _camera_names_cache
+    if _camera_names_cache is None:
+        _camera_names_cache = frozenset(obj.name for obj in bpy.data.objects if obj.type == 'CAMERA')
+    return _camera_names_cache
+
+def invalidate_camera_cache():
+    global _camera_names_cache
+    _camera_names_cache = None
+
+def invalidate_panel_cache(self=None, context=None):
+    """出力パスとCLIコマンドのキャッシュを破棄する（プロパティのupdateコールバックとしても使用）"""
+    _panel_cache.clear()
+
+@persistent
+def _on_load_post(*args):
+    # ファイルの読み込みやUndo/Redoではデータが丸ごと入れ替わるため両方のキャッシュを破棄
+    invalidate_camera_cache()
+    invalidate_panel_cache()
+
+@persistent
+def _on_depsgraph_update_post(scene, depsgraph=None):
+    # カメラの集合が変わった場合（カメラの削除・追加・名前変更）のみカメラ名の集合を作り直す
+    if _camera_names_cache is None:
+        return
+    # 削除されたオブジェクトはdepsgraphの更新に現れないので、キャッシュ中のカメラが残っているかを確認する
+    # （オブジェクト数では、カメラの削除と別のオブジェクトの追加が同時にあると気付けない）
+    objects = bpy.data.objects
+    for name in _camera_names_cache:
+        obj = objects.get(name)
+        if obj is None or obj.type != 'CAMERA':
+            invalidate_camera_cache()
+            return
+    if depsgraph is None:
+        return
+    for update in depsgraph.updates:
+        obj = update.id
+        if isinstance(obj, bpy.types.Object) and obj.type == 'CAMERA' and obj.name not in _camera_names_cache:
+            invalidate_camera_cache()
+            return
 
 # 個々のレンダリング設定項目
 class RenderSettingsItem(bpy.types.PropertyGroup):
@@ -35,27 +1750,31 @@ class RenderSettingsItem(bpy.types.PropertyGroup):
         name="Output Path",
         description="Path for rendered frames (relative to blend file)",
         default="renders/",
-        subtype='DIR_PATH'
+        subtype='DIR_PATH',
+        update=invalidate_panel_cache
     )
     
     start_frame: IntProperty(
         name="Start Frame",
         description="First frame to render",
         default=0,
-        min=-1000
+        min=-1000,
+        update=invalidate_panel_cache
     )
     
     end_frame: IntProperty(
         name="End Frame",
         description="Last frame to render",
         default=250,
-        min=-1000
+        min=-1000,
+        update=invalidate_panel_cache
     )
     
     camera_name: StringProperty(
         name="Camera Name",
         description="Name of the camera to use for rendering",
-        default="Camera"
+        default="Camera",
+        update=invalidate_panel_cache
     )
     
     is_expanded: BoolProperty(
@@ -63,6 +1782,42 @@ class RenderSettingsItem(bpy.types.PropertyGroup):
         description="Whether this profile is expanded in the UI",
         default=False
     )
+    
+    # ドラフトレンダリング（Render Drafts）で一時的に上書きする設定
+    draft_resolution_percentage: IntProperty(
+        name="Resolution %",
+        description="Resolution scale used for draft renders",
+        default=50,
+        min=1,
+        max=100,
+        subtype='PERCENTAGE'
+    )
+    
+    draft_samples: IntProperty(
+        name="Samples",
+        description="Render samples used for draft renders (Cycles and EEVEE)",
+        default=16,
+        min=1
+    )
+    
+    draft_simplify: BoolProperty(
+        name="Simplify",
+        description="Enable the scene's Simplify settings for draft renders",
+        default=True
+    )
+    
+    draft_denoise: BoolProperty(
+        name="Denoise",
+        description="Use the denoiser for draft renders (Cycles)",
+        default=True
+    )
+    
+    draft_frame_step: IntProperty(
+        name="Frame Step",
+        description="Render every Nth frame for draft renders",
+        default=1,
+        min=1
+    )
 
 # 設定を保存するためのプロパティグループ
 class RenderSettingsProperties(bpy.types.PropertyGroup):
@@ -82,8 +1837,899 @@ class RenderSettingsProperties(bpy.types.PropertyGroup):
         name="Common Output Path",
         description="Base output path for all render profiles",
         default="//",
-        subtype='DIR_PATH'
+        subtype='DIR_PATH',
+        update=invalidate_panel_cache
+    )
+    
+    # 並列レンダリングの同時実行数
+    parallel_workers: IntProperty(
+        name="Parallel Workers",
+        description="Maximum number of background Blender processes rendering at the same time",
+        default=2,
+        min=1,
+        max=256
+    )
+    
+    # 空きメモリに収まる場合だけ次のワーカーを起動する
+    memory_aware: BoolProperty(
+        name="Memory-Aware",
+        description="Start the next worker only when its expected peak memory (from earlier renders) fits "
+                    "in the available RAM; queued jobs wait instead of running out of memory",
+        default=True
+    )
+    
+    memory_reserve: IntProperty(
+        name="Memory Reserve (MB)",
+        description="RAM to keep free for the system and this Blender session",
+        default=MEMORY_RESERVE_MB,
+        min=0,
+        max=1048576
+    )
+    
+    # 同時に実行するワーカーのスレッド数（-t）の割り当て
+    thread_budget: EnumProperty(
+        name="Threads",
+        description="How CPU cores are shared between concurrent Blender workers",
+        items=[
+            ('NONE', "All Cores", "Every Blender process uses all cores (Blender's default, no -t)"),
+            ('THROUGHPUT', "Throughput", "Run Parallel Workers narrow processes and split the cores between them"),
+            ('LATENCY', "Latency", "Run fewer, wider processes: at most one per NUMA node using all of its cores"),
+        ],
+        default='NONE',
+        update=invalidate_panel_cache
+    )
+    
+    pin_cpus: BoolProperty(
+        name="Pin to CPUs",
+        description="Restrict each worker to its own set of cores so workers do not migrate between "
+                    "NUMA nodes (Linux only; exported shell scripts use taskset)",
+        default=False
+    )
+    
+    # ワーカーの監視（ハング・クラッシュからの再起動）
+    watchdog_timeout: IntProperty(
+        name="Frame Timeout (s)",
+        description="Stop a worker that writes no frame for this many seconds (0 disables the watchdog)",
+        default=0,
+        min=0
     )
+    
+    max_retries: IntProperty(
+        name="Retries",
+        description="Restart a crashed or hung worker from its first unfinished frame up to this many times",
+        default=0,
+        min=0,
+        max=100
+    )
+    
+    # バッチファイルで1つのBlenderプロセスにすべてのプロファイルをまとめる
+    single_process: BoolProperty(
+        name="Single Blender Process",
+        description="Export one command that loads the .blend once and renders all enabled profiles in sequence "
+                    "(chunking is not applied)",
+        default=False
+    )
+    
+    # バッチファイルと一緒にJSONのジョブマニフェストを書き出す
+    write_manifest: BoolProperty(
+        name="Write Job Manifest",
+        description="Also write a JSON manifest of all enabled profiles next to the batch file "
+                    "for external schedulers and the standalone runner",
+        default=False
+    )
+    
+    # ドラフト（プレビュー）レンダリング
+    render_drafts: BoolProperty(
+        name="Render Drafts",
+        description="Render with each profile's draft overrides (resolution, samples, simplify, denoiser, "
+                    "frame step) into a 'drafts' folder next to the normal output",
+        default=False
+    )
+    
+    # 入力が変わっていないフレームをスキップ
+    render_cache: EnumProperty(
+        name="Skip Unchanged Frames",
+        description="Hash the inputs of each frame and skip frames whose hash and output file are unchanged "
+                    "since the last render (hashes are kept in render_cache.json next to the output)",
+        items=[
+            ('NONE', "Off", "Render every frame"),
+            ('SCENE', "Scene Contents", "Hash the evaluated scene per frame (transforms, geometry and attributes, "
+                                        "lights, cameras, material and world nodes, links and image files). "
+                                        "Compositor nodes, view layer settings and files other than images and "
+                                        "volumes are not checked"),
+            ('FILE', "Blend File", "Hash the .blend file and linked libraries (any save re-renders everything)"),
+        ],
+        default='NONE'
+    )
+    
+    # 動きのない区間は1フレームだけレンダリング
+    static_spans: BoolProperty(
+        name="Render Static Spans Once",
+        description="Find spans where the camera and everything in the scene are unchanged, render one frame "
+                    "per span and hardlink (or copy) it to the other frame files",
+        default=False
+    )
+    
+    # 粗い順（16フレームおき→8→…）にレンダリングしてタイムライン全体を早く確認する
+    progressive_order: BoolProperty(
+        name="Progressive Frame Order",
+        description="Render every Nth frame of each profile first, then fill the gaps level by level "
+                    "(each frame is written to its final file, so the run can be stopped at any level)",
+        default=False
+    )
+    
+    progressive_step: IntProperty(
+        name="Coarsest Step",
+        description="Frame interval of the first pass (rounded down to a power of two)",
+        default=16,
+        min=2,
+        max=1024
+    )
+    
+    # プロファイル間でシーンデータを再利用
+    persistent_data: BoolProperty(
+        name="Persistent Data Between Profiles",
+        description="Render profiles with the same frame range one after another and keep the synced scene "
+                    "(BVH, textures, shaders) with Persistent Data, so profiles that differ only by camera "
+                    "skip the scene rebuild",
+        default=False
+    )
+    
+    # 途中から再開（既存のフレームをスキップ）
+    resume_missing: BoolProperty(
+        name="Resume (Missing Frames Only)",
+        description="Render only frames whose output file is missing or empty",
+        default=False
+    )
+    
+    # 共有ファイルシステム上で複数のマシンがフレームを分担
+    shared_claiming: BoolProperty(
+        name="Shared Output (Multi-Machine)",
+        description="Exported commands claim frame chunks with lock files next to the output, so the same "
+                    "batch file can run on several machines writing to one network share. Existing frames are "
+                    "never overwritten: delete the output and its .done markers to render again after edits",
+        default=False
+    )
+    
+    # レンダリング中にMP4を逐次エンコード
+    stream_mp4: BoolProperty(
+        name="Encode MP4 While Rendering",
+        description="Feed each finished frame to a running FFmpeg process so the MP4 is ready "
+                    "shortly after the last frame is written",
+        default=False
+    )
+    
+    # MP4変換バッチの並列実行数
+    mp4_parallel_jobs: IntProperty(
+        name="Parallel Conversions",
+        description="Maximum number of FFmpeg processes the exported MP4 script runs at the same time "
+                    "(1 converts profiles one after another)",
+        default=1,
+        min=1,
+        max=64
+    )
+    
+    # 1つの連番を分割して並列にエンコード
+    mp4_segment_workers: IntProperty(
+        name="Segment Encoders",
+        description="Encode long sequences as segments in this many parallel FFmpeg processes and join them "
+                    "without re-encoding (1 encodes the whole sequence in one process)",
+        default=1,
+        min=1,
+        max=64
+    )
+    
+    # フレーム範囲のチャンク分割
+    chunk_mode: EnumProperty(
+        name="Chunking",
+        description="How to split each profile's frame range into separate CLI jobs",
+        items=[
+            ('NONE', "Whole Range", "Render each profile as a single job"),
+            ('SIZE', "Fixed Size", "Split into chunks of a fixed number of frames"),
+            ('COUNT', "N-Way", "Split into a fixed number of equally sized chunks"),
+            ('HISTORY', "Balanced (History)", "Size chunks from measured per-frame render times so all workers "
+                                              "finish together (profiles without history use N-Way)"),
+        ],
+        default='NONE'
+    )
+    
+    chunk_size: IntProperty(
+        name="Chunk Size",
+        description="Number of frames per chunk",
+        default=50,
+        min=1
+    )
+    
+    chunk_count: IntProperty(
+        name="Chunk Count",
+        description="Number of chunks per profile",
+        default=4,
+        min=1
+    )
+
+def resolve_output_path(common_path, profile_path):
+    """共通出力パスとプロファイルの出力パスを結合する"""
+    if common_path.startswith("//") and profile_path.startswith("//"):
+        # 両方が相対パスの場合、common_pathの「//」を削除してから結合し、先頭に「//」を付け直す
+        return "//" + common_path[2:] + profile_path[2:]
+    # どちらかが絶対パスの場合は単純に結合
+    return os.path.join(common_path, profile_path[2:] if profile_path.startswith("//") else profile_path)
+
+def profile_chunks(settings, profile):
+    """チャンク設定に従ってプロファイルのフレーム範囲を分割する"""
+    if settings.chunk_mode == 'SIZE':
+        return split_frame_range(profile.start_frame, profile.end_frame, chunk_size=settings.chunk_size)
+    if settings.chunk_mode in ('COUNT', 'HISTORY'):
+        return split_frame_range(profile.start_frame, profile.end_frame, chunk_count=settings.chunk_count)
+    return [(profile.start_frame, profile.end_frame)]
+
+def profile_frame_costs(settings, enabled_profiles):
+    """各プロファイルの出力先のタイミングログから秒/フレームの履歴を取得する（履歴がなければNone）"""
+    history = {}
+    costs = {}
+    for profile_idx, profile in enabled_profiles:
+        output_path = bpy.path.abspath(resolve_output_path(settings.common_output_path, profile.output_path))
+        log_path = timing_log_path(output_path)
+        if log_path not in history:
+            history[log_path] = frame_cost_history(load_timing_log(log_path))
+        costs[profile_idx] = history[log_path].get((profile.name, profile.camera_name))
+    return costs
+
+def profile_peak_memory(settings, enabled_profiles):
+    """各プロファイルの出力先のタイミングログから記録済みのピークメモリ（MB）を取得する（記録がなければNone）"""
+    history = {}
+    peaks = {}
+    for profile_idx, profile in enabled_profiles:
+        output_path = bpy.path.abspath(resolve_output_path(settings.common_output_path, profile.output_path))
+        log_path = timing_log_path(output_path)
+        if log_path not in history:
+            history[log_path] = summarize_timings(load_timing_log(log_path))
+        peaks[profile_idx] = history[log_path].get(profile.name, {}).get("peak_mem_mb")
+    return peaks
+
+def plan_profile_chunks(settings, enabled_profiles):
+    """有効なプロファイルのチャンクを実行順に並べた [(profile_idx, profile, start, end, cost), ...] を返す
+
+    Balanced (History) の場合はレンダリング時間の履歴からParallel Workersの数に合わせて
+    チャンクを作成し、コストの大きい順に並べる。それ以外はprofile_chunksの分割をプロファイル順に並べる。
+    costは見積もり秒数（履歴がない場合はNone）。
+    ドラフトの場合は各チャンクの先頭をプロファイルの開始フレームからdraft_frame_stepおきの位置にそろえる。
+    """
+    if settings.chunk_mode != 'HISTORY':
+        plan = [(profile_idx, profile, start, end, None)
+                for profile_idx, profile in enabled_profiles
+                for start, end in profile_chunks(settings, profile)]
+    else:
+        costs = profile_frame_costs(settings, enabled_profiles)
+        profiles = dict(enabled_profiles)
+        ranges = [{"key": profile_idx, "start": profile.start_frame, "end": profile.end_frame,
+                   "frame_cost": costs[profile_idx], "fallback": profile_chunks(settings, profile)}
+                  for profile_idx, profile in enabled_profiles]
+        plan = [(task["key"], profiles[task["key"]], task["start"], task["end"],
+                 task["cost"] if costs[task["key"]] else None)
+                for task in plan_balanced_chunks(ranges, settings.parallel_workers)]
+    if not settings.render_drafts:
+        return plan
+    return [(profile_idx, profile, aligned_start, aligned_end, cost)
+            for profile_idx, profile, start, end, cost in plan
+            for aligned_start, aligned_end in align_chunks_to_step([(start, end)], profile.start_frame,
+                                                                   profile.draft_frame_step)]
+
+def group_planned_chunks(plan):
+    """plan_profile_chunksの結果をプロファイルごとのフレーム順のチャンクにまとめる"""
+    chunks = {}
+    for profile_idx, profile, start, end, cost in plan:
+        chunks.setdefault(profile_idx, []).append((start, end))
+    return {profile_idx: sorted(ranges) for profile_idx, ranges in chunks.items()}
+
+def plan_chunk_lanes(plan, lanes):
+    """plan_profile_chunksのチャンクを見積もりコストの大きい順に、負荷の最も小さいワーカーの列へ割り当てる
+
+    コストのないチャンク（履歴なし）は計測済みのチャンクの1フレームあたりの中央値（なければ1秒）で見積もる。
+    {(profile_idx, start, end): 列番号} を返す。
+    """
+    known = sorted(cost / (end - start + 1) for profile_idx, profile, start, end, cost in plan if cost)
+    default_cost = known[len(known) // 2] if known else 1.0
+    tasks = sorted(((cost or (end - start + 1) * default_cost, (profile_idx, start, end))
+                    for profile_idx, profile, start, end, cost in plan),
+                   key=lambda task: task[0], reverse=True)
+    assigned = assign_lanes([cost for cost, key in tasks], lanes)
+    return {key: lane for (cost, key), lane in zip(tasks, assigned)}
+
+def order_profiles_for_reuse(profiles):
+    """フレーム範囲とカメラが同じプロファイルが続くように並べる（元の順序はできるだけ維持）
+
+    profilesは (profile_idx, profile) のリスト。
+    """
+    first_seen = {}
+    for order, (profile_idx, profile) in enumerate(profiles):
+        first_seen.setdefault((profile.start_frame, profile.end_frame), order)
+    return sorted(profiles, key=lambda item: (first_seen[(item[1].start_frame, item[1].end_frame)],
+                                              item[1].camera_name))
+
+def report_sync_savings(records, log=print):
+    """永続データで省けたシーン同期の時間を出力する"""
+    estimate = estimate_sync_savings(records)
+    if estimate is None:
+        log("Persistent data: not enough frames to estimate the saved sync time")
+        return
+    saved, cold = estimate
+    log(f"Persistent data: saved about {format_duration(saved)} of scene sync "
+        f"(cold sync {cold:.1f}s per profile)")
+
+def apply_draft_overrides(scene, profile):
+    """プロファイルのドラフト設定をシーンに適用し、復元用の元の値を返す"""
+    render = scene.render
+    overrides = [
+        (render, "resolution_percentage", profile.draft_resolution_percentage),
+        (render, "use_simplify", profile.draft_simplify or render.use_simplify),
+        (scene, "frame_step", profile.draft_frame_step),
+    ]
+    if render.engine == 'CYCLES':
+        overrides += [
+            (scene.cycles, "samples", profile.draft_samples),
+            (scene.cycles, "use_denoising", profile.draft_denoise),
+        ]
+    elif render.engine.startswith('BLENDER_EEVEE'):
+        overrides.append((scene.eevee, "taa_render_samples", profile.draft_samples))
+    
+    saved = []
+    for owner, attr, value in overrides:
+        saved.append((owner, attr, getattr(owner, attr)))
+        setattr(owner, attr, value)
+    return saved
+
+def restore_draft_overrides(saved):
+    """apply_draft_overridesで変更した設定を元に戻す"""
+    for owner, attr, value in reversed(saved):
+        setattr(owner, attr, value)
+
+def find_missing_frames(scene, start, end):
+    """出力ファイルが存在しないか0バイトのフレーム番号のリストを返す
+
+    scene.render.filepath が設定済みであること。####パターンや拡張子の扱いは
+    frame_path() によってBlenderが実際に書き出すファイル名と一致する。
+    """
+    directory = os.path.dirname(scene.render.frame_path(frame=start))
+    sizes = scan_frame_sequences(directory)["sizes"]
+    missing = []
+    # frame_step（ドラフトレンダリングなど）でレンダリングしないフレームは数えない
+    for frame in range(start, end + 1, max(1, scene.frame_step)):
+        path = scene.render.frame_path(frame=frame)
+        if os.path.dirname(path) == directory:
+            size = sizes.get(os.path.basename(path), 0)
+        else:
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size == 0:
+            missing.append(frame)
+    return missing
+
+def render_settings_digest(scene):
+    """出力に影響するレンダー設定（カメラ、出力先、解像度、エンジン、サンプル数など）の文字列"""
+    render = scene.render
+    values = [scene.camera.name if scene.camera else "", render.filepath, render.engine,
+              render.resolution_x, render.resolution_y, render.resolution_percentage,
+              render.image_settings.file_format, render.use_simplify]
+    if render.engine == 'CYCLES':
+        values += [scene.cycles.samples, scene.cycles.use_denoising]
+    elif render.engine.startswith('BLENDER_EEVEE'):
+        values.append(scene.eevee.taa_render_samples)
+    return repr(values)
+
+def _image_values(image):
+    """画像のファイルパス、シーケンスの設定、ファイルの更新時刻とサイズ（差し替えを検出する）"""
+    values = [image.name, image.source, image.filepath]
+    if image.packed_file is not None:
+        values.append(("packed", image.packed_file.size))
+    else:
+        try:
+            stat = os.stat(bpy.path.abspath(image.filepath, library=image.library))
+            values.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            values.append("missing")
+    return values
+
+def _node_tree_values(node_tree, visited=None):
+    """ノードの種類、入力の値、リンク、画像、ノードグループの中身を列挙する（マテリアルとワールドのハッシュ用）"""
+    if visited is None:
+        visited = set()
+    if node_tree.name in visited:
+        return
+    visited.add(node_tree.name)
+    for node in node_tree.nodes:
+        yield node.name, node.bl_idname, node.mute
+        for socket in node.inputs:
+            value = getattr(socket, "default_value", None)
+            if value is None:
+                continue
+            try:
+                value = tuple(value)
+            except TypeError:
+                pass
+            yield socket.identifier, value
+        image = getattr(node, "image", None)
+        if image is not None:
+            yield tuple(_image_values(image))
+            image_user = getattr(node, "image_user", None)
+            if image_user is not None and image.source in ('SEQUENCE', 'MOVIE'):
+                yield "image_user", image_user.frame_current, image_user.frame_offset
+        group = getattr(node, "node_tree", None)
+        if group is not None:
+            yield "group", group.name
+            yield from _node_tree_values(group, visited)
+    for link in node_tree.links:
+        yield ("link", link.from_node.name, link.from_socket.identifier,
+               link.to_node.name, link.to_socket.identifier, link.is_muted)
+
+def _foreach_bytes(collection, prop, width, typecode='f'):
+    """コレクションのプロパティをforeach_getで読み出したバイト列（読めない場合は空）"""
+    from array import array
+    values = array(typecode, [0]) * (len(collection) * width)
+    try:
+        collection.foreach_get(prop, values)
+    except (AttributeError, RuntimeError, TypeError, ValueError):
+        return b""
+    return values.tobytes()
+
+def _mesh_digest(digest, mesh):
+    """メッシュの頂点座標、トポロジー、属性（UVや頂点カラーを含む）をハッシュに加える"""
+    digest.update(_foreach_bytes(mesh.vertices, "co", 3))
+    digest.update(repr((len(mesh.edges), len(mesh.polygons), len(mesh.loops))).encode('utf-8'))
+    for attribute in getattr(mesh, "attributes", ()):
+        digest.update(repr((attribute.name, attribute.data_type, attribute.domain)).encode('utf-8'))
+        prop, width = {"FLOAT_VECTOR": ("vector", 3), "FLOAT2": ("vector", 2), "FLOAT_COLOR": ("color", 4),
+                       "BYTE_COLOR": ("color", 4), "QUATERNION": ("value", 4)}.get(attribute.data_type, ("value", 1))
+        typecode = 'i' if attribute.data_type in ('INT', 'INT8', 'BOOLEAN') else 'f'
+        digest.update(_foreach_bytes(attribute.data, prop, width, typecode))
+    for uv_layer in mesh.uv_layers:
+        digest.update(uv_layer.name.encode('utf-8'))
+        digest.update(_foreach_bytes(uv_layer.data, "uv", 2))
+
+def _object_data_digest(digest, obj):
+    """メッシュ以外のジオメトリ（カーブ、テキスト、メタボール、ヘア、点群、ボリューム、グリースペンシル）"""
+    if obj.type in ('CURVE', 'SURFACE', 'FONT', 'META'):
+        # 評価済みのオブジェクトをメッシュにしてから比較する
+        try:
+            mesh = obj.to_mesh()
+        except RuntimeError:
+            mesh = None
+        if mesh is not None:
+            _mesh_digest(digest, mesh)
+            obj.to_mesh_clear()
+    elif obj.type == 'CURVES':
+        digest.update(_foreach_bytes(obj.data.points, "position", 3))
+    elif obj.type == 'POINTCLOUD':
+        digest.update(_foreach_bytes(obj.data.points, "co", 3))
+    elif obj.type == 'VOLUME':
+        data = obj.data
+        values = [data.filepath, data.is_sequence, data.frame_start, data.frame_offset, data.sequence_mode]
+        try:
+            stat = os.stat(bpy.path.abspath(data.filepath, library=data.library))
+            values.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            values.append("missing")
+        digest.update(repr(values).encode('utf-8'))
+    elif obj.type in ('GPENCIL', 'GREASEPENCIL'):
+        for layer in obj.data.layers:
+            digest.update(repr((layer.info if hasattr(layer, "info") else layer.name, layer.hide,
+                                getattr(layer, "opacity", None))).encode('utf-8'))
+            frame = getattr(layer, "active_frame", None) or getattr(layer, "current_frame", lambda: None)()
+            if frame is None:
+                continue
+            strokes = getattr(frame, "strokes", None)
+            if strokes is None:
+                strokes = getattr(getattr(frame, "drawing", None), "strokes", ())
+            for stroke in strokes:
+                digest.update(_foreach_bytes(stroke.points, "co", 3) or _foreach_bytes(stroke.points, "position", 3))
+
+def frame_scene_digest(scene, frame):
+    """フレームの評価済みシーンのハッシュ
+
+    変形、ジオメトリ（メッシュの属性とUV、カーブ、ヘア、点群、ボリューム、グリースペンシル、パーティクル）、
+    ライト、カメラ、マテリアルとワールドのノード（値、リンク、ノードグループ、画像ファイル）を含む。
+    """
+    import hashlib
+    scene.frame_set(frame)
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    digest = hashlib.blake2b(digest_size=16)
+    for instance in depsgraph.object_instances:
+        obj = instance.object
+        digest.update(repr((obj.name, obj.type, [tuple(row) for row in instance.matrix_world])).encode('utf-8'))
+        if instance.is_instance:
+            continue  # インスタンスのジオメトリは元のオブジェクトで数える
+        data = obj.data
+        if obj.type == 'MESH':
+            # 評価済みオブジェクトのdataはモディファイアー適用後のメッシュ
+            _mesh_digest(digest, data)
+        elif obj.type == 'LIGHT':
+            digest.update(repr((data.type, tuple(data.color), data.energy)).encode('utf-8'))
+        elif obj.type == 'CAMERA':
+            digest.update(repr((data.type, data.lens, data.sensor_width, data.shift_x, data.shift_y,
+                                data.clip_start, data.clip_end)).encode('utf-8'))
+        else:
+            _object_data_digest(digest, obj)
+        # パーティクル（ヘアを含む）の位置
+        for particle_system in getattr(obj, "particle_systems", ()):
+            digest.update(particle_system.name.encode('utf-8'))
+            digest.update(_foreach_bytes(particle_system.particles, "location", 3))
+        digest.update(repr([slot.material.name for slot in obj.material_slots if slot.material]).encode('utf-8'))
+    for id_data in depsgraph.ids:
+        if (isinstance(id_data, (bpy.types.Material, bpy.types.World, bpy.types.Light))
+                and getattr(id_data, "node_tree", None) is not None):
+            digest.update(repr((id_data.name, list(_node_tree_values(id_data.node_tree)))).encode('utf-8'))
+    return digest.hexdigest()
+
+def prepare_render_cache(scene, start, end, mode, log=print):
+    """フレームごとの入力のハッシュを計算し、前回から変わっていないフレームを調べる
+
+    scene.render.filepath、カメラ、frame_stepなどは設定済みであること。
+    {"path", "mode", "data", "hashes", "skip"} を返す（skipはスキップできるフレームの集合）。
+    """
+    import hashlib
+    output_path = bpy.path.abspath(scene.render.filepath)
+    cache = {"path": render_cache_path(output_path), "mode": mode, "hashes": {}, "skip": set()}
+    cache["data"] = load_render_cache(cache["path"])
+    
+    settings_digest = render_settings_digest(scene)
+    if mode == 'FILE':
+        libraries = [bpy.path.abspath(library.filepath) for library in bpy.data.libraries]
+        file_digest = files_digest([bpy.data.filepath] + libraries)
+    original_frame = scene.frame_current
+    try:
+        for frame in range(start, end + 1, max(1, scene.frame_step)):
+            inputs = file_digest if mode == 'FILE' else frame_scene_digest(scene, frame)
+            cache["hashes"][frame] = hashlib.blake2b((settings_digest + inputs).encode('utf-8'),
+                                                     digest_size=16).hexdigest()
+    finally:
+        if mode != 'FILE':
+            scene.frame_set(original_frame)
+    
+    frames = cache["data"]["frames"]
+    for frame, frame_hash in cache["hashes"].items():
+        path = scene.render.frame_path(frame=frame)
+        entry = frames.get(os.path.basename(path))
+        if entry is None or entry["hash"] != frame_hash:
+            continue
+        try:
+            if os.path.getsize(path) == entry["size"]:
+                cache["skip"].add(frame)
+        except OSError:
+            pass
+    log(f"Render cache: {len(cache['skip'])} of {len(cache['hashes'])} frames unchanged")
+    return cache
+
+def record_cached_frame(cache, scene, frame=None):
+    """書き出したフレームの入力のハッシュをキャッシュに記録する（render_writeハンドラから呼ぶ）"""
+    if frame is None:
+        frame = scene.frame_current
+    frame_hash = cache["hashes"].get(frame)
+    if frame_hash is None:
+        return
+    path = scene.render.frame_path(frame=frame)
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return
+    cache["data"]["frames"][os.path.basename(path)] = {"hash": frame_hash, "size": size,
+                                                       "time": round(time.time(), 3)}
+
+def detect_static_spans(scene, start, end, cache=None, log=print):
+    """カメラと評価済みシーンが変わらない区間を探し、[(代表フレーム, [複製するフレーム, ...]), ...] を返す
+
+    Scene Contentsのレンダーキャッシュがあればそのハッシュを使い、なければフレームごとに計算する。
+    """
+    if scene.render.engine == 'CYCLES' and getattr(scene.cycles, "use_animated_seed", False):
+        # フレームごとにノイズのパターンが変わるので同じ画像にはならない
+        log("Static spans: skipped because the Cycles seed is animated")
+        return []
+    frames = range(start, end + 1, max(1, scene.frame_step))
+    if cache is not None and cache["mode"] == 'SCENE':
+        digests = [(frame, cache["hashes"][frame]) for frame in frames]
+    else:
+        original_frame = scene.frame_current
+        try:
+            digests = [(frame, frame_scene_digest(scene, frame)) for frame in frames]
+        finally:
+            scene.frame_set(original_frame)
+    spans = find_static_spans(digests)
+    duplicates = sum(len(dups) for first, dups in spans)
+    log(f"Static spans: {len(spans)} spans, {duplicates} of {len(digests)} frames will be linked")
+    return spans
+
+def link_static_spans(scene, spans, cache=None):
+    """代表フレームのファイルを区間の他のフレームにハードリンク（またはコピー）する"""
+    linked = 0
+    for first, duplicates in spans:
+        src = scene.render.frame_path(frame=first)
+        if not os.path.exists(src) or os.path.getsize(src) == 0:
+            continue  # 代表フレームがまだレンダリングされていない（キャンセルなど）
+        for frame in duplicates:
+            link_or_copy(src, scene.render.frame_path(frame=frame))
+            if cache is not None:
+                record_cached_frame(cache, scene, frame)
+            linked += 1
+    return linked
+
+def plan_render_passes(scene, start, end, resume=False, progressive=0, skip=()):
+    """レンダリングするパスのリスト [(step, [(start, end), ...]), ...] を返す
+
+    progressiveが2以上の場合はその間隔から粗い順にフレームを埋めるパスに分ける。
+    resumeの場合は足りないフレームだけを含める。skipのフレームは除く。scene.frame_stepを基本の間隔とする。
+    """
+    step = max(1, scene.frame_step)
+    if progressive > 1:
+        passes = progressive_passes(start, end, progressive, step)
+    else:
+        passes = [(step, list(range(start, end + 1, step)))]
+    if resume:
+        missing = set(find_missing_frames(scene, start, end))
+        passes = [(pass_step, [f for f in frames if f in missing]) for pass_step, frames in passes]
+    if skip:
+        passes = [(pass_step, [f for f in frames if f not in skip]) for pass_step, frames in passes]
+    return [(pass_step, frames_to_ranges(frames, pass_step)) for pass_step, frames in passes if frames]
+
+def _on_break_links_render_pre(scene, *args):
+    # これから書き出すフレームが動きのない区間のリンクなら、書き込む前にリンクを外す
+    break_hardlink(scene.render.frame_path(frame=scene.frame_current))
+
+def render_frames(scene, start, end, resume=False, log=print, progressive=0, cache_mode='NONE',
+                  static_spans=False):
+    """フレーム範囲をレンダリングする。resumeの場合は足りないフレームだけをレンダリングする
+
+    progressiveが2以上の場合はその間隔のフレームから順に間を埋めていく（途中で止めても
+    各フレームは最終的なファイル名で書き出されているので、再開すれば重複しない）。
+    cache_modeが'SCENE'または'FILE'の場合は入力のハッシュが前回と同じフレームをスキップする。
+    static_spansの場合は動きのない区間の最初のフレームだけをレンダリングし、残りはリンクする。
+    scene.render.filepath とカメラは設定済みであること。frame_start/frame_endは変更される。
+    レンダリングしたフレーム数を返す。
+    """
+    cache = None
+    if cache_mode != 'NONE':
+        cache = prepare_render_cache(scene, start, end, cache_mode, log)
+    skip = set(cache["skip"]) if cache else set()
+    spans = detect_static_spans(scene, start, end, cache, log) if static_spans else []
+    for first, duplicates in spans:
+        skip.update(duplicates)
+    passes = plan_render_passes(scene, start, end, resume, progressive, skip=skip)
+    total = sum(len(range(s, e + 1, pass_step)) for pass_step, ranges in passes for s, e in ranges)
+    if resume:
+        log(f"Resume: {total} of {len(range(start, end + 1, max(1, scene.frame_step)))} frames missing")
+    
+    def on_render_write(scene, *args):
+        record_cached_frame(cache, scene)
+    if cache is not None:
+        bpy.app.handlers.render_write.append(on_render_write)
+    bpy.app.handlers.render_pre.append(_on_break_links_render_pre)
+    
+    original_step = scene.frame_step
+    try:
+        for count, (pass_step, ranges) in enumerate(passes):
+            scene.frame_step = pass_step
+            for range_start, range_end in ranges:
+                scene.frame_start = range_start
+                scene.frame_end = range_end
+                bpy.ops.render.render(animation=True)
+            if progressive > 1:
+                log(f"Progressive pass {count + 1}/{len(passes)} done")
+        if spans:
+            log(f"Static spans: linked {link_static_spans(scene, spans, cache)} frames")
+    finally:
+        scene.frame_step = original_step
+        bpy.app.handlers.render_pre.remove(_on_break_links_render_pre)
+        if cache is not None:
+            bpy.app.handlers.render_write.remove(on_render_write)
+            save_render_cache(cache["path"], cache["data"])
+    return total
+
+def render_frames_shared(scene, start, end, chunk_size=SHARED_CHUNK_SIZE,
+                         stale_seconds=SHARED_LOCK_STALE_SECONDS, log=print, resume=False):
+    """共有ファイルシステム上で他のマシンと分担してフレーム範囲をレンダリングする
+
+    範囲をchunk_sizeごとに分け、ロックファイルを確保できたチャンクだけをレンダリングする。
+    チャンク内ではプレースホルダーを有効にし上書きを無効にするので、フレーム単位でも重複しない。
+    既存のフレームは上書きしないので、修正後にレンダリングし直す場合は出力と完了マーカー（.done）を
+    削除してから実行する。resumeの場合は完了マーカーがあっても足りないフレームのあるチャンクを
+    レンダリングし直す。
+    scene.render.filepath とカメラは設定済みであること。レンダリングしたチャンク数を返す。
+    """
+    render = scene.render
+    output_path = bpy.path.abspath(render.filepath)
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    
+    original = (render.use_placeholder, render.use_overwrite)
+    render.use_placeholder = True
+    render.use_overwrite = False
+    
+    rendered = 0
+    try:
+        # frame_step（ドラフト）の場合もstartからstepおきのフレームだけをレンダリングする
+        chunks = align_chunks_to_step(split_frame_range(start, end, chunk_size=chunk_size), start,
+                                      max(1, scene.frame_step))
+        for chunk_start, chunk_end in chunks:
+            lock_path, done_path = chunk_lock_paths(output_path, chunk_start, chunk_end)
+            if os.path.exists(done_path) and not (resume and find_missing_frames(scene, chunk_start, chunk_end)):
+                continue
+            if not claim_chunk_lock(lock_path, stale_seconds):
+                continue
+            log(f"Claimed frames {chunk_start}-{chunk_end}")
+            # クラッシュしたマシンが残したプレースホルダー（0バイト）はBlenderにスキップされるので削除する
+            for frame in find_missing_frames(scene, chunk_start, chunk_end):
+                path = render.frame_path(frame=frame)
+                if os.path.exists(path) and os.path.getsize(path) == 0:
+                    os.remove(path)
+            
+            # フレームごとにロックを更新する。1フレームがstale_secondsより長い場合に他のマシンに
+            # 奪われないように、スレッドからもstale_secondsの1/4ごとに更新する
+            def on_render_post(*args):
+                refresh_chunk_lock(lock_path)
+            stop = threading.Event()
+            def heartbeat_loop():
+                while not stop.wait(stale_seconds / 4):
+                    refresh_chunk_lock(lock_path)
+            heartbeat_thread = threading.Thread(target=heartbeat_loop, daemon=True)
+            heartbeat_thread.start()
+            bpy.app.handlers.render_post.append(on_render_post)
+            finished = False
+            try:
+                scene.frame_start = chunk_start
+                scene.frame_end = chunk_end
+                bpy.ops.render.render(animation=True)
+                finished = True
+            finally:
+                bpy.app.handlers.render_post.remove(on_render_post)
+                stop.set()
+                heartbeat_thread.join()
+                # 自分のロックのときだけ解放する（奪われていたら奪ったマシンのロックを残す）
+                release_chunk_lock(lock_path, done_path if finished else None)
+            rendered += 1
+    finally:
+        render.use_placeholder, render.use_overwrite = original
+    log(f"Shared render: {rendered} chunks rendered by this machine")
+    return rendered
+
+# フレームごとのレンダリング時間の計測状態（start_frame_timingからstop_frame_timingまで）
+_frame_timing = None
+
+def _on_timing_render_pre(scene, *args):
+    if _frame_timing is not None:
+        _frame_timing["frame_started"] = time.time()
+        _frame_timing["rendered_at"] = None
+        _frame_timing["peak_mem_mb"] = None
+
+def _on_timing_render_stats(*args):
+    # render_statsには統計情報の文字列が渡される
+    if _frame_timing is not None and args and isinstance(args[0], str):
+        peak = parse_stats_peak_mb(args[0])
+        if peak is not None:
+            _frame_timing["peak_mem_mb"] = max(_frame_timing["peak_mem_mb"] or 0.0, peak)
+
+def _on_timing_render_post(scene, *args):
+    if _frame_timing is not None:
+        _frame_timing["rendered_at"] = time.time()
+
+def _on_timing_render_write(scene, *args):
+    timing = _frame_timing
+    if timing is None or timing["frame_started"] is None or timing["target"] is None:
+        return
+    import json
+    now = time.time()
+    rendered_at = timing["rendered_at"] or now
+    peak = timing["peak_mem_mb"]
+    if peak is None:
+        peak = process_peak_memory_mb()
+    target = timing["target"]
+    record = {
+        "time": round(now, 3),
+        "profile": target["profile"],
+        "camera": target["camera"],
+        "frame": scene.frame_current,
+        "render_s": round(rendered_at - timing["frame_started"], 3),
+        "write_s": round(now - rendered_at, 3),
+        "wall_s": round(now - timing["frame_started"], 3),
+        "peak_mem_mb": round(peak, 1) if peak is not None else None,
+    }
+    timing["frame_started"] = None
+    timing["records"].append(record)
+    try:
+        with open(target["log_path"], 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"Could not write timing log: {e}")
+
+def _on_progress_render_pre(scene, *args):
+    # スーパーバイザーが書きかけのフレームを削除できるように出力パスも出す
+    print(f"{FRAME_START_PREFIX}{scene.frame_current} {scene.render.frame_path(frame=scene.frame_current)}",
+          flush=True)
+
+def _on_progress_render_write(scene, *args):
+    print(f"{FRAME_DONE_PREFIX}{scene.frame_current}", flush=True)
+
+# CLIレンダリング中にフレームの進捗を標準出力に出すハンドラ
+_progress_handlers = (
+    (bpy.app.handlers.render_pre, _on_progress_render_pre),
+    (bpy.app.handlers.render_write, _on_progress_render_write),
+)
+
+_timing_handlers = (
+    (bpy.app.handlers.render_pre, _on_timing_render_pre),
+    (bpy.app.handlers.render_stats, _on_timing_render_stats),
+    (bpy.app.handlers.render_post, _on_timing_render_post),
+    (bpy.app.handlers.render_write, _on_timing_render_write),
+)
+
+def start_frame_timing():
+    """フレームごとのレンダリング時間の計測を開始する"""
+    global _frame_timing
+    stop_frame_timing()
+    _frame_timing = {"target": None, "records": [], "frame_started": None, "rendered_at": None,
+                     "peak_mem_mb": None}
+    for handlers, handler in _timing_handlers:
+        handlers.append(handler)
+
+def set_frame_timing_target(profile_name, camera_name, output_path):
+    """これからレンダリングするプロファイルを設定する。ログは出力先ディレクトリに追記する"""
+    if _frame_timing is None:
+        return
+    output_path = bpy.path.abspath(output_path)
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    _frame_timing["target"] = {"profile": profile_name, "camera": camera_name,
+                               "log_path": timing_log_path(output_path)}
+
+def stop_frame_timing():
+    """計測を終了し、このセッションのレコードのリストを返す"""
+    global _frame_timing
+    timing = _frame_timing
+    _frame_timing = None
+    for handlers, handler in _timing_handlers:
+        if handler in handlers:
+            handlers.remove(handler)
+    return timing["records"] if timing is not None else []
+
+def build_job_manifest(scene, settings, enabled_profiles):
+    """有効なプロファイルのジョブマニフェスト（JSONに書き出すdict）を作成する"""
+    original_filepath = scene.render.filepath
+    planned_chunks = group_planned_chunks(plan_profile_chunks(settings, enabled_profiles))
+    frame_costs = profile_frame_costs(settings, enabled_profiles)
+    peak_memory = profile_peak_memory(settings, enabled_profiles)
+    profiles = []
+    for profile_idx, profile in enabled_profiles:
+        output_path = resolve_output_path(settings.common_output_path, profile.output_path)
+        # frame_pathでBlenderが実際に書き出すファイル名（####の桁数と拡張子）を取得
+        scene.render.filepath = output_path
+        first_frame_path = scene.render.frame_path(frame=profile.start_frame)
+        profiles.append({
+            "index": profile_idx,
+            "name": profile.name,
+            "camera": profile.camera_name,
+            "output_path": output_path,
+            "output_path_abs": bpy.path.abspath(output_path),
+            "first_frame_path": first_frame_path,
+            "start": profile.start_frame,
+            "end": profile.end_frame,
+            "chunks": [list(chunk) for chunk in planned_chunks.get(profile_idx, [])],
+            # ランナーがチャンクを分割し直す場合にドラフトのフレームをそろえるのに使用
+            "draft_frame_step": profile.draft_frame_step,
+            # 計測済みの秒/フレーム（ランナーがコストの大きいチャンクから実行するのに使用）
+            "frame_cost": frame_costs[profile_idx],
+            # 記録済みのピークメモリ（ランナーが空きメモリに収まるかを判断するのに使用）
+            "peak_mem_mb": peak_memory[profile_idx],
+        })
+    scene.render.filepath = original_filepath
+    
+    return {
+        "version": MANIFEST_VERSION,
+        "blend": bpy.data.filepath,
+        "script": SCRIPT_PATH,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "image_format": scene.render.image_settings.file_format,
+        "fps": scene.render.fps / scene.render.fps_base,
+        "draft": settings.render_drafts,
+        "profiles": profiles,
+    }
 
 # システムコンソールを表示/非表示切り替えるオペレータ
 class RENDER_OT_toggle_system_console(bpy.types.Operator):
@@ -144,6 +2790,7 @@ class RENDER_OT_export_batch_file(bpy.types.Operator):
             # Windows用のバッチファイルヘッダー
             if is_windows:
                 f.write("@echo off\n")
+                f.write("REM Commands run one after another (cmd.exe cannot wait for background jobs)\n")
                 f.write("echo Batch rendering started\n")
                 f.write("echo.\n\n")
             else:
@@ -162,34 +2809,127 @@ class RENDER_OT_export_batch_file(bpy.types.Operator):
                 f.write("BLENDER_PATH=blender\n\n")
                 blender_path = "$BLENDER_PATH"
             
-            # 各プロファイルのコマンドを生成（有効なプロファイルのみ）
-            for idx, (profile_idx, profile) in enumerate(enabled_profiles):
-                common_path = settings.common_output_path
-                profile_path = profile.output_path
-                
-                # 共通パスと相対パスを組み合わせる
-                if common_path.startswith("//") and profile_path.startswith("//"):
-                    # 両方が相対パスの場合、common_pathの「//」を削除してから結合
-                    output_path = common_path[2:] + profile_path[2:]
-                    # 先頭に「//」を付け直す
-                    output_path = "//" + output_path
-                else:
-                    # どちらかが絶対パスの場合は単純に結合
-                    output_path = os.path.join(common_path, 
-                                 profile_path[2:] if profile_path.startswith("//") else profile_path)
-                
-                # コマンド生成
-                cmd = f"{blender_path} -b \"{blend_filepath}\" -P \"{os.path.realpath(__file__)}\" "
-                cmd += f"-o \"{output_path}\" -s {profile.start_frame} -e {profile.end_frame} "
-                cmd += f"-- \"{profile.camera_name}\" {profile_idx}"
-                
-                # バッチファイルに書き込み
+            # ワーカーごとのスレッド数とCPUの割り当て。シェルスクリプトではワーカーごとの列を
+            # バックグラウンドで同時に実行する（cmd.exeはバックグラウンドの終了を待てないので
+            # Windowsでは1つずつ実行し、全コアを1つのワーカーに割り当てる）
+            workers = 1 if settings.single_process or is_windows else settings.parallel_workers
+            slots = plan_thread_slots(workers, settings.thread_budget)
+            pin_cpus = settings.pin_cpus and platform.system() == "Linux"
+            
+            def worker_command(slot_index):
+                """スロットのスレッド数（-t）とCPUの固定を付けたBlenderの起動部分"""
+                if not slots:
+                    return f"{blender_path} -b \"{blend_filepath}\" "
+                slot = slots[slot_index]
+                prefix = f"taskset -c {format_cpu_list(slot['cpus'])} " if pin_cpus else ""
+                return f"{prefix}{blender_path} -b \"{blend_filepath}\" -t {slot['threads']} "
+            
+            # 1つのBlenderプロセスで全プロファイルをレンダリングするコマンド
+            if settings.single_process:
+                indices = " ".join(str(profile_idx) for profile_idx, profile in enabled_profiles)
+                cmd = worker_command(0) + f"-P \"{SCRIPT_PATH}\" -- --profiles {indices}"
+                if settings.persistent_data:
+                    cmd += " --persistent-data"
+                if settings.render_drafts:
+                    cmd += " --draft"
+                if settings.progressive_order:
+                    cmd += f" --progressive {settings.progressive_step}"
+                if settings.render_cache != 'NONE':
+                    cmd += f" --cache {settings.render_cache.lower()}"
+                if settings.static_spans:
+                    cmd += " --static-spans"
+                if settings.resume_missing:
+                    cmd += " --resume"
+                if settings.shared_claiming:
+                    cmd += " --shared"
+                elif settings.stream_mp4 and not settings.render_drafts and not settings.progressive_order:
+                    cmd += " --stream-mp4"
                 if is_windows:
-                    f.write(f"echo Rendering profile {idx+1}/{len(enabled_profiles)}: {profile.name}\n")
+                    f.write(f"echo Rendering {len(enabled_profiles)} profiles in one Blender process\n")
                     f.write(f"{cmd}\n")
                     f.write("echo.\n\n")
                 else:
-                    f.write(f"echo \"Rendering profile {idx+1}/{len(enabled_profiles)}: {profile.name}\"\n")
+                    f.write(f"echo \"Rendering {len(enabled_profiles)} profiles in one Blender process\"\n")
+                    f.write(f"{cmd}\n")
+                    f.write("echo\n\n")
+                enabled_profiles_to_write = []
+            else:
+                enabled_profiles_to_write = enabled_profiles
+            
+            plan = plan_profile_chunks(settings, enabled_profiles_to_write)
+            planned_chunks = group_planned_chunks(plan)
+            # チャンクは見積もりコスト（Balanced (History)の履歴）の大きい順に、負荷の最も小さい列へ割り当てる
+            chunk_lanes = plan_chunk_lanes(plan, len(slots)) if slots else {}
+            
+            # 各プロファイルのコマンドを生成（有効なプロファイルのみ）
+            commands = []
+            for idx, (profile_idx, profile) in enumerate(enabled_profiles_to_write):
+                output_path = resolve_output_path(settings.common_output_path, profile.output_path)
+                
+                # チャンクごとにコマンドを生成（フレーム範囲が空のプロファイルにはチャンクがない）
+                chunks = planned_chunks.get(profile_idx, [])
+                if not chunks:
+                    self.report({'WARNING'}, f"Profile {profile.name} has an empty frame range, skipping")
+                    continue
+                for chunk_start, chunk_end in chunks:
+                    lane = chunk_lanes.get((profile_idx, chunk_start, chunk_end), 0)
+                    cmd = worker_command(lane) + f"-P \"{SCRIPT_PATH}\" "
+                    cmd += f"-o \"{output_path}\" -s {chunk_start} -e {chunk_end} "
+                    cmd += f"-- \"{profile.camera_name}\" {profile_idx}"
+                    if settings.render_drafts:
+                        cmd += " --draft"
+                    if settings.progressive_order:
+                        cmd += f" --progressive {settings.progressive_step}"
+                    if settings.render_cache != 'NONE':
+                        cmd += f" --cache {settings.render_cache.lower()}"
+                    if settings.static_spans:
+                        cmd += " --static-spans"
+                    if settings.resume_missing:
+                        cmd += " --resume"
+                    if settings.shared_claiming:
+                        cmd += " --shared"
+                    elif (settings.stream_mp4 and not settings.render_drafts and not settings.progressive_order
+                          and len(chunks) == 1):
+                        cmd += " --stream-mp4"
+                    
+                    label = f"{profile.name}"
+                    if len(chunks) > 1:
+                        label += f" (frames {chunk_start}-{chunk_end})"
+                    commands.append((lane, f"Rendering profile {idx+1}/{len(enabled_profiles)}: {label}", cmd))
+            
+            # バッチファイルに書き込み
+            if is_windows:
+                for lane, message, cmd in commands:
+                    f.write(f"echo {message}\n")
+                    f.write(f"{cmd}\n")
+                    f.write("echo.\n\n")
+            elif slots and len(slots) > 1 and commands:
+                # 各列のPIDを個別にwaitし、失敗した列があれば終了コード1で終わる
+                f.write("pids=()\n\n")
+                for lane, slot in enumerate(slots):
+                    if not any(command_lane == lane for command_lane, message, cmd in commands):
+                        continue
+                    f.write(f"# Worker {lane + 1}: {slot['threads']} threads\n")
+                    f.write("(\n")
+                    f.write("  failed=0\n")
+                    for command_lane, message, cmd in commands:
+                        if command_lane == lane:
+                            f.write(f"  echo \"[worker {lane + 1}] {message}\"\n")
+                            f.write(f"  {cmd} || failed=1\n")
+                    f.write("  exit $failed\n")
+                    f.write(") &\n")
+                    f.write("pids+=($!)\n\n")
+                f.write("status=0\n")
+                f.write("for pid in \"${pids[@]}\"; do\n")
+                f.write("  wait \"$pid\" || status=1\n")
+                f.write("done\n")
+                f.write("if [ $status -ne 0 ]; then\n")
+                f.write("  echo \"Some rendering tasks failed\"\n")
+                f.write("  exit 1\n")
+                f.write("fi\n\n")
+            else:
+                for lane, message, cmd in commands:
+                    f.write(f"echo \"{message}\"\n")
                     f.write(f"{cmd}\n")
                     f.write("echo\n\n")
             
@@ -208,6 +2948,15 @@ class RENDER_OT_export_batch_file(bpy.types.Operator):
             except:
                 self.report({'WARNING'}, "Could not set executable permissions on the shell script")
         
+        # JSONのジョブマニフェスト
+        if settings.write_manifest:
+            import json
+            manifest_path = os.path.splitext(self.filepath)[0] + ".json"
+            manifest = build_job_manifest(context.scene, settings, enabled_profiles)
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+            self.report({'INFO'}, f"Job manifest exported to {manifest_path}")
+        
         total_enabled = len(enabled_profiles)
         self.report({'INFO'}, f"Batch file with {total_enabled} enabled profiles exported to {self.filepath}")
         return {'FINISHED'}
@@ -317,51 +3066,20 @@ class RENDER_OT_convert_to_mp4(bpy.types.Operator):
         if not output_path_suffix and '.' not in filename_base:
             output_path_suffix = f".{extension}"
         
-        # フォルダ内の画像ファイルを検索
-        import glob
-        # 検索パターン（ワイルドカード）
-        search_pattern = os.path.join(output_dir, f"{filename_base}*{output_path_suffix}")
-        self.report({'INFO'}, f"検索パターン: {search_pattern}")
-        files = sorted(glob.glob(search_pattern))
-        
-        if not files:
-            # 代替検索パターン
-            search_pattern = os.path.join(output_dir, f"*.{extension}")
-            self.report({'INFO'}, f"代替検索パターン: {search_pattern}")
-            files = sorted(glob.glob(search_pattern))
-            if not files:
-                self.report({'ERROR'}, f"変換する画像ファイルが見つかりません: {search_pattern}")
-                return {'CANCELLED'}
-        
-        self.report({'INFO'}, f"変換対象: {len(files)}ファイル")
-        
-        # 最初のファイルから連番パターンを抽出
-        first_file = files[0]
-        self.report({'INFO'}, f"最初のファイル: {first_file}")
-        
-        # ファイル名から数字部分を抽出して、FFmpegの%d形式に変換
-        file_basename = os.path.basename(first_file)
-        # 数字部分を抽出
-        match = re.search(r'(\d+)', file_basename)
-        if match:
-            # 見つかった数字の位置
-            num_pos = match.start()
-            # 数字の長さ
-            num_length = len(match.group(1))
-            # 最初の番号
-            start_num = int(match.group(1))
-            
-            # FFmpegの入力パターン（%04d形式）を構築
-            input_prefix = os.path.join(output_dir, file_basename[:num_pos])
-            input_suffix = file_basename[num_pos + num_length:]
-            ffmpeg_input = f"{input_prefix}%0{num_length}d{input_suffix}"
-            
-            self.report({'INFO'}, f"FFmpeg入力パターン: {ffmpeg_input}, 開始番号: {start_num}")
-        else:
-            # 数字部分が見つからない場合は、単一ファイルとして処理
-            self.report({'WARNING'}, "ファイル名に連番が見つかりません。単一ファイルとして処理します。")
-            ffmpeg_input = first_file
-            start_num = 1
+        # フォルダ内の連番シーケンスをインデックスから検索
+        index = scan_frame_sequences(output_dir)
+        sequence = find_frame_sequence(index, filename_base, output_path_suffix or None, extension)
+        if sequence is None:
+            self.report({'ERROR'}, f"変換する画像ファイルが見つかりません: {output_dir}")
+            return {'CANCELLED'}
+        
+        total_frames = len(sequence["frames"])
+        start_num = sequence["frames"][0]
+        ffmpeg_input = os.path.join(output_dir, sequence_file_pattern(sequence))
+        self.report({'INFO'}, f"変換対象: {total_frames}ファイル")
+        self.report({'INFO'}, f"FFmpeg入力パターン: {ffmpeg_input}, 開始番号: {start_num}")
+        if sequence["gaps"]:
+            self.report({'WARNING'}, f"連番に{len(sequence['gaps'])}フレームの欠けがあります（最初の欠け: {sequence['gaps'][0]}）")
         
         # MP4出力ファイル名を共通パスに設定
         # プロファイルのパス構造を反映したファイル名を作成
@@ -410,82 +3128,130 @@ class RENDER_OT_convert_to_mp4(bpy.types.Operator):
         fps = context.scene.render.fps / context.scene.render.fps_base
         
         # FFmpegコマンドの構築 - alpha_modeを削除
-        if extension == 'exr':
-            cmd = [
-                ffmpeg_path,
-                '-framerate', str(fps),
-                '-start_number', str(start_num),
-                '-i', ffmpeg_input,
-                '-c:v', 'libx264',
-                '-pix_fmt', 'yuv420p',
-                '-crf', '18',
-                '-preset', 'slow',
-                '-colorspace', 'bt709',
-                '-y',
-                mp4_output
-            ]
-        else:
-            cmd = [
-                ffmpeg_path,
-                '-framerate', str(fps),
-                '-start_number', str(start_num),
-                '-i', ffmpeg_input,
-                '-c:v', 'libx264',
-                '-pix_fmt', 'yuv420p',
-                '-vf', 'format=yuv420p',
-                '-crf', '23',
-                '-preset', 'medium',
-                '-y',
-                mp4_output
-            ]
+        cmd = [
+            ffmpeg_path,
+            '-framerate', str(fps),
+            '-start_number', str(start_num),
+            '-i', ffmpeg_input,
+        ] + mp4_encode_args(extension) + ['-y', mp4_output]
 
-        try:
-            # コマンド実行
-            cmd_str = ' '.join(cmd)
-            self.report({'INFO'}, f"FFmpegコマンド: {cmd_str}")
-            process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
-                universal_newlines=True
-            )
-            stdout, stderr = process.communicate()
-            
-            if process.returncode != 0:
-                self.report({'ERROR'}, f"MP4変換に失敗しました: {stderr}")
-                return {'CANCELLED'}
-            
-            self.report({'INFO'}, f"MP4ファイルが作成されました: {mp4_output}")
+        # 分割エンコード（image2は欠けたフレームで読み込みを止めるので、最初の欠けまでを分割する）
+        contiguous_frames = total_frames
+        if sequence["gaps"]:
+            contiguous_frames = sequence["gaps"][0] - start_num
+        segment_count = min(settings.mp4_segment_workers * 2, contiguous_frames // MP4_MIN_SEGMENT_FRAMES)
+        if settings.mp4_segment_workers > 1 and segment_count > 1:
+            segments, cmd, temp_paths = segmented_mp4_commands(
+                ffmpeg_path, ffmpeg_input, start_num, contiguous_frames, fps, mp4_encode_args(extension),
+                mp4_output, segment_count)
+            self.report({'INFO'}, f"{len(segments)}セグメントを{settings.mp4_segment_workers}プロセスでエンコードします")
+            _mp4_queue.submit(profile.name, cmd, total_frames=contiguous_frames, output=mp4_output,
+                              segments=segments, parallel=settings.mp4_segment_workers, cleanup=temp_paths)
+            _start_mp4_progress_timer()
+            self.report({'INFO'}, f"MP4変換をキューに追加しました: {mp4_output}")
             return {'FINISHED'}
         
-        except Exception as e:
-            self.report({'ERROR'}, f"エラーが発生しました: {str(e)}")
-            return {'CANCELLED'}
+        # コマンドをバックグラウンドの変換キューに追加（Blenderはブロックされない）
+        cmd_str = ' '.join(cmd)
+        self.report({'INFO'}, f"FFmpegコマンド: {cmd_str}")
+        _mp4_queue.submit(profile.name, cmd, total_frames=total_frames, output=mp4_output)
+        _start_mp4_progress_timer()
+        
+        self.report({'INFO'}, f"MP4変換をキューに追加しました: {mp4_output}")
+        return {'FINISHED'}
     
     def get_ffmpeg_path(self):
         """FFmpegのパスを取得する"""
-        # Blender同梱のFFmpegパスを探す
-        blender_bin = bpy.app.binary_path
-        blender_dir = os.path.dirname(blender_bin)
-        
-        # 潜在的なFFmpegのパス
-        possible_paths = [
-            # Windows
-            os.path.join(blender_dir, 'ffmpeg.exe'),
-            # macOS
-            os.path.join(os.path.dirname(blender_dir), 'Resources', 'ffmpeg'),
-            # Linux
-            os.path.join(blender_dir, 'ffmpeg'),
-            # システムパス上のFFmpeg
-            'ffmpeg'
-        ]
-        
-        # 存在するパスを返す
-        for path in possible_paths:
-            if os.path.exists(path) or path == 'ffmpeg':
-                return path
-        
-        return None
+        return get_ffmpeg_path()
+
+def get_ffmpeg_path():
+    """FFmpegのパスを取得する"""
+    # Blender同梱のFFmpegパスを探す
+    blender_bin = bpy.app.binary_path
+    blender_dir = os.path.dirname(blender_bin)
+    
+    # 潜在的なFFmpegのパス
+    possible_paths = [
+        # Windows
+        os.path.join(blender_dir, 'ffmpeg.exe'),
+        # macOS
+        os.path.join(os.path.dirname(blender_dir), 'Resources', 'ffmpeg'),
+        # Linux
+        os.path.join(blender_dir, 'ffmpeg'),
+        # システムパス上のFFmpeg
+        'ffmpeg'
+    ]
+    
+    # 存在するパスを返す
+    for path in possible_paths:
+        if os.path.exists(path) or path == 'ffmpeg':
+            return path
+    
+    return None
+
+def profile_mp4_output(settings, profile):
+    """プロファイルのMP4出力パス（共通パス/プロファイル名.mp4、MP4バッチと同じ）"""
+    mp4_filename = re.sub(r'[<>:"/\\|?*]', '_', f"{profile.name}.mp4")
+    return os.path.normpath(os.path.join(bpy.path.abspath(settings.common_output_path), mp4_filename))
+
+def create_streaming_encoder(scene, settings, profile, output_path, start_frame=None, end_frame=None, log=print):
+    """フレーム範囲（省略時はプロファイルの範囲）を逐次エンコードするStreamingEncoderを作成する"""
+    if start_frame is None:
+        start_frame = profile.start_frame
+    if end_frame is None:
+        end_frame = profile.end_frame
+    original_filepath = scene.render.filepath
+    scene.render.filepath = output_path
+    frame_paths = [scene.render.frame_path(frame=f) for f in range(start_frame, end_frame + 1)]
+    scene.render.filepath = original_filepath
+    
+    mp4_output = profile_mp4_output(settings, profile)
+    os.makedirs(os.path.dirname(mp4_output), exist_ok=True)
+    fps = scene.render.fps / scene.render.fps_base
+    return StreamingEncoder(get_ffmpeg_path(), frame_paths, mp4_output, fps, log=log)
+
+# バックグラウンドのMP4変換キュー
+_mp4_queue = FFmpegJobQueue()
+
+def _mp4_progress_timer():
+    """変換中はパネルを定期的に再描画し、完了したジョブを報告する"""
+    for job in _mp4_queue.jobs:
+        if job["status"] in ('DONE', 'FAILED') and not job.get("reported"):
+            job["reported"] = True
+            if job["status"] == 'DONE':
+                print(f"MP4ファイルが作成されました: {job['output']}")
+            else:
+                print(f"MP4変換に失敗しました ({job['name']}): {job['error']} (log: {job['log_path']})")
+    _redraw_properties(bpy.context)
+    return 0.5 if _mp4_queue.active else None
+
+def _start_mp4_progress_timer():
+    if not bpy.app.timers.is_registered(_mp4_progress_timer):
+        bpy.app.timers.register(_mp4_progress_timer, first_interval=0.5)
+
+# MP4変換ジョブをキャンセルするオペレータ
+class RENDER_OT_cancel_mp4_job(bpy.types.Operator):
+    bl_idname = "render.cancel_mp4_job"
+    bl_label = "Cancel MP4 Conversion"
+    bl_description = "Cancel a queued or running MP4 conversion"
+    
+    job_id: IntProperty(default=-1)
+    
+    def execute(self, context):
+        _mp4_queue.cancel(None if self.job_id < 0 else self.job_id)
+        _redraw_properties(context)
+        return {'FINISHED'}
+
+# 完了したMP4変換ジョブを一覧から削除するオペレータ
+class RENDER_OT_clear_mp4_jobs(bpy.types.Operator):
+    bl_idname = "render.clear_mp4_jobs"
+    bl_label = "Clear Finished"
+    bl_description = "Remove finished MP4 conversions from the list"
+    
+    def execute(self, context):
+        _mp4_queue.clear_finished()
+        _redraw_properties(context)
+        return {'FINISHED'}
 
 class RENDER_OT_export_mp4_batch(bpy.types.Operator):
     bl_idname = "render.export_mp4_batch"
@@ -531,6 +3297,9 @@ class RENDER_OT_export_mp4_batch(bpy.types.Operator):
             # バッチファイルヘッダー
             if is_windows:
                 f.write("@echo off\n")
+                if settings.mp4_parallel_jobs > 1:
+                    # 並列モードではこのファイル自身をジョブごとに呼び出す
+                    f.write("if \"%~1\"==\"__job\" goto job_%~2\n")
                 f.write("echo MP4 Conversion batch started\n")
                 f.write("echo.\n\n")
             else:
@@ -564,6 +3333,21 @@ class RENDER_OT_export_mp4_batch(bpy.types.Operator):
                 
             # フレームレートを取得
             fps = context.scene.render.fps / context.scene.render.fps_base
+            
+            # 並列モード: 同時実行数の上限とジョブごとのログファイルの出力先
+            parallel = settings.mp4_parallel_jobs > 1
+            parallel_jobs = []
+            if parallel:
+                log_dir = os.path.splitext(self.filepath)[0] + "_logs"
+                if is_windows:
+                    f.write(f"set MAX_JOBS={settings.mp4_parallel_jobs}\n")
+                    f.write(f"set LOG_DIR={log_dir}\n")
+                    f.write("if not exist \"%LOG_DIR%\" mkdir \"%LOG_DIR%\"\n")
+                    f.write("del /q \"%LOG_DIR%\\*.done\" \"%LOG_DIR%\\*.failed\" 2>nul\n\n")
+                else:
+                    f.write(f"MAX_JOBS={settings.mp4_parallel_jobs}\n")
+                    f.write(f"LOG_DIR=\"{log_dir}\"\n")
+                    f.write("mkdir -p \"$LOG_DIR\"\n\n")
                 
             # 各プロファイルの変換コマンドを生成
             for idx, (profile_idx, profile) in enumerate(enabled_profiles):
@@ -589,19 +3373,10 @@ class RENDER_OT_export_mp4_batch(bpy.types.Operator):
                     # 拡張子を確認・追加
                     if not suffix.endswith(f".{extension}"):
                         suffix = f"{suffix}.{extension}" if suffix else f".{extension}"
-                    
-                    # Windowsバッチファイルの場合は%を%%に置き換え
-                    if is_windows:
-                        file_pattern = f"{prefix}%%04d{suffix}"
-                    else:
-                        file_pattern = f"{prefix}%04d{suffix}"
                 else:
                     # 拡張子を含めたパターンを作成
-                    base_name = os.path.splitext(profile_file)[0]
-                    if is_windows:
-                        file_pattern = f"{base_name}%%04d.{extension}"
-                    else:
-                        file_pattern = f"{base_name}%04d.{extension}"
+                    prefix = os.path.splitext(profile_file)[0]
+                    suffix = f".{extension}"
                 
                 # プロファイルディレクトリと共通パスを結合
                 if profile_dir:
@@ -611,6 +3386,16 @@ class RENDER_OT_export_mp4_batch(bpy.types.Operator):
                 else:
                     input_dir = common_abs_path
                 
+                # レンダリング済みのシーケンスがあれば実際の桁数を使用（なければ4桁）
+                sequence = find_frame_sequence(scan_frame_sequences(input_dir), prefix, suffix)
+                padding = sequence["padding"] if sequence is not None and sequence["prefix"] == prefix else 4
+                
+                # Windowsバッチファイルの場合は%を%%に置き換え
+                if is_windows:
+                    file_pattern = f"{prefix}%%0{padding}d{suffix}"
+                else:
+                    file_pattern = f"{prefix}%0{padding}d{suffix}"
+                
                 # 最終的な入力パスを構築
                 input_path = os.path.normpath(os.path.join(input_dir, file_pattern))
                 
@@ -622,41 +3407,39 @@ class RENDER_OT_export_mp4_batch(bpy.types.Operator):
                 mp4_output = os.path.normpath(os.path.join(common_abs_path, mp4_filename))
                 
                 # FFMPEGコマンド
-                if extension == 'exr':
-                    if is_windows:
-                        f.write(f"echo Converting {profile.name} (EXR sequence) to MP4...\n")
-                        f.write(f"{ffmpeg_path} -framerate {fps} -start_number {profile.start_frame} ")
-                        f.write(f"-i \"{input_path}\" -c:v libx264 -pix_fmt yuv420p -crf 18 ")
-                        f.write(f"-preset slow -colorspace bt709 -y \"{mp4_output}\"\n")
-                        f.write("if %ERRORLEVEL% neq 0 echo Error converting to MP4!\n")
-                        f.write("echo.\n\n")
-                    else:
-                        f.write(f"echo \"Converting {profile.name} (EXR sequence) to MP4...\"\n")
-                        f.write(f"{ffmpeg_path} -framerate {fps} -start_number {profile.start_frame} ")
-                        f.write(f"-i \"{input_path}\" -c:v libx264 -pix_fmt yuv420p -crf 18 ")
-                        f.write(f"-preset slow -colorspace bt709 -y \"{mp4_output}\"\n")
-                        f.write("if [ $? -ne 0 ]; then echo \"Error converting to MP4!\"; fi\n")
-                        f.write("echo\n\n")
+                sequence_label = "EXR" if extension == 'exr' else extension
+                ffmpeg_cmd = (f"{ffmpeg_path} -framerate {fps} -start_number {profile.start_frame} "
+                              f"-i \"{input_path}\" {' '.join(mp4_encode_args(extension))} -y \"{mp4_output}\"")
+                
+                # 並列モードではコマンドを集めて後でまとめて書き出す
+                if parallel:
+                    job_name = f"{idx + 1:02d}_" + re.sub(r'[^\w.-]', '_', profile.name)
+                    parallel_jobs.append((job_name, profile.name, sequence_label, ffmpeg_cmd))
+                    continue
+                
+                if is_windows:
+                    f.write(f"echo Converting {profile.name} ({sequence_label} sequence) to MP4...\n")
+                    f.write(f"{ffmpeg_cmd}\n")
+                    f.write("if %ERRORLEVEL% neq 0 echo Error converting to MP4!\n")
+                    f.write("echo.\n\n")
+                else:
+                    f.write(f"echo \"Converting {profile.name} ({sequence_label} sequence) to MP4...\"\n")
+                    f.write(f"{ffmpeg_cmd}\n")
+                    f.write("if [ $? -ne 0 ]; then echo \"Error converting to MP4!\"; fi\n")
+                    f.write("echo\n\n")
+            
+            if parallel:
+                if is_windows:
+                    self.write_parallel_bat(f, parallel_jobs)
                 else:
-                    if is_windows:
-                        f.write(f"echo Converting {profile.name} ({extension} sequence) to MP4...\n")
-                        f.write(f"{ffmpeg_path} -framerate {fps} -start_number {profile.start_frame} ")
-                        f.write(f"-i \"{input_path}\" -c:v libx264 -pix_fmt yuv420p -vf format=yuv420p ")
-                        f.write(f"-crf 23 -preset medium -y \"{mp4_output}\"\n")
-                        f.write("if %ERRORLEVEL% neq 0 echo Error converting to MP4!\n")
-                        f.write("echo.\n\n")
-                    else:
-                        f.write(f"echo \"Converting {profile.name} ({extension} sequence) to MP4...\"\n")
-                        f.write(f"{ffmpeg_path} -framerate {fps} -start_number {profile.start_frame} ")
-                        f.write(f"-i \"{input_path}\" -c:v libx264 -pix_fmt yuv420p -vf format=yuv420p ")
-                        f.write(f"-crf 23 -preset medium -y \"{mp4_output}\"\n")
-                        f.write("if [ $? -ne 0 ]; then echo \"Error converting to MP4!\"; fi\n")
-                        f.write("echo\n\n")
+                    self.write_parallel_sh(f, parallel_jobs)
             
             # バッチファイルフッター
             if is_windows:
                 f.write("echo All MP4 conversion tasks completed\n")
                 f.write("pause\n")
+                if parallel:
+                    self.write_bat_job_labels(f, parallel_jobs)
             else:
                 f.write("echo \"All MP4 conversion tasks completed\"\n")
                 f.write("read -p \"Press Enter to continue...\"\n")
@@ -672,6 +3455,72 @@ class RENDER_OT_export_mp4_batch(bpy.types.Operator):
             self.report({'INFO'}, f"MP4 conversion batch file with {total_enabled} enabled profiles exported to {self.filepath}")
             return {'FINISHED'}
     
+    def write_parallel_sh(self, f, jobs):
+        """最大MAX_JOBS個のFFmpegを同時に実行し、最後に失敗したプロファイルを表示する（bash）"""
+        f.write("PIDS=()\n")
+        f.write("NAMES=()\n\n")
+        for job_name, profile_name, sequence_label, ffmpeg_cmd in jobs:
+            f.write("while [ \"$(jobs -rp | wc -l)\" -ge \"$MAX_JOBS\" ]; do sleep 1; done\n")
+            f.write(f"echo \"Converting {profile_name} ({sequence_label} sequence) to MP4...\"\n")
+            f.write(f"{ffmpeg_cmd} > \"$LOG_DIR/{job_name}.log\" 2>&1 &\n")
+            f.write("PIDS+=($!)\n")
+            f.write(f"NAMES+=(\"{profile_name}\")\n\n")
+        
+        # 全ジョブの終了を待って結果をまとめる
+        f.write("FAILED=()\n")
+        f.write("for i in \"${!PIDS[@]}\"; do\n")
+        f.write("    wait \"${PIDS[$i]}\" || FAILED+=(\"${NAMES[$i]}\")\n")
+        f.write("done\n")
+        f.write("echo\n")
+        f.write("if [ ${#FAILED[@]} -eq 0 ]; then\n")
+        f.write("    echo \"All ${#PIDS[@]} conversions succeeded\"\n")
+        f.write("else\n")
+        f.write("    echo \"${#FAILED[@]} of ${#PIDS[@]} conversions failed (logs in $LOG_DIR):\"\n")
+        f.write("    printf '  %s\\n' \"${FAILED[@]}\"\n")
+        f.write("fi\n")
+        f.write("echo\n\n")
+    
+    def write_parallel_bat(self, f, jobs):
+        """最大MAX_JOBS個のFFmpegを同時に実行し、最後に失敗したプロファイルを表示する（Windows）"""
+        f.write("set STARTED=0\n\n")
+        for job_name, profile_name, sequence_label, ffmpeg_cmd in jobs:
+            f.write("call :wait_slots %MAX_JOBS%\n")
+            f.write(f"echo Converting {profile_name} ({sequence_label} sequence) to MP4...\n")
+            f.write(f"start \"{job_name}\" /b cmd /c \"\"%~f0\" __job {job_name}\"\n")
+            f.write("set /a STARTED+=1\n\n")
+        
+        # 全ジョブの終了を待って結果をまとめる
+        f.write("call :wait_slots 1\n")
+        f.write("set FAILED=0\n")
+        f.write("for %%f in (\"%LOG_DIR%\\*.failed\") do set /a FAILED+=1\n")
+        f.write("echo.\n")
+        f.write("if %FAILED% equ 0 (\n")
+        f.write("    echo All %STARTED% conversions succeeded\n")
+        f.write(") else (\n")
+        f.write("    echo %FAILED% of %STARTED% conversions failed ^(logs in %LOG_DIR%^):\n")
+        f.write("    for %%f in (\"%LOG_DIR%\\*.failed\") do echo   %%~nf\n")
+        f.write(")\n")
+        f.write("echo.\n\n")
+    
+    def write_bat_job_labels(self, f, jobs):
+        """並列モードのWindowsバッチで使用するサブルーチンとジョブごとのラベル"""
+        f.write("exit /b\n\n")
+        # 実行中のジョブ数（開始数 - 完了数）が引数未満になるまで待つ
+        f.write(":wait_slots\n")
+        f.write("set /a RUNNING=STARTED\n")
+        f.write("for %%f in (\"%LOG_DIR%\\*.done\" \"%LOG_DIR%\\*.failed\") do set /a RUNNING-=1\n")
+        f.write("if %RUNNING% geq %1 (\n")
+        f.write("    timeout /t 1 /nobreak >nul\n")
+        f.write("    goto wait_slots\n")
+        f.write(")\n")
+        f.write("exit /b\n\n")
+        for job_name, profile_name, sequence_label, ffmpeg_cmd in jobs:
+            f.write(f":job_{job_name}\n")
+            f.write(f"{ffmpeg_cmd} > \"%LOG_DIR%\\{job_name}.log\" 2>&1\n")
+            f.write(f"if %ERRORLEVEL% neq 0 (echo failed> \"%LOG_DIR%\\{job_name}.failed\") "
+                    f"else (echo done> \"%LOG_DIR%\\{job_name}.done\")\n")
+            f.write("exit /b\n\n")
+    
     def invoke(self, context, event):
         # デフォルトのファイル名とパスを設定
         blend_name = os.path.splitext(os.path.basename(bpy.data.filepath))[0]
@@ -706,10 +3555,65 @@ class RENDER_PT_multi_settings_manager(bpy.types.Panel):
             row.operator("render.render_all_profiles", icon='RENDER_ANIMATION', text="Render All Profiles (No Profiles)")
             row.enabled = False
         
+        # Render All Profilesの進捗表示
+        if _render_queue is not None:
+            queue = _render_queue
+            box = layout.box()
+            if queue["current_profile"] >= 0:
+                profile = queue["profiles"][queue["current_profile"]]
+                box.label(text=f"Profile {queue['current_profile'] + 1}/{len(queue['profiles'])}: {profile['name']} - "
+                               f"{queue['profile_frames_done']}/{profile['total_frames']} frames", icon='RENDER_ANIMATION')
+            percent = 100.0 * queue["frames_done"] / max(1, queue["total_frames"])
+            box.label(text=f"Overall: {queue['frames_done']}/{queue['total_frames']} frames ({percent:.0f}%)")
+            # プロファイルごとの計測結果と残り時間の見積もり
+            if _frame_timing is not None and _frame_timing["records"]:
+                records = _frame_timing["records"]
+                for name, entry in summarize_timings(records).items():
+                    box.label(text=f"{name}: {entry['frames']} frames, {format_duration(entry['total_s'])}, "
+                                   f"{entry['avg_s']:.2f} s/frame", icon='TIME')
+                average = sum(record["wall_s"] for record in records) / len(records)
+                remaining = max(0, queue["total_frames"] - queue["frames_done"])
+                box.label(text=f"ETA: {format_duration(average * remaining)}")
+            box.label(text="Press Esc to cancel", icon='CANCEL')
+        
         # システムコンソールボタンとバッチファイル生成ボタン
         row = layout.row()
         row.operator("render.toggle_system_console", icon='CONSOLE')
         row.operator("render.export_batch_file", icon='EXPORT')
+        row = layout.row()
+        row.prop(settings, "single_process")
+        row.prop(settings, "write_manifest")
+        layout.prop(settings, "persistent_data")
+        
+        # 並列レンダリング
+        row = layout.row()
+        row.operator("render.render_parallel", icon='RENDER_ANIMATION')
+        row.prop(settings, "parallel_workers")
+        row = layout.row()
+        row.prop(settings, "thread_budget")
+        sub = row.row()
+        sub.enabled = settings.thread_budget != 'NONE'
+        sub.prop(settings, "pin_cpus")
+        row = layout.row()
+        row.prop(settings, "watchdog_timeout")
+        row.prop(settings, "max_retries")
+        row = layout.row()
+        row.prop(settings, "memory_aware")
+        sub = row.row()
+        sub.enabled = settings.memory_aware
+        sub.prop(settings, "memory_reserve")
+        row = layout.row()
+        row.prop(settings, "chunk_mode")
+        if settings.chunk_mode == 'SIZE':
+            row.prop(settings, "chunk_size")
+        elif settings.chunk_mode in ('COUNT', 'HISTORY'):
+            row.prop(settings, "chunk_count")
+        if _parallel_pool is not None:
+            pool = _parallel_pool
+            layout.label(text=f"Parallel: {len(pool.results)}/{pool.total} done, "
+                              f"{len(pool.running)} running, {len(pool.failed)} failed", icon='TIME')
+            if pool.holding:
+                layout.label(text=f"Waiting for memory: {pool.holding}", icon='ERROR')
                 
         # 共通出力パス設定
         layout.separator()
@@ -722,6 +3626,9 @@ class RENDER_PT_multi_settings_manager(bpy.types.Panel):
             row1 = box.row()
             row1.operator("render.convert_to_mp4", icon='SEQUENCE')
             row1.operator("render.export_mp4_batch", icon='EXPORT')
+            row = box.row()
+            row.prop(settings, "mp4_parallel_jobs")
+            row.prop(settings, "mp4_segment_workers")
         else:
             # 有効なプロファイルがない場合は無効化されたボタンを表示
             row1 = box.row()
@@ -732,6 +3639,22 @@ class RENDER_PT_multi_settings_manager(bpy.types.Panel):
             row2.operator("render.export_mp4_batch", icon='EXPORT')
             row2.enabled = False
         
+        # バックグラウンドのMP4変換の進捗
+        if _mp4_queue.jobs:
+            for job in _mp4_queue.jobs:
+                row = box.row()
+                if job["status"] == 'RUNNING' and job["total_frames"]:
+                    percent = min(100.0, 100.0 * job["frame"] / job["total_frames"])
+                    row.label(text=f"{job['name']}: {job['frame']}/{job['total_frames']} frames ({percent:.0f}%)",
+                              icon='SEQUENCE')
+                else:
+                    row.label(text=f"{job['name']}: {job['status'].capitalize()}",
+                              icon='ERROR' if job["status"] == 'FAILED' else 'SEQUENCE')
+                if job["status"] in ('QUEUED', 'RUNNING'):
+                    row.operator("render.cancel_mp4_job", text="", icon='CANCEL').job_id = job["id"]
+            if not _mp4_queue.active:
+                box.operator("render.clear_mp4_jobs", icon='TRASH')
+        
         # box.prop(settings, "common_output_path")
 
         # 共通出力パス設定
@@ -739,6 +3662,16 @@ class RENDER_PT_multi_settings_manager(bpy.types.Panel):
         box = layout.box()
         box.label(text="Common Settings:")
         box.prop(settings, "common_output_path")
+        box.prop(settings, "render_drafts")
+        row = box.row()
+        row.prop(settings, "progressive_order")
+        if settings.progressive_order:
+            row.prop(settings, "progressive_step")
+        box.prop(settings, "resume_missing")
+        box.prop(settings, "render_cache")
+        box.prop(settings, "static_spans")
+        box.prop(settings, "shared_claiming")
+        box.prop(settings, "stream_mp4")
         
         # プロファイル管理
         layout.separator()
@@ -786,20 +3719,29 @@ class RENDER_PT_multi_settings_manager(bpy.types.Panel):
                 box.prop_search(profile, "camera_name", bpy.data, "objects", text="Camera")
                 
                 # カメラの情報表示
-                cameras = [obj.name for obj in bpy.data.objects if obj.type == 'CAMERA']
-                if profile.camera_name in cameras:
+                if profile.camera_name in camera_names():
                     box.label(text=f"Camera valid: {profile.camera_name}", icon='CHECKMARK')
                 else:
                     box.label(text="Warning: Selected camera not found!", icon='ERROR')
                 
+                # ドラフト設定
+                draft_box = box.box()
+                draft_box.label(text="Draft Overrides:", icon='SHADING_SOLID')
+                row = draft_box.row()
+                row.prop(profile, "draft_resolution_percentage")
+                row.prop(profile, "draft_samples")
+                row = draft_box.row()
+                row.prop(profile, "draft_simplify")
+                row.prop(profile, "draft_denoise")
+                row.prop(profile, "draft_frame_step")
+                
                 # レンダリングボタン
                 box.operator("render.render_with_profile", text="Render this camera", icon='RENDER_ANIMATION').profile_index = settings.active_profile_index
             
-            # 完全パスの表示
-            full_path = os.path.join(settings.common_output_path,
-                                  profile.output_path[2:] if profile.output_path.startswith("//") else profile.output_path)
-            full_path = full_path.replace("\\", "/")
+            # 完全パスとCLIコマンド（キャッシュ済み）
+            full_path, cmd_lines, full_cmd = self.profile_command(settings, profile, settings.active_profile_index)
             
+            # 完全パスの表示
             box = layout.box()
             box.label(text="Full Output Path:")
             box.label(text=full_path)
@@ -809,25 +3751,8 @@ class RENDER_PT_multi_settings_manager(bpy.types.Panel):
             cmd_box.label(text="CLI Command:")
             
             # コマンドを複数行に分けて表示
-            cmd = f"blender -b \"{bpy.data.filepath}\""
-            cmd_box.label(text=cmd)
-            
-            cmd = f"-P \"{os.path.realpath(__file__)}\""
-            cmd_box.label(text=cmd)
-            
-            cmd = f"-o \"{full_path}\""
-            cmd_box.label(text=cmd)
-            
-            cmd = f"-s {profile.start_frame} -e {profile.end_frame}"
-            cmd_box.label(text=cmd)
-            
-            cmd = f"-- \"{profile.camera_name}\" {settings.active_profile_index}"
-            cmd_box.label(text=cmd)
-            
-            # 1行で表示するバージョンも維持（コピー用）
-            full_cmd = f"blender -b \"{bpy.data.filepath}\" -P \"{os.path.realpath(__file__)}\" "
-            full_cmd += f"-o \"{full_path}\" -s {profile.start_frame} -e {profile.end_frame} "
-            full_cmd += f"-- \"{profile.camera_name}\" {settings.active_profile_index}"
+            for cmd in cmd_lines:
+                cmd_box.label(text=cmd)
             
             # コピーしやすいようにテキストボックスとして表示
             cmd_box.separator()
@@ -835,6 +3760,38 @@ class RENDER_PT_multi_settings_manager(bpy.types.Panel):
             row = cmd_box.row()
             row.scale_y = 0.6
             row.label(text=full_cmd, translate=False)
+    
+    @staticmethod
+    def profile_command(settings, profile, profile_index):
+        """プロファイルの完全な出力パスとCLIコマンドを返す（値が変わるまでキャッシュ）"""
+        key = (bpy.data.filepath, settings.common_output_path, profile.output_path,
+               profile.start_frame, profile.end_frame, profile.camera_name,
+               settings.thread_budget, settings.parallel_workers)
+        cached = _panel_cache.get(profile_index)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        
+        full_path = os.path.join(settings.common_output_path,
+                              profile.output_path[2:] if profile.output_path.startswith("//") else profile.output_path)
+        full_path = full_path.replace("\\", "/")
+        
+        cmd_lines = [f"blender -b \"{bpy.data.filepath}\""]
+        # 並列実行時の1ワーカー分のスレッド数
+        slots = plan_thread_slots(settings.parallel_workers, settings.thread_budget)
+        if slots:
+            cmd_lines.append(f"-t {slots[0]['threads']}")
+        cmd_lines += [
+            f"-P \"{SCRIPT_PATH}\"",
+            f"-o \"{full_path}\"",
+            f"-s {profile.start_frame} -e {profile.end_frame}",
+            f"-- \"{profile.camera_name}\" {profile_index}",
+        ]
+        # 1行で表示するバージョンも維持（コピー用）
+        full_cmd = " ".join(cmd_lines)
+        
+        result = (full_path, cmd_lines, full_cmd)
+        _panel_cache[profile_index] = (key, result)
+        return result
 
 
 # プロファイルのリスト表示用UIリスト
@@ -974,15 +3931,30 @@ class RENDER_OT_render_with_profile(bpy.types.Operator):
             output_path = os.path.join(common_path, 
                                      profile_path[2:] if profile_path.startswith("//") else profile_path)
         
+        # ドラフトの場合は別フォルダに出力し、ドラフト設定を一時的に適用
+        draft_state = None
+        if settings.render_drafts:
+            output_path = draft_output_path(output_path)
+            draft_state = apply_draft_overrides(context.scene, profile)
+        
         # 出力パス設定
         context.scene.render.filepath = output_path
         
-        # フレーム範囲設定
-        context.scene.frame_start = profile.start_frame
-        context.scene.frame_end = profile.end_frame
-        
-        # レンダリング開始
-        bpy.ops.render.render(animation=True)
+        # レンダリング開始（フレーム範囲はrender_framesで設定）
+        start_frame_timing()
+        set_frame_timing_target(profile.name, profile.camera_name, output_path)
+        try:
+            render_frames(context.scene, profile.start_frame, profile.end_frame,
+                          resume=settings.resume_missing, log=lambda msg: self.report({'INFO'}, msg),
+                          progressive=settings.progressive_step if settings.progressive_order else 0,
+                          cache_mode=settings.render_cache, static_spans=settings.static_spans)
+        finally:
+            summary = summarize_timings(stop_frame_timing()).get(profile.name)
+            if draft_state is not None:
+                restore_draft_overrides(draft_state)
+        if summary:
+            self.report({'INFO'}, f"Rendered {summary['frames']} frames in {format_duration(summary['total_s'])} "
+                                  f"({summary['avg_s']:.2f} s/frame)")
         
         # 元の設定を復元
         context.scene.render.filepath = original_filepath
@@ -991,78 +3963,415 @@ class RENDER_OT_render_with_profile(bpy.types.Operator):
         
         return {'FINISHED'}
 
+# 実行中のRender All Profilesの状態（パネルでの進捗表示とハンドラ用）
+_render_queue = None
+
+def _on_queue_render_post(*args):
+    if _render_queue is not None and _render_queue["rendering"]:
+        _render_queue["frames_done"] += 1
+        _render_queue["profile_frames_done"] += 1
+
+def _on_queue_render_write(scene, *args):
+    if _render_queue is not None and 0 <= _render_queue["index"] < len(_render_queue["items"]):
+        cache = _render_queue["items"][_render_queue["index"]]["cache"]
+        if cache is not None:
+            record_cached_frame(cache, scene)
+    # FFmpegへの送信は監視スレッドで行う（レンダリングスレッドを止めない）
+    encoder = _render_queue.get("encoder") if _render_queue is not None else None
+    if encoder is not None:
+        encoder.notify(scene.render.frame_path(frame=scene.frame_current))
+
+def _on_queue_render_complete(*args):
+    if _render_queue is not None:
+        _render_queue["rendering"] = False
+
+def _on_queue_render_cancel(*args):
+    if _render_queue is not None:
+        _render_queue["rendering"] = False
+        _render_queue["cancel"] = True
+
+_queue_handlers = (
+    (bpy.app.handlers.render_pre, _on_break_links_render_pre),
+    (bpy.app.handlers.render_post, _on_queue_render_post),
+    (bpy.app.handlers.render_write, _on_queue_render_write),
+    (bpy.app.handlers.render_complete, _on_queue_render_complete),
+    (bpy.app.handlers.render_cancel, _on_queue_render_cancel),
+)
+
 # 全てのプロファイルを連続してレンダリングするオペレータ
+# UIをブロックしないようにタイマー駆動のモーダルオペレータとして動作し、
+# render_complete/render_cancelハンドラで次のプロファイルへ進む
 class RENDER_OT_render_all_profiles(bpy.types.Operator):
     bl_idname = "render.render_all_profiles"
     bl_label = "Render All Profiles"
-    bl_description = "Render all enabled profiles in sequence"
+    bl_description = "Render all enabled profiles in sequence (Esc to cancel)"
+    
+    _timer = None
+    
+    @classmethod
+    def poll(cls, context):
+        return _render_queue is None
     
     def execute(self, context):
-        settings = context.scene.multi_render_settings
+        global _render_queue
+        scene = context.scene
+        settings = scene.multi_render_settings
         
         # 有効なプロファイルをカウント
-        enabled_profiles = [p for p in settings.profiles if p.is_enabled]
+        enabled_profiles = [(i, p) for i, p in enumerate(settings.profiles) if p.is_enabled]
         if not enabled_profiles:
             self.report({'WARNING'}, "No enabled profiles available for rendering")
             return {'CANCELLED'}
+        if settings.persistent_data:
+            enabled_profiles = order_profiles_for_reuse(enabled_profiles)
         
         # 元の設定を保存
-        original_filepath = context.scene.render.filepath
-        original_start = context.scene.frame_start
-        original_end = context.scene.frame_end
-        original_camera = context.scene.camera
+        original_state = save_render_state(scene)
         
-        # 有効なプロファイルのみレンダリング
-        rendered_count = 0
-        total_enabled = len(enabled_profiles)
-        for i, profile in enumerate(settings.profiles):
-            if not profile.is_enabled:
-                continue
-                
-            rendered_count += 1
-            self.report({'INFO'}, f"Rendering profile {rendered_count}/{total_enabled}: {profile.name}")
-            
-            # カメラ設定
-            if profile.camera_name in bpy.data.objects and bpy.data.objects[profile.camera_name].type == 'CAMERA':
-                context.scene.camera = bpy.data.objects[profile.camera_name]
-            else:
+        # レンダリングする範囲のキューを作成（resumeの場合は足りないフレームの範囲のみ）
+        items = []
+        profiles = []
+        caches = []
+        static_links = []
+        for profile_idx, profile in enabled_profiles:
+            if not (profile.camera_name in bpy.data.objects and bpy.data.objects[profile.camera_name].type == 'CAMERA'):
                 self.report({'WARNING'}, f"Camera {profile.camera_name} not found for profile {profile.name}, skipping")
                 continue
-            
-            # 共通パスとプロファイルパスを結合
-            common_path = settings.common_output_path
-            profile_path = profile.output_path
-            
-            # 共通パスと相対パスを組み合わせる
-            if common_path.startswith("//") and profile_path.startswith("//"):
-                # 両方が相対パスの場合、common_pathの「//」を削除してから結合
-                output_path = common_path[2:] + profile_path[2:]
-                # 先頭に「//」を付け直す
-                output_path = "//" + output_path
-            else:
-                # どちらかが絶対パスの場合は単純に結合
-                output_path = os.path.join(common_path, 
-                                     profile_path[2:] if profile_path.startswith("//") else profile_path)
-            
-            # 出力パス設定
-            context.scene.render.filepath = output_path
-            
-            # フレーム範囲設定
-            context.scene.frame_start = profile.start_frame
-            context.scene.frame_end = profile.end_frame
-            
-            # レンダリング開始
-            bpy.ops.render.render(animation=True)
+            output_path = resolve_output_path(settings.common_output_path, profile.output_path)
+            frame_step = 1
+            if settings.render_drafts:
+                output_path = draft_output_path(output_path)
+                frame_step = profile.draft_frame_step
+            scene.render.filepath = output_path
+            scene.frame_step = frame_step
+            cache = None
+            if settings.render_cache != 'NONE':
+                # ハッシュにはレンダリング時の設定（カメラ、ドラフト設定）を含める
+                scene.camera = bpy.data.objects[profile.camera_name]
+                draft_state = apply_draft_overrides(scene, profile) if settings.render_drafts else None
+                try:
+                    cache = prepare_render_cache(scene, profile.start_frame, profile.end_frame,
+                                                 settings.render_cache,
+                                                 log=lambda msg: self.report({'INFO'}, f"{profile.name}: {msg}"))
+                finally:
+                    if draft_state is not None:
+                        restore_draft_overrides(draft_state)
+                caches.append(cache)
+            skip = set(cache["skip"]) if cache else set()
+            if settings.static_spans:
+                scene.camera = bpy.data.objects[profile.camera_name]
+                spans = detect_static_spans(scene, profile.start_frame, profile.end_frame, cache,
+                                            log=lambda msg: self.report({'INFO'}, f"{profile.name}: {msg}"))
+                for first, duplicates in spans:
+                    skip.update(duplicates)
+                if spans:
+                    static_links.append({"profile": len(profiles), "output_path": output_path, "spans": spans,
+                                         "cache": cache, "linked": False})
+            passes = plan_render_passes(scene, profile.start_frame, profile.end_frame,
+                                        resume=settings.resume_missing,
+                                        progressive=settings.progressive_step if settings.progressive_order else 0,
+                                        skip=skip)
+            total_frames = sum(len(range(s, e + 1, step)) for step, ranges in passes for s, e in ranges)
+            profiles.append({"name": profile.name, "index": profile_idx, "total_frames": total_frames})
+            for step, ranges in passes:
+                for start, end in ranges:
+                    items.append({
+                        "profile": len(profiles) - 1,
+                        "camera": profile.camera_name,
+                        "output_path": output_path,
+                        "start": start,
+                        "end": end,
+                        "step": step,
+                        "cache": cache,
+                    })
+        restore_render_state(scene, original_state)
+        
+        if not items:
+            for link in static_links:
+                scene.render.filepath = link["output_path"]
+                link_static_spans(scene, link["spans"], link["cache"])
+            restore_render_state(scene, original_state)
+            self.report({'INFO'}, "Nothing to render")
+            return {'CANCELLED'}
+        
+        _render_queue = {
+            "items": items,
+            "profiles": profiles,
+            "index": -1,
+            "current_profile": -1,
+            "rendering": False,
+            "cancel": False,
+            "frames_done": 0,
+            "profile_frames_done": 0,
+            "total_frames": sum(p["total_frames"] for p in profiles),
+            "original_state": original_state,
+            "stream_mp4": settings.stream_mp4 and not settings.render_drafts and not settings.progressive_order,
+            "encoder": None,
+            "persistent_data": scene.render.use_persistent_data if settings.persistent_data else None,
+            "drafts": settings.render_drafts,
+            "draft_state": None,
+            "caches": caches,
+            "static_links": static_links,
+        }
+        if settings.persistent_data:
+            scene.render.use_persistent_data = True
+        for handlers, handler in _queue_handlers:
+            handlers.append(handler)
+        start_frame_timing()
+        
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.5, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        queue = _render_queue
+        
+        # Escでキャンセル（レンダリング中はレンダージョブ側もEscでキャンセルされる）
+        if event.type == 'ESC' and event.value == 'PRESS':
+            queue["cancel"] = True
+        
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        
+        # 進捗表示を更新
+        _redraw_properties(context)
+        if queue["rendering"]:
+            return {'PASS_THROUGH'}
+        
+        if queue["cancel"]:
+            return self.finish(context, cancelled=True)
+        
+        if queue["index"] + 1 >= len(queue["items"]):
+            return self.finish(context, cancelled=False)
+        
+        # 次の範囲のレンダリングを開始
+        item = queue["items"][queue["index"] + 1]
+        scene = context.scene
+        if item["profile"] != queue["current_profile"] and queue["current_profile"] >= 0:
+            self.finish_profile(context, queue, queue["current_profile"])
+        if queue["drafts"] and item["profile"] != queue["current_profile"]:
+            # プロファイルごとのドラフト設定に切り替える
+            if queue["draft_state"] is not None:
+                restore_draft_overrides(queue["draft_state"])
+            profile = scene.multi_render_settings.profiles[queue["profiles"][item["profile"]]["index"]]
+            queue["draft_state"] = apply_draft_overrides(scene, profile)
+        scene.camera = bpy.data.objects[item["camera"]]
+        scene.render.filepath = item["output_path"]
+        scene.frame_start = item["start"]
+        scene.frame_end = item["end"]
+        scene.frame_step = item["step"]
+        
+        queue["rendering"] = True
+        result = bpy.ops.render.render('INVOKE_DEFAULT', animation=True)
+        if 'CANCELLED' in result:
+            # 他のレンダリングが実行中などで開始できない場合は次のタイマーで再試行
+            queue["rendering"] = False
+            return {'PASS_THROUGH'}
+        
+        queue["index"] += 1
+        if item["profile"] != queue["current_profile"]:
+            queue["current_profile"] = item["profile"]
+            queue["profile_frames_done"] = 0
+            profile = queue["profiles"][item["profile"]]
+            set_frame_timing_target(profile["name"], item["camera"], item["output_path"])
+            self.report({'INFO'}, f"Rendering profile {item['profile'] + 1}/{len(queue['profiles'])}: {profile['name']}")
+            if queue["stream_mp4"]:
+                self.start_encoder(context, queue, profile["index"], item["output_path"])
+        return {'PASS_THROUGH'}
+    
+    def finish_profile(self, context, queue, profile):
+        """レンダリングが終わったプロファイルの動きのない区間をリンクしてから逐次エンコードを完了させる
+
+        エンコーダーは残りのフレームを順番に送るので、リンクする前に完了させると最初の複製フレームで止まる。
+        レンダリング中でないときに呼ぶこと（出力パスを変更する）。
+        """
+        for link in queue["static_links"]:
+            if link["profile"] == profile and not link["linked"]:
+                context.scene.render.filepath = link["output_path"]
+                link_static_spans(context.scene, link["spans"], link["cache"])
+                link["linked"] = True
+        if queue["encoder"] is not None:
+            queue["encoder"].finish()
+            queue["encoder"] = None
+    
+    def start_encoder(self, context, queue, profile_index, output_path):
+        """新しいプロファイルの逐次エンコードを開始する"""
+        if queue["encoder"] is not None:
+            queue["encoder"].finish()
+            queue["encoder"] = None
+        settings = context.scene.multi_render_settings
+        try:
+            queue["encoder"] = create_streaming_encoder(context.scene, settings, settings.profiles[profile_index],
+                                                        output_path)
+        except OSError as e:
+            self.report({'WARNING'}, f"Could not start streaming MP4 encode: {e}")
+            return
+        queue["encoder"].watch()
+    
+    def finish(self, context, cancelled):
+        global _render_queue
+        queue = _render_queue
+        _render_queue = None
+        
+        for handlers, handler in _queue_handlers:
+            if handler in handlers:
+                handlers.remove(handler)
+        records = stop_frame_timing()
+        context.window_manager.event_timer_remove(self._timer)
+        
+        # 動きのない区間の代表フレームを他のフレームにリンク（最後のプロファイルはエンコードの完了前に）
+        if queue["current_profile"] >= 0:
+            self.finish_profile(context, queue, queue["current_profile"])
+        for link in queue["static_links"]:
+            if not link["linked"]:
+                context.scene.render.filepath = link["output_path"]
+                link_static_spans(context.scene, link["spans"], link["cache"])
+        for cache in queue["caches"]:
+            save_render_cache(cache["path"], cache["data"])
         
         # 元の設定を復元
-        context.scene.render.filepath = original_filepath
-        context.scene.frame_start = original_start
-        context.scene.frame_end = original_end
-        context.scene.camera = original_camera
+        if queue["draft_state"] is not None:
+            restore_draft_overrides(queue["draft_state"])
+        restore_render_state(context.scene, queue["original_state"])
+        if queue["persistent_data"] is not None:
+            context.scene.render.use_persistent_data = queue["persistent_data"]
+            if records:
+                report_sync_savings(records, log=lambda msg: self.report({'INFO'}, msg))
+        _redraw_properties(context)
+        
+        if cancelled:
+            self.report({'WARNING'}, f"Rendering cancelled after {queue['frames_done']}/{queue['total_frames']} frames")
+            return {'CANCELLED'}
+        if records:
+            total = sum(record["wall_s"] for record in records)
+            self.report({'INFO'}, f"Render time {format_duration(total)}, "
+                                  f"{total / len(records):.2f} s/frame on average")
+        self.report({'INFO'}, f"All {len(queue['profiles'])} enabled profiles rendered successfully")
+        return {'FINISHED'}
+
+# 実行中の並列レンダリング（パネルでの進捗表示用）
+_parallel_pool = None
+
+# 有効なプロファイルをバックグラウンドのBlenderプロセスで並列にレンダリングするオペレータ
+class RENDER_OT_render_parallel(bpy.types.Operator):
+    bl_idname = "render.render_parallel"
+    bl_label = "Render Parallel (CLI)"
+    bl_description = "Render all enabled profiles as concurrent background Blender processes (Esc to cancel)"
+    
+    _timer = None
+    
+    @classmethod
+    def poll(cls, context):
+        settings = context.scene.multi_render_settings
+        return _parallel_pool is None and any(p.is_enabled for p in settings.profiles)
+    
+    def execute(self, context):
+        global _parallel_pool
+        settings = context.scene.multi_render_settings
+        blend_filepath = bpy.data.filepath
+        
+        if not blend_filepath:
+            self.report({'ERROR'}, "Save your .blend file first")
+            return {'CANCELLED'}
+        if bpy.data.is_dirty:
+            self.report({'WARNING'}, "Unsaved changes are not included in the parallel render")
+        
+        # チャンクを実行順に作成（Balanced (History) の場合はコストの大きい順）
+        enabled_profiles = [(i, p) for i, p in enumerate(settings.profiles) if p.is_enabled]
+        plan = plan_profile_chunks(settings, enabled_profiles)
+        peak_memory = profile_peak_memory(settings, enabled_profiles)
+        chunk_counts = {}
+        for profile_idx, profile, chunk_start, chunk_end, cost in plan:
+            chunk_counts[profile_idx] = chunk_counts.get(profile_idx, 0) + 1
+        jobs = []
+        for profile_idx, profile, chunk_start, chunk_end, cost in plan:
+            output_path = resolve_output_path(settings.common_output_path, profile.output_path)
+            name = profile.name if chunk_counts[profile_idx] == 1 else f"{profile.name} [{chunk_start}-{chunk_end}]"
+            job = make_render_job(
+                name, blend_filepath, profile_idx,
+                camera_name=profile.camera_name,
+                output_path=output_path,
+                start_frame=chunk_start,
+                end_frame=chunk_end,
+                blender_path=bpy.app.binary_path,
+                extra_args=(["--resume"] if settings.resume_missing else []) +
+                           (["--draft"] if settings.render_drafts else []) +
+                           (["--progressive", str(settings.progressive_step)] if settings.progressive_order else []) +
+                           (["--cache", settings.render_cache.lower()] if settings.render_cache != 'NONE' else []) +
+                           (["--static-spans"] if settings.static_spans else []))
+            job["mem_mb"] = peak_memory[profile_idx]
+            job["profile"] = profile.name
+            jobs.append(job)
+        costs = [cost for *_, cost in plan if cost is not None]
+        if settings.chunk_mode == 'HISTORY' and costs:
+            makespan = estimate_makespan(costs, settings.parallel_workers)
+            self.report({'INFO'}, f"Balanced {len(plan)} chunks from render history, "
+                                  f"estimated {format_duration(makespan)} for measured profiles")
+        
+        # 別プロセスが書き出すフレームを監視してMP4を逐次エンコード
+        self.encoders = []
+        if settings.stream_mp4 and not settings.render_drafts:
+            for profile in settings.profiles:
+                if profile.is_enabled:
+                    output_path = resolve_output_path(settings.common_output_path, profile.output_path)
+                    try:
+                        encoder = create_streaming_encoder(context.scene, settings, profile, output_path)
+                    except OSError as e:
+                        self.report({'WARNING'}, f"Could not start streaming MP4 encode: {e}")
+                        continue
+                    encoder.watch()
+                    self.encoders.append(encoder)
+        
+        memory = MemoryAdmission(settings.memory_reserve) if settings.memory_aware else None
+        slots = plan_thread_slots(settings.parallel_workers, settings.thread_budget)
+        _parallel_pool = RenderJobPool(jobs, settings.parallel_workers, memory=memory,
+                                       slots=slots, pin_cpus=settings.pin_cpus,
+                                       frame_timeout=settings.watchdog_timeout, max_retries=settings.max_retries)
+        _parallel_pool.poll()
+        
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(1.0, window=context.window)
+        wm.modal_handler_add(self)
+        self.report({'INFO'}, f"Started {len(jobs)} jobs with up to {_parallel_pool.max_workers} workers")
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            _parallel_pool.cancel()
+        
+        if event.type == 'TIMER' or _parallel_pool.cancelled:
+            if not _parallel_pool.poll():
+                return self.finish(context)
+            _redraw_properties(context)
+        
+        return {'PASS_THROUGH'}
+    
+    def finish(self, context):
+        global _parallel_pool
+        pool = _parallel_pool
+        _parallel_pool = None
+        context.window_manager.event_timer_remove(self._timer)
+        _redraw_properties(context)
+        for encoder in self.encoders:
+            encoder.finish()
         
-        self.report({'INFO'}, f"All {rendered_count} enabled profiles rendered successfully")
+        summary = pool.summary()
+        for line in summary[1:]:
+            self.report({'WARNING'}, line.strip())
+        if pool.exit_code() == 0:
+            self.report({'INFO'}, f"Parallel render finished: {summary[0]}")
+        else:
+            self.report({'ERROR'}, f"Parallel render finished with errors: {summary[0]}")
         return {'FINISHED'}
 
+def _redraw_properties(context):
+    """プロパティエディタを再描画して進捗表示を更新する"""
+    for window in context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'PROPERTIES':
+                area.tag_redraw()
+
 # 「すべてのプロファイルをレンダリング」ボタンを追加するサブパネル
 class RENDER_PT_multi_settings_actions(bpy.types.Panel):
     bl_label = "Batch Actions"
@@ -1081,73 +4390,149 @@ class RENDER_PT_multi_settings_actions(bpy.types.Panel):
         else:
             layout.label(text="No profiles available")
 
-# コマンドラインからの実行をサポートする関数
-def render_from_cli():
-    import sys
-    
-    # バックグラウンドモードでは bpy.context.scene ではなく bpy.data.scenes[0] を使用
-    scene = bpy.data.scenes[0]
-    
-    # プロファイルインデックスを取得（--の後の2番目の引数）
-    profile_index = 0
-    if '--' in sys.argv:
-        double_dash_idx = sys.argv.index('--')
-        if double_dash_idx + 2 < len(sys.argv):
-            try:
-                profile_index = int(sys.argv[double_dash_idx + 2])
-            except ValueError:
-                print("Warning: Could not parse profile index, using first profile")
+def parse_cli_args(argv):
+    """render_from_cliの引数を解析する
+
+    -o/-s/-e はBlender本体の引数から、カメラ名・プロファイルインデックスと
+    オプション（--profiles, --resume, --shared, --worker）は「--」以降から取得する。
+    """
+    import argparse
     
     # 引数を解析する関数
     def get_arg_value(arg_name):
-        if arg_name in sys.argv:
-            idx = sys.argv.index(arg_name)
-            if idx + 1 < len(sys.argv):
-                return sys.argv[idx + 1]
+        if arg_name in argv:
+            idx = argv.index(arg_name)
+            if idx + 1 < len(argv):
+                return argv[idx + 1]
         return None
     
     # 出力パス、フレーム範囲などをCLIから優先的に取得
-    output_path = get_arg_value('-o')
     start_frame = get_arg_value('-s')
     end_frame = get_arg_value('-e')
-    camera_name = None
-    if '--' in sys.argv:
-        double_dash_idx = sys.argv.index('--')
-        if double_dash_idx + 1 < len(sys.argv):
-            camera_name = sys.argv[double_dash_idx + 1]
-    
-    # プロファイルの有効性チェック
-    settings = scene.multi_render_settings
-    if len(settings.profiles) == 0:
-        print("No render profiles defined, cannot render")
-        return
+    args = {
+        "output_path": get_arg_value('-o'),
+        "start": int(start_frame) if start_frame else None,
+        "end": int(end_frame) if end_frame else None,
+        "camera": None,
+        "profile_index": 0,
+        "profiles": None,
+        "resume": False,
+        "persistent_data": False,
+        "draft": False,
+        "progressive": 0,
+        "cache": 'NONE',
+        "static_spans": False,
+        "stream_mp4": False,
+        "worker": None,
+        "shared": None,
+    }
+    if '--' not in argv:
+        return args
     
-    if profile_index >= len(settings.profiles):
-        print(f"Profile index {profile_index} is out of range, using first profile")
-        profile_index = 0
+    parser = argparse.ArgumentParser(prog="MultiRenders.py --", add_help=False)
+    parser.add_argument("camera", nargs="?")
+    parser.add_argument("profile_index", nargs="?")
+    # --profiles: 1つのBlenderプロセスで複数のプロファイルをレンダリング（インデックスのリストまたは all）
+    parser.add_argument("--profiles", nargs="+")
+    # --resume: 足りないフレームだけをレンダリング
+    parser.add_argument("--resume", action="store_true")
+    # --cache scene|file: 入力のハッシュが変わっていないフレームをスキップ
+    parser.add_argument("--cache", choices=["scene", "file"])
+    # --static-spans: 動きのない区間は1フレームだけレンダリングしてリンク
+    parser.add_argument("--static-spans", action="store_true")
+    # --progressive [N]: Nフレームおきから順に間を埋めてレンダリング
+    parser.add_argument("--progressive", type=int, nargs="?", const=16, default=0)
+    # --draft: プロファイルのドラフト設定で出力フォルダ/drafts/にレンダリング
+    parser.add_argument("--draft", action="store_true")
+    # --persistent-data: --profilesの実行でシーンデータを再利用（フレーム範囲・カメラでまとめて並べる）
+    parser.add_argument("--persistent-data", action="store_true")
+    # --stream-mp4: レンダリング中にMP4を逐次エンコード
+    parser.add_argument("--stream-mp4", action="store_true")
+    # --shared: 共有ファイルシステム上のロックファイルでチャンクを確保し、複数のマシンで分担
+    parser.add_argument("--shared", action="store_true")
+    parser.add_argument("--shared-chunk", type=int, default=SHARED_CHUNK_SIZE)
+    parser.add_argument("--lock-timeout", type=float, default=SHARED_LOCK_STALE_SECONDS)
+    # --worker: コーディネーター（runner_main --coordinator）からチャンクを借りてレンダリング
+    parser.add_argument("--worker")
+    options, unknown = parser.parse_known_args(argv[argv.index('--') + 1:])
+    if unknown:
+        print(f"Warning: Ignoring unknown arguments: {unknown}")
     
+    args["camera"] = options.camera
+    args["profiles"] = options.profiles
+    args["resume"] = options.resume
+    args["persistent_data"] = options.persistent_data
+    args["draft"] = options.draft
+    args["progressive"] = options.progressive
+    args["cache"] = options.cache.upper() if options.cache else 'NONE'
+    args["static_spans"] = options.static_spans
+    args["stream_mp4"] = options.stream_mp4
+    args["worker"] = options.worker
+    if options.shared:
+        args["shared"] = {"chunk_size": max(1, options.shared_chunk), "stale_seconds": options.lock_timeout}
+    # プロファイルインデックスを取得（--の後の2番目の引数）
+    if options.profile_index is not None:
+        try:
+            args["profile_index"] = int(options.profile_index)
+        except ValueError:
+            print("Warning: Could not parse profile index, using first profile")
+    return args
+
+def resolve_profile_indices(settings, values):
+    """--profilesの値（インデックスのリストまたは all）をプロファイルインデックスのリストにする"""
+    if [v.lower() for v in values] == ["all"]:
+        return [i for i, p in enumerate(settings.profiles) if p.is_enabled]
+    indices = []
+    for value in values:
+        try:
+            index = int(value)
+        except ValueError:
+            print(f"Warning: Could not parse profile index '{value}', skipping")
+            continue
+        if 0 <= index < len(settings.profiles):
+            indices.append(index)
+        else:
+            print(f"Warning: Profile index {index} is out of range, skipping")
+    return indices
+
+def save_render_state(scene):
+    """プロファイルの適用で変更されるシーン設定を保存する"""
+    return {
+        "camera": scene.camera,
+        "filepath": scene.render.filepath,
+        "frame_start": scene.frame_start,
+        "frame_end": scene.frame_end,
+        "frame_step": scene.frame_step,
+    }
+
+def restore_render_state(scene, state):
+    """save_render_stateで保存した設定を復元する"""
+    scene.camera = state["camera"]
+    scene.render.filepath = state["filepath"]
+    scene.frame_start = state["frame_start"]
+    scene.frame_end = state["frame_end"]
+    scene.frame_step = state["frame_step"]
+
+def render_profile_cli(scene, settings, profile_index, output_path=None, start_frame=None,
+                       end_frame=None, camera_name=None, resume=False, stream_mp4=False, shared=None,
+                       draft=False, progressive=0, cache_mode='NONE', static_spans=False):
+    """1つのプロファイルをレンダリングする。CLI引数で指定された値はプロファイルの設定より優先する
+
+    sharedは共有ファイルシステムモードの設定（{"chunk_size", "stale_seconds"}）。
+    draftの場合はプロファイルのドラフト設定を一時的に適用し、出力フォルダ/drafts/に出力する。
+    progressiveが2以上の場合は粗い順にフレームをレンダリングする。
+    cache_modeは入力が変わっていないフレームをスキップするモード（'NONE', 'SCENE', 'FILE'）。
+    static_spansの場合は動きのない区間を1フレームだけレンダリングしてリンクする。
+    """
     profile = settings.profiles[profile_index]
     print(f"Using profile: {profile.name}")
     
     # CLI引数を優先し、指定がなければプロファイルから取得
-    # 共通パスとプロファイルパスを結合
     if not output_path:
-        common_path = settings.common_output_path
-        profile_path = profile.output_path
-        
-        # 共通パスと相対パスを組み合わせる
-        if common_path.startswith("//") and profile_path.startswith("//"):
-            # 両方が相対パスの場合、common_pathの「//」を削除してから結合
-            output_path = common_path[2:] + profile_path[2:]
-            # 先頭に「//」を付け直す
-            output_path = "//" + output_path
-        else:
-            # どちらかが絶対パスの場合は単純に結合
-            output_path = os.path.join(common_path, 
-                                 profile_path[2:] if profile_path.startswith("//") else profile_path)
+        output_path = resolve_output_path(settings.common_output_path, profile.output_path)
     
-    final_start_frame = int(start_frame) if start_frame else profile.start_frame
-    final_end_frame = int(end_frame) if end_frame else profile.end_frame
+    final_start_frame = start_frame if start_frame is not None else profile.start_frame
+    final_end_frame = end_frame if end_frame is not None else profile.end_frame
     final_camera_name = camera_name if camera_name else profile.camera_name
     
     # カメラ設定
@@ -1163,23 +4548,236 @@ def render_from_cli():
             scene.camera = bpy.data.objects[available_cameras[0]]
         else:
             print("No camera found in the scene, cannot render")
-            return
+            return False
+    
+    # ドラフトは別フォルダに出力（最終版の出力やMP4を上書きしない）
+    if draft:
+        output_path = draft_output_path(output_path)
+        stream_mp4 = False
     
     # 出力パス設定
     scene.render.filepath = output_path
     print(f"Output path: {output_path}")
     
-    # フレーム範囲設定
-    scene.frame_start = final_start_frame
-    scene.frame_end = final_end_frame
+    # フレーム範囲
     print(f"Frame range: {final_start_frame} - {final_end_frame}")
     
-    # レンダリング実行
+    # レンダリング中のMP4逐次エンコード（render_writeハンドラで通知し、監視スレッドがフレームを送る）
+    encoder = None
+    if stream_mp4 and shared:
+        # 他のマシンがレンダリングしたフレームの完成を待てないので逐次エンコードはしない
+        print("Warning: --stream-mp4 is ignored in shared mode")
+    elif stream_mp4 and progressive > 1:
+        # フレームが順番に書き出されないので逐次エンコードはできない
+        print("Warning: --stream-mp4 is ignored with --progressive")
+    elif stream_mp4:
+        encoder = create_streaming_encoder(scene, settings, profile, output_path,
+                                           final_start_frame, final_end_frame)
+        def on_render_write(scene, *args):
+            encoder.notify(scene.render.frame_path(frame=scene.frame_current))
+        bpy.app.handlers.render_write.append(on_render_write)
+        encoder.watch()
+    
+    # レンダリング実行（フレームごとの時間を出力先のrender_timing.jsonlに記録）
     print("Starting render...")
-    bpy.ops.render.render(animation=True)
+    # 準備（キャッシュのハッシュ計算など）の間はスーパーバイザーが長いタイムアウトを使う
+    print(f"{PREPARE_PREFIX}{profile.name}", flush=True)
+    draft_state = None
+    if draft:
+        draft_state = apply_draft_overrides(scene, profile)
+        print(f"Draft: {profile.draft_resolution_percentage}% resolution, {profile.draft_samples} samples, "
+              f"every {profile.draft_frame_step} frame(s)")
+    # 複数プロファイルの実行で呼び出し側が計測中の場合はその計測に追加する
+    owns_timing = _frame_timing is None
+    if owns_timing:
+        start_frame_timing()
+    set_frame_timing_target(profile.name, scene.camera.name, output_path)
+    for handlers, handler in _progress_handlers:
+        handlers.append(handler)
+    try:
+        if shared:
+            if progressive > 1:
+                print("Warning: --progressive is ignored in shared mode")
+            render_frames_shared(scene, final_start_frame, final_end_frame,
+                                 shared["chunk_size"], shared["stale_seconds"], resume=resume)
+        else:
+            render_frames(scene, final_start_frame, final_end_frame, resume=resume, progressive=progressive,
+                          cache_mode=cache_mode, static_spans=static_spans)
+    finally:
+        for handlers, handler in _progress_handlers:
+            handlers.remove(handler)
+        records = stop_frame_timing() if owns_timing else list(_frame_timing["records"])
+        if draft_state is not None:
+            restore_draft_overrides(draft_state)
+        if encoder is not None:
+            bpy.app.handlers.render_write.remove(on_render_write)
+            encoder.finish(wait=True)
     print("Render complete!")
+    summary = summarize_timings(records).get(profile.name)
+    if summary:
+        peak = f", peak {summary['peak_mem_mb']:.0f} MB" if summary["peak_mem_mb"] is not None else ""
+        print(f"Rendered {summary['frames']} frames in {format_duration(summary['total_s'])} "
+              f"({summary['avg_s']:.2f} s/frame{peak})")
+    return True
+
+def render_worker_cli(scene, settings, url, resume=False):
+    """コーディネーターからフレームチャンクを借りてレンダリングするワーカーのループ
+
+    レンダリング中はフレームごと（render_post）と一定間隔のスレッドからハートビートを送り、
+    リースが切れて他のワーカーにチャンクが渡らないようにする。
+    """
+    import socket
+    
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    print(f"Worker {worker} connecting to {url}")
+    original_state = save_render_state(scene)
+    rendered = 0
+    failed = 0
+    
+    while True:
+        try:
+            reply = coordinator_request(url, "/lease", {"worker": worker})
+        except OSError as e:
+            print(f"Coordinator unreachable ({e}), stopping worker")
+            return failed == 0
+        if reply.get("done"):
+            break
+        if "wait" in reply:
+            time.sleep(reply["wait"])
+            continue
+        
+        chunk = reply["chunk"]
+        lease_id = chunk["lease_id"]
+        if not 0 <= chunk["profile_index"] < len(settings.profiles):
+            print(f"Profile index {chunk['profile_index']} is out of range in this .blend")
+            failed += 1
+            try:
+                coordinator_request(url, "/complete", {"lease_id": lease_id, "ok": False})
+            except OSError as e:
+                print(f"Could not report {chunk['name']} to the coordinator: {e}")
+            continue
+        
+        def send_heartbeat(*args):
+            try:
+                coordinator_request(url, "/heartbeat", {"lease_id": lease_id}, timeout=10.0)
+            except OSError as e:
+                print(f"Heartbeat failed: {e}")
+        
+        # 1フレームがリース期間より長い場合に備えてスレッドからも送る
+        stop = threading.Event()
+        def heartbeat_loop():
+            while not stop.wait(reply["lease_seconds"] / 3):
+                send_heartbeat()
+        heartbeat_thread = threading.Thread(target=heartbeat_loop, daemon=True)
+        heartbeat_thread.start()
+        bpy.app.handlers.render_post.append(send_heartbeat)
+        
+        print(f"Leased {chunk['name']} ({chunk['start']}-{chunk['end']})")
+        try:
+            ok = render_profile_cli(scene, settings, chunk["profile_index"],
+                                    output_path=chunk["output_path"],
+                                    start_frame=chunk["start"],
+                                    end_frame=chunk["end"],
+                                    camera_name=chunk["camera"],
+                                    resume=resume,
+                                    draft=chunk.get("draft", False))
+        except Exception as e:
+            print(f"Error rendering {chunk['name']}: {e}")
+            ok = False
+        finally:
+            bpy.app.handlers.render_post.remove(send_heartbeat)
+            stop.set()
+            heartbeat_thread.join()
+            restore_render_state(scene, original_state)
+        
+        if ok:
+            rendered += 1
+        else:
+            failed += 1
+        try:
+            coordinator_request(url, "/complete", {"lease_id": lease_id, "ok": ok})
+        except OSError as e:
+            print(f"Could not report {chunk['name']} to the coordinator: {e}")
+    
+    print(f"Worker finished: {rendered} chunks rendered, {failed} failed")
+    return failed == 0
+
+# コマンドラインからの実行をサポートする関数
+def render_from_cli():
+    # バックグラウンドモードでは bpy.context.scene ではなく bpy.data.scenes[0] を使用
+    scene = bpy.data.scenes[0]
+    args = parse_cli_args(sys.argv)
+    
+    # プロファイルの有効性チェック
+    settings = scene.multi_render_settings
+    if len(settings.profiles) == 0:
+        print("No render profiles defined, cannot render")
+        return False
+    
+    # ワーカーモード: コーディネーターが配るチャンクがなくなるまでレンダリング
+    if args["worker"]:
+        return render_worker_cli(scene, settings, args["worker"], resume=args["resume"])
+    
+    # 複数プロファイルモード: .blendの読み込みは1回だけで、プロファイルを順番にレンダリング
+    if args["profiles"] is not None:
+        indices = resolve_profile_indices(settings, args["profiles"])
+        if not indices:
+            print("No profiles to render")
+            return False
+        if args["output_path"] or args["start"] is not None or args["end"] is not None or args["camera"]:
+            print("Warning: -o/-s/-e and the camera argument are ignored when rendering multiple profiles")
+        
+        original_state = save_render_state(scene)
+        persistent_data = None
+        if args["persistent_data"]:
+            ordered = order_profiles_for_reuse([(i, settings.profiles[i]) for i in indices])
+            indices = [profile_index for profile_index, profile in ordered]
+            persistent_data = scene.render.use_persistent_data
+            scene.render.use_persistent_data = True
+            start_frame_timing()
+        failed = []
+        for count, profile_index in enumerate(indices):
+            print(f"Rendering profile {count + 1}/{len(indices)} (index {profile_index})")
+            try:
+                if not render_profile_cli(scene, settings, profile_index, resume=args["resume"],
+                                          stream_mp4=args["stream_mp4"], shared=args["shared"],
+                                          draft=args["draft"], progressive=args["progressive"],
+                                          cache_mode=args["cache"], static_spans=args["static_spans"]):
+                    failed.append(profile_index)
+            finally:
+                # 次のプロファイルに前の設定が残らないように元の設定に戻す
+                restore_render_state(scene, original_state)
+        
+        if persistent_data is not None:
+            scene.render.use_persistent_data = persistent_data
+            report_sync_savings(stop_frame_timing())
+        if failed:
+            print(f"Failed profiles: {failed}")
+        print(f"Rendered {len(indices) - len(failed)}/{len(indices)} profiles")
+        return not failed
+    
+    profile_index = args["profile_index"]
+    if profile_index >= len(settings.profiles):
+        print(f"Profile index {profile_index} is out of range, using first profile")
+        profile_index = 0
+    
+    return render_profile_cli(scene, settings, profile_index,
+                              output_path=args["output_path"],
+                              start_frame=args["start"],
+                              end_frame=args["end"],
+                              camera_name=args["camera"],
+                              resume=args["resume"],
+                              stream_mp4=args["stream_mp4"],
+                              shared=args["shared"],
+                              draft=args["draft"],
+                              progressive=args["progressive"],
+                              cache_mode=args["cache"],
+                              static_spans=args["static_spans"])
 
 
+# CLI実行の結果（-P で実行された場合の終了コードに使用）
+_cli_render_ok = True
+
 # アドオンの登録関数
 classes = (
     RenderSettingsItem,
@@ -1194,19 +4792,29 @@ classes = (
     RENDER_OT_set_active_camera_from_profile,
     RENDER_OT_render_with_profile,
     RENDER_OT_render_all_profiles,
+    RENDER_OT_render_parallel,
     RENDER_OT_toggle_system_console,
     RENDER_OT_export_batch_file,
     RENDER_OT_convert_to_mp4,
+    RENDER_OT_cancel_mp4_job,
+    RENDER_OT_clear_mp4_jobs,
     RENDER_OT_export_mp4_batch,
 )
 
 def register():
+    global _cli_render_ok
     for cls in classes:
         bpy.utils.register_class(cls)
     
     # シーンにプロパティを追加
     bpy.types.Scene.multi_render_settings = PointerProperty(type=RenderSettingsProperties)
     
+    # パネル描画用キャッシュの無効化ハンドラ
+    bpy.app.handlers.load_post.append(_on_load_post)
+    bpy.app.handlers.undo_post.append(_on_load_post)
+    bpy.app.handlers.redo_post.append(_on_load_post)
+    bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update_post)
+    
     # コマンドラインから実行された場合
     if bpy.app.background:
         # セットアップが完了するまで少し待機
@@ -1214,14 +4822,25 @@ def register():
         time.sleep(0.5)
         # 別の方法でCLI実行を処理
         try:
-            render_from_cli()
+            _cli_render_ok = render_from_cli()
         except Exception as e:
             print(f"Error during CLI rendering: {e}")
+            _cli_render_ok = False
 
 def unregister():
     # コマンドラインから実行した場合は何もしない
     if bpy.app.background:
         return
+    
+    bpy.app.handlers.load_post.remove(_on_load_post)
+    bpy.app.handlers.undo_post.remove(_on_load_post)
+    bpy.app.handlers.redo_post.remove(_on_load_post)
+    bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update_post)
+    
+    # 実行中のMP4変換を停止
+    _mp4_queue.cancel()
+    if bpy.app.timers.is_registered(_mp4_progress_timer):
+        bpy.app.timers.unregister(_mp4_progress_timer)
         
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
@@ -1231,3 +4850,6 @@ def unregister():
 # スクリプトとして実行された場合（CLIから）
 if __name__ == "__main__":
     register()
+    # 失敗した場合は終了コードで呼び出し元（並列ランナーなど）に知らせる
+    if bpy.app.background and not _cli_render_ok:
+        sys.exit(1)
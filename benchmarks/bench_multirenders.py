@@ -0,0 +1,124 @@
+"""MultiRenders.pyのヘッドレスベンチマーク
+
+Blenderを起動せずにbpyの代用品（bpy_stub.py）の上で、バッチファイル書き出し、
+MP4バッチ書き出し、出力パスの結合、render_from_cliの引数処理、パネルの描画を
+プロファイル数ごとに計測し、結果をJSONで出力する。
+
+    python benchmarks/bench_multirenders.py --profiles 10 1000 10000 --output bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+import bpy_stub  # noqa: E402
+
+
+def measure(func, repeat):
+    """funcをrepeat回実行し、最小・平均の実行時間（秒）を返す"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"min_s": min(timings), "mean_s": sum(timings) / len(timings), "repeat": repeat}
+
+
+def run(profile_counts, repeat, draw_repeat):
+    bpy = bpy_stub.install()
+    import MultiRenders as mr
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix="multirenders_bench_")
+    bpy.data.filepath = os.path.join(workdir, "scene.blend")
+
+    for count in profile_counts:
+        context = bpy_stub.make_context(bpy, mr, count)
+        settings = context.scene.multi_render_settings
+
+        def export_batch():
+            op = mr.RENDER_OT_export_batch_file()
+            op.filepath = os.path.join(workdir, "render")
+            op.execute(context)
+
+        def export_mp4_batch():
+            op = mr.RENDER_OT_export_mp4_batch()
+            op.filepath = os.path.join(workdir, "mp4_convert")
+            op.execute(context)
+
+        def resolve_paths():
+            for profile in settings.profiles:
+                mr.resolve_output_path(settings.common_output_path, profile.output_path)
+
+        argv = ["blender", "-b", bpy.data.filepath, "-P", mr.SCRIPT_PATH, "--", "--profiles", "all"]
+
+        def cli_arguments():
+            args = mr.parse_cli_args(argv)
+            mr.resolve_profile_indices(settings, args["profiles"])
+
+        def cli_render_all():
+            saved_argv = sys.argv
+            sys.argv = argv
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    mr.render_from_cli()
+            finally:
+                sys.argv = saved_argv
+
+        def panel_draw():
+            panel = mr.RENDER_PT_multi_settings_manager()
+            for _ in range(draw_repeat):
+                panel.draw(context)
+
+        benchmarks = [
+            ("export_batch_file", export_batch),
+            ("export_mp4_batch", export_mp4_batch),
+            ("resolve_output_path", resolve_paths),
+            ("cli_argument_handling", cli_arguments),
+            ("render_from_cli_all_profiles", cli_render_all),
+            (f"panel_draw_x{draw_repeat}", panel_draw),
+        ]
+        for name, func in benchmarks:
+            result = {"benchmark": name, "profiles": count}
+            result.update(measure(func, repeat))
+            results.append(result)
+            print(f"{name:>30} {count:>6} profiles: {result['min_s'] * 1000:9.2f} ms", file=sys.stderr)
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmarks for MultiRenders.py")
+    parser.add_argument("--profiles", type=int, nargs="+", default=[10, 1000, 10000],
+                        help="Profile counts to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per benchmark (the minimum is reported)")
+    parser.add_argument("--draw-repeat", type=int, default=100, help="Panel redraws per measurement")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = run(args.profiles, args.repeat, args.draw_repeat)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+"""Blenderの外でMultiRenders.pyを読み込むための軽量なbpyの代用品
+
+ベンチマークに必要な範囲（プロパティ定義、オペレータ/パネルの基底クラス、
+bpy.data、シーンのレンダリング設定、UIレイアウト）だけを再現する。
+install()でsys.modulesに登録してからMultiRenders.pyをimportする。
+"""
+
+import os
+import sys
+import types
+
+
+class _StubBase:
+    """PropertyGroup/Operator/Panel/UIListの基底クラス"""
+
+    def __init__(self):
+        self.reports = []
+        self.layout = Layout()
+
+    def report(self, level, message):
+        self.reports.append((tuple(level), message))
+
+
+def _property(**kwargs):
+    # アノテーションとして使われるだけなので引数をそのまま保持する
+    return ("property", kwargs)
+
+
+def persistent(func):
+    return func
+
+
+class Layout:
+    """UILayoutの代用品。呼び出し回数だけを数える"""
+
+    def __init__(self, counter=None):
+        self.counter = counter if counter is not None else {"calls": 0}
+        self.enabled = True
+        self.scale_y = 1.0
+        self.alignment = 'EXPAND'
+
+    def _child(self, *args, **kwargs):
+        self.counter["calls"] += 1
+        return Layout(self.counter)
+
+    row = column = box = split = _child
+
+    def _leaf(self, *args, **kwargs):
+        self.counter["calls"] += 1
+
+    label = prop = prop_search = separator = template_list = progress = _leaf
+
+    def operator(self, *args, **kwargs):
+        self.counter["calls"] += 1
+        return types.SimpleNamespace()
+
+
+class IDCollection(list):
+    """bpy.data.objectsなどの名前で引けるコレクション"""
+
+    def __init__(self, items=()):
+        super().__init__(items)
+        self._by_name = {item.name: item for item in self}
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._by_name[key]
+        return super().__getitem__(key)
+
+    def get(self, name, default=None):
+        return self._by_name.get(name, default)
+
+
+class ProfileCollection(list):
+    """CollectionPropertyの代用品"""
+
+    def __init__(self, item_type):
+        super().__init__()
+        self.item_type = item_type
+
+    def add(self):
+        item = self.item_type()
+        self.append(item)
+        return item
+
+    def remove(self, index):
+        del self[index]
+
+    def move(self, src, dst):
+        self.insert(dst, self.pop(src))
+
+
+class Object:
+    def __init__(self, name, type='MESH'):
+        self.name = name
+        self.type = type
+
+
+class ImageSettings:
+    file_format = 'PNG'
+
+
+class RenderSettings:
+    """scene.renderの代用品。frame_path()はBlenderと同じく####を桁数に合わせて置き換える"""
+
+    def __init__(self, data):
+        self._data = data
+        self.filepath = "//"
+        self.fps = 24
+        self.fps_base = 1.0
+        self.image_settings = ImageSettings()
+        self.use_file_extension = True
+        self.engine = 'CYCLES'
+        self.resolution_x = 1920
+        self.resolution_y = 1080
+        self.resolution_percentage = 100
+        self.use_simplify = False
+        self.use_persistent_data = False
+        self.use_placeholder = False
+        self.use_overwrite = True
+
+    def frame_path(self, frame=0):
+        path = self._data.path_abspath(self.filepath)
+        extension = ".png" if self.use_file_extension else ""
+        if "#" in path:
+            head, _, rest = path.partition("#")
+            padding = 1 + len(rest) - len(rest.lstrip("#"))
+            return f"{head}{frame:0{padding}d}{rest.lstrip('#')}{extension}"
+        return f"{path}{frame:04d}{extension}"
+
+
+class Scene:
+    def __init__(self, data, settings):
+        self.name = "Scene"
+        self.render = RenderSettings(data)
+        self.frame_start = 1
+        self.frame_end = 250
+        self.frame_current = 1
+        self.frame_step = 1
+        self.camera = None
+        self.cycles = types.SimpleNamespace(samples=4096, use_denoising=False)
+        self.eevee = types.SimpleNamespace(taa_render_samples=64)
+        self.multi_render_settings = settings
+
+    def frame_set(self, frame):
+        self.frame_current = frame
+
+
+class Data:
+    def __init__(self):
+        self.filepath = ""
+        self.is_dirty = False
+        self.objects = IDCollection()
+        self.libraries = IDCollection()
+        self.scenes = []
+
+    def path_abspath(self, path):
+        if path.startswith("//"):
+            return os.path.join(os.path.dirname(self.filepath), path[2:])
+        return path
+
+
+class _Ops:
+    """bpy.ops.render.render()などの呼び出しを数えるだけの代用品"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, category):
+        ops = self
+
+        class _Category:
+            def __getattr__(self, name):
+                def call(*args, **kwargs):
+                    ops.calls.append((f"{category}.{name}", args, kwargs))
+                    return {'FINISHED'}
+                return call
+
+        return _Category()
+
+
+def install(blend_filepath="/tmp/bench/scene.blend"):
+    """sys.modulesにbpyの代用品を登録し、bpyモジュールを返す"""
+    bpy = types.ModuleType("bpy")
+    props = types.ModuleType("bpy.props")
+    for name in ("StringProperty", "IntProperty", "FloatProperty", "BoolProperty", "EnumProperty",
+                 "PointerProperty", "CollectionProperty"):
+        setattr(props, name, _property)
+
+    app = types.ModuleType("bpy.app")
+    handlers = types.ModuleType("bpy.app.handlers")
+    handlers.persistent = persistent
+    for name in ("load_post", "undo_post", "redo_post", "depsgraph_update_post", "render_init", "render_pre",
+                 "render_post", "render_write", "render_stats", "render_complete", "render_cancel"):
+        setattr(handlers, name, [])
+    app.handlers = handlers
+    app.background = False
+    app.binary_path = "/usr/bin/blender"
+    app.version = (3, 6, 0)
+    app.timers = types.SimpleNamespace(register=lambda *a, **k: None,
+                                       unregister=lambda *a, **k: None,
+                                       is_registered=lambda *a, **k: False)
+
+    data = Data()
+    data.filepath = blend_filepath
+
+    bpy.props = props
+    bpy.app = app
+    bpy.data = data
+    bpy.ops = _Ops()
+    bpy.path = types.SimpleNamespace(abspath=data.path_abspath)
+    bpy.utils = types.SimpleNamespace(register_class=lambda cls: None, unregister_class=lambda cls: None)
+    bpy.types = types.SimpleNamespace(PropertyGroup=_StubBase, Operator=_StubBase, Panel=_StubBase,
+                                      UIList=_StubBase, Scene=types.SimpleNamespace, Object=Object)
+    bpy.context = None
+
+    sys.modules["bpy"] = bpy
+    sys.modules["bpy.props"] = props
+    sys.modules["bpy.app"] = app
+    sys.modules["bpy.app.handlers"] = handlers
+    return bpy
+
+
+def make_context(bpy, module, profile_count, object_count=1000):
+    """profile_count個のプロファイルを持つシーンとコンテキストを作成する
+
+    プロファイルのプロパティはMultiRenders.pyのアノテーションのdefaultで初期化する。
+    """
+    def defaults(cls):
+        values = {}
+        for name, annotation in getattr(cls, "__annotations__", {}).items():
+            if isinstance(annotation, tuple) and annotation[0] == "property":
+                values[name] = annotation[1].get("default")
+        return values
+
+    item_defaults = defaults(module.RenderSettingsItem)
+    settings_defaults = defaults(module.RenderSettingsProperties)
+
+    def make_item():
+        item = types.SimpleNamespace(**item_defaults)
+        return item
+
+    settings = types.SimpleNamespace(**settings_defaults)
+    settings.profiles = ProfileCollection(make_item)
+    settings.common_output_path = "//renders/"
+
+    camera_count = max(1, profile_count // 10)
+    objects = [Object(f"Camera.{i:03d}", 'CAMERA') for i in range(camera_count)]
+    objects += [Object(f"Mesh.{i:05d}") for i in range(object_count)]
+    bpy.data.objects = IDCollection(objects)
+
+    for i in range(profile_count):
+        profile = settings.profiles.add()
+        profile.name = f"Profile {i}"
+        profile.output_path = f"//shot_{i:05d}/frame_####"
+        profile.start_frame = 1
+        profile.end_frame = 100
+        profile.camera_name = f"Camera.{i % camera_count:03d}"
+        profile.is_expanded = True
+
+    scene = Scene(bpy.data, settings)
+    bpy.data.scenes = [scene]
+    window_manager = types.SimpleNamespace(windows=[])
+    context = types.SimpleNamespace(scene=scene, window_manager=window_manager, window=None)
+    bpy.context = context
+    return context
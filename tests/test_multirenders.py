@@ -0,0 +1,656 @@
+"""MultiRenders.pyの純粋な関数とバッチ書き出しの動作テスト
+
+ベンチマークと同じbpyの代用品（benchmarks/bpy_stub.py）の上で実行する。
+
+    python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+import unittest.mock
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, ROOT)
+
+import bpy_stub  # noqa: E402
+
+bpy = bpy_stub.install()
+import MultiRenders as mr  # noqa: E402
+
+
+class SplitFrameRangeTest(unittest.TestCase):
+    def test_fixed_size(self):
+        self.assertEqual(mr.split_frame_range(1, 25, chunk_size=10), [(1, 10), (11, 20), (21, 25)])
+
+    def test_count_sizes_differ_by_at_most_one(self):
+        chunks = mr.split_frame_range(1, 10, chunk_count=3)
+        self.assertEqual(chunks, [(1, 4), (5, 7), (8, 10)])
+
+    def test_count_larger_than_range(self):
+        self.assertEqual(mr.split_frame_range(5, 6, chunk_count=4), [(5, 5), (6, 6)])
+
+    def test_whole_range_and_empty_range(self):
+        self.assertEqual(mr.split_frame_range(1, 100), [(1, 100)])
+        self.assertEqual(mr.split_frame_range(10, 9, chunk_size=5), [])
+
+
+class AlignChunksToStepTest(unittest.TestCase):
+    def test_chunks_follow_the_profile_grid(self):
+        chunks = mr.align_chunks_to_step(mr.split_frame_range(1, 30, chunk_size=10), 1, 4)
+        frames = [f for start, end in chunks for f in range(start, end + 1, 4)]
+        self.assertEqual(frames, list(range(1, 31, 4)))
+
+    def test_drops_chunks_without_a_grid_frame(self):
+        self.assertEqual(mr.align_chunks_to_step([(1, 4), (6, 7), (8, 9)], 1, 4), [(1, 4), (9, 9)])
+
+
+class AssignLanesTest(unittest.TestCase):
+    def test_least_loaded_lane(self):
+        self.assertEqual(mr.assign_lanes([8, 4, 3, 2, 1], 2), [0, 1, 1, 1, 0])
+        self.assertEqual(mr.estimate_makespan([8, 4, 3, 2, 1], 2), 9)
+
+    def test_chunk_lanes_follow_costs(self):
+        # 1つのチャンクだけ重い場合、そのチャンクの列には他のチャンクを積まない
+        plan = [(0, None, 1, 10, 100.0)] + [(1, None, s, s + 9, 10.0) for s in range(1, 100, 10)]
+        lanes = mr.plan_chunk_lanes(plan, 2)
+        heavy = lanes[(0, 1, 10)]
+        self.assertEqual([key for key, lane in lanes.items() if lane == heavy], [(0, 1, 10)])
+
+    def test_chunks_without_history_use_frame_counts(self):
+        plan = [(0, None, 1, 30, None), (1, None, 1, 10, None), (2, None, 1, 10, None), (3, None, 1, 10, None)]
+        lanes = mr.plan_chunk_lanes(plan, 2)
+        self.assertNotIn(lanes[(0, 1, 30)], {lanes[(1, 1, 10)], lanes[(2, 1, 10)], lanes[(3, 1, 10)]})
+
+
+class PlanBalancedChunksTest(unittest.TestCase):
+    def test_costly_profile_gets_more_chunks_in_lpt_order(self):
+        ranges = [{"key": "hero", "start": 1, "end": 100, "frame_cost": 10.0, "fallback": [(1, 100)]},
+                  {"key": "wide", "start": 1, "end": 100, "frame_cost": 1.0, "fallback": [(1, 100)]}]
+        tasks = mr.plan_balanced_chunks(ranges, workers=2)
+        costs = [task["cost"] for task in tasks]
+        self.assertEqual(costs, sorted(costs, reverse=True))
+        self.assertAlmostEqual(sum(costs), 1100.0)
+        hero = sorted((task["start"], task["end"]) for task in tasks if task["key"] == "hero")
+        self.assertGreater(len(hero), 1)
+        self.assertEqual(mr.frames_to_ranges([f for start, end in hero for f in range(start, end + 1)]), [(1, 100)])
+        # LPTの順で2ワーカーに割り当てると、全体の時間は理想（合計の半分）に近い
+        self.assertLess(mr.estimate_makespan(costs, 2), 1100.0 / 2 * 1.2)
+
+    def test_profiles_without_history_use_fallback_and_median_cost(self):
+        ranges = [{"key": "measured", "start": 1, "end": 10, "frame_cost": 2.0, "fallback": [(1, 10)]},
+                  {"key": "new", "start": 1, "end": 20, "frame_cost": None, "fallback": [(1, 10), (11, 20)]}]
+        tasks = mr.plan_balanced_chunks(ranges, workers=1)
+        new = sorted((task["start"], task["end"], task["cost"]) for task in tasks if task["key"] == "new")
+        self.assertEqual(new, [(1, 10, 20.0), (11, 20, 20.0)])
+
+
+class ProgressivePassesTest(unittest.TestCase):
+    def test_every_frame_once_coarsest_first(self):
+        passes = mr.progressive_passes(0, 40, coarsest=16)
+        self.assertEqual(passes[0], (16, [0, 16, 32]))
+        frames = [f for pass_step, pass_frames in passes for f in pass_frames]
+        self.assertEqual(sorted(frames), list(range(0, 41)))
+        self.assertEqual(len(frames), len(set(frames)))
+
+    def test_respects_frame_step(self):
+        passes = mr.progressive_passes(1, 20, coarsest=4, step=2)
+        frames = sorted(f for pass_step, pass_frames in passes for f in pass_frames)
+        self.assertEqual(frames, list(range(1, 21, 2)))
+        self.assertEqual(passes[0][0], 8)
+
+
+class FindStaticSpansTest(unittest.TestCase):
+    def test_runs_of_equal_digests(self):
+        digests = [(1, "a"), (2, "a"), (3, "a"), (4, "b"), (5, "c"), (6, "c")]
+        self.assertEqual(mr.find_static_spans(digests), [(1, [2, 3]), (5, [6])])
+
+    def test_no_spans_and_non_adjacent_repeats(self):
+        self.assertEqual(mr.find_static_spans([(1, "a"), (2, "b"), (3, "a")]), [])
+        self.assertEqual(mr.find_static_spans([]), [])
+
+
+class PlanThreadSlotsTest(unittest.TestCase):
+    NODES = [[0, 1, 2, 3], [4, 5, 6, 7]]
+    CPUS = list(range(8))
+
+    def test_none_mode(self):
+        self.assertIsNone(mr.plan_thread_slots(4, 'NONE', cpus=self.CPUS, nodes=self.NODES))
+
+    def test_throughput_splits_cores_within_nodes(self):
+        slots = mr.plan_thread_slots(4, 'THROUGHPUT', cpus=self.CPUS, nodes=self.NODES)
+        self.assertEqual([slot["cpus"] for slot in slots], [[0, 1], [2, 3], [4, 5], [6, 7]])
+        self.assertEqual([slot["threads"] for slot in slots], [2, 2, 2, 2])
+
+    def test_latency_one_worker_per_node(self):
+        slots = mr.plan_thread_slots(8, 'LATENCY', cpus=self.CPUS, nodes=self.NODES)
+        self.assertEqual(slots, [{"threads": 4, "cpus": [0, 1, 2, 3]}, {"threads": 4, "cpus": [4, 5, 6, 7]}])
+
+    def test_workers_capped_by_cpus(self):
+        slots = mr.plan_thread_slots(16, 'THROUGHPUT', cpus=[0, 1, 2], nodes=[[0, 1, 2]])
+        self.assertEqual(len(slots), 3)
+
+
+class ClaimChunkLockTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.lock_path, self.done_path = mr.chunk_lock_paths(os.path.join(self.directory.name, "frame_####"),
+                                                             1, 10)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_only_one_claim_succeeds(self):
+        self.assertTrue(mr.claim_chunk_lock(self.lock_path, 60, owner="a"))
+        self.assertFalse(mr.claim_chunk_lock(self.lock_path, 60, owner="b"))
+
+    def test_release_writes_done_marker(self):
+        self.assertTrue(mr.claim_chunk_lock(self.lock_path, 60, owner="a"))
+        self.assertTrue(mr.release_chunk_lock(self.lock_path, self.done_path, owner="a"))
+        self.assertFalse(os.path.exists(self.lock_path))
+        self.assertTrue(os.path.exists(self.done_path))
+
+    def test_taken_over_lock_is_not_released(self):
+        self.assertTrue(mr.claim_chunk_lock(self.lock_path, 60, owner="a"))
+        old = time.time() - 120
+        os.utime(self.lock_path, (old, old))
+        self.assertTrue(mr.claim_chunk_lock(self.lock_path, 60, owner="b"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertFalse(mr.release_chunk_lock(self.lock_path, self.done_path, owner="a"))
+        self.assertTrue(os.path.exists(self.lock_path))
+        self.assertFalse(os.path.exists(self.done_path))
+
+    def test_stale_lock_is_taken_over(self):
+        self.assertTrue(mr.claim_chunk_lock(self.lock_path, 60, owner="a"))
+        old = time.time() - 120
+        os.utime(self.lock_path, (old, old))
+        self.assertTrue(mr.claim_chunk_lock(self.lock_path, 60, owner="b"))
+        self.assertTrue(os.path.exists(self.lock_path))
+        self.assertEqual([name for name in os.listdir(self.directory.name) if ".stale." in name], [])
+
+
+class RenderFramesSharedTest(unittest.TestCase):
+    def test_slow_frame_keeps_the_lock(self):
+        context = bpy_stub.make_context(bpy, mr, 1, object_count=0)
+        scene = context.scene
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        scene.render.filepath = os.path.join(directory.name, "f_####")
+        lock_path, done_path = mr.chunk_lock_paths(scene.render.filepath, 1, 2)
+        stolen = []
+
+        def render(animation=True):
+            for frame in range(scene.frame_start, scene.frame_end + 1):
+                # 1フレームがロックの期限より長くかかる間に他のマシンが奪おうとする
+                time.sleep(0.3)
+                stolen.append(mr.claim_chunk_lock(lock_path, 0.2, owner="other"))
+                with open(scene.render.frame_path(frame=frame), 'w') as f:
+                    f.write("frame")
+
+        self.addCleanup(setattr, bpy, "ops", bpy.ops)
+        bpy.ops = types.SimpleNamespace(render=types.SimpleNamespace(render=render))
+        rendered = mr.render_frames_shared(scene, 1, 2, chunk_size=2, stale_seconds=0.2, log=lambda m: None)
+        self.assertEqual((rendered, stolen), (1, [False, False]))
+        self.assertFalse(os.path.exists(lock_path))
+        self.assertTrue(os.path.exists(done_path))
+
+
+class ParseCliArgsTest(unittest.TestCase):
+    def parse(self, argv):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return mr.parse_cli_args(argv)
+
+    def test_blender_arguments_and_profile(self):
+        args = self.parse(["blender", "-b", "scene.blend", "-o", "//out/f_####", "-s", "5", "-e", "20",
+                           "-P", "MultiRenders.py", "--", "Camera", "2", "--resume", "--cache", "file"])
+        self.assertEqual((args["output_path"], args["start"], args["end"]), ("//out/f_####", 5, 20))
+        self.assertEqual((args["camera"], args["profile_index"]), ("Camera", 2))
+        self.assertTrue(args["resume"])
+        self.assertEqual(args["cache"], 'FILE')
+
+    def test_options(self):
+        args = self.parse(["blender", "--", "--profiles", "0", "3", "--progressive", "--shared",
+                           "--shared-chunk", "0"])
+        self.assertEqual(args["profiles"], ["0", "3"])
+        self.assertEqual(args["progressive"], 16)
+        self.assertEqual(args["shared"]["chunk_size"], 1)
+
+    def test_without_separator(self):
+        args = self.parse(["blender", "-b", "scene.blend"])
+        self.assertEqual((args["camera"], args["profile_index"], args["shared"]), (None, 0, None))
+
+
+class ScanFrameSequencesTest(unittest.TestCase):
+    def scan(self, names):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for name in names:
+            with open(os.path.join(directory.name, name), 'w') as f:
+                f.write("x")
+        return mr.scan_frame_sequences(directory.name)
+
+    def test_gaps_and_padding(self):
+        index = self.scan(["f_0001.png", "f_0002.png", "f_0005.png", "f_0006.png", "notes.txt"])
+        sequence = index["sequences"][("f_", ".png")]
+        self.assertEqual(sequence["frames"], [1, 2, 5, 6])
+        self.assertEqual(sequence["gaps"], [3, 4])
+        self.assertEqual(sequence["padding"], 4)
+        self.assertEqual(index["sizes"]["f_0005.png"], 1)
+
+    def test_sequences_are_kept_apart(self):
+        index = self.scan(["beauty_001.exr", "beauty_002.exr", "beauty_001.png", "mask_01_a.png", "mask_03_a.png"])
+        self.assertEqual(sorted(index["sequences"]), [("beauty_", ".exr"), ("beauty_", ".png"), ("mask_", "_a.png")])
+        self.assertEqual(index["sequences"][("mask_", "_a.png")]["gaps"], [2])
+
+    def test_digits_in_extension_are_not_frame_numbers(self):
+        index = self.scan(["f_0001.jp2", "f_0002.jp2", "f_0004.j2c", "shot.0007", "shot.0008"])
+        self.assertEqual(index["sequences"][("f_", ".jp2")]["frames"], [1, 2])
+        self.assertEqual(index["sequences"][("f_", ".j2c")]["frames"], [4])
+        self.assertEqual(index["sequences"][("shot.", "")]["frames"], [7, 8])
+
+
+class MemoryAdmissionTest(unittest.TestCase):
+    def setUp(self):
+        self.available = 10000.0
+        self.rss = {}
+        patches = [unittest.mock.patch.object(mr, "available_memory_mb", lambda: self.available),
+                   unittest.mock.patch.object(mr, "process_rss_mb", lambda pid: self.rss.get(pid))]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.admission = mr.MemoryAdmission(reserve_mb=2000, log=lambda message: None)
+
+    def job(self, name, mem_mb):
+        job = mr.make_render_job(name, "scene.blend", int(name[-1]))
+        job["mem_mb"] = mem_mb
+        return job
+
+    def test_first_job_always_starts(self):
+        self.available = 100.0
+        self.assertTrue(self.admission.admit(self.job("shot1", 50000), []))
+
+    def test_reserves_growth_of_running_workers(self):
+        # 実行中のワーカーは1000 MBで、ピーク5000 MBまで4000 MB増える見込み → 残りは4000 MB
+        self.rss[101] = 1000.0
+        running = [(101, self.job("shot1", 5000))]
+        self.assertTrue(self.admission.admit(self.job("shot2", 3000), running))
+        self.assertFalse(self.admission.admit(self.job("shot3", 5000), running))
+        self.assertEqual(self.admission.holding, "shot3")
+
+    def test_observed_peak_raises_the_estimate(self):
+        job = self.job("shot1", 1000)
+        self.rss[101] = 3500.0
+        self.admission.observe(job, 101)
+        self.assertEqual(self.admission.estimate(dict(job, mem_mb=None)), 3500.0)
+
+    def test_unknown_free_memory_never_holds(self):
+        self.available = None
+        self.assertTrue(self.admission.admit(self.job("shot2", 50000), [(101, self.job("shot1", 5000))]))
+
+
+class SegmentedMp4CommandsTest(unittest.TestCase):
+    def test_segments_cover_every_frame_once(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        output = os.path.join(directory.name, "shot.mp4")
+        segments, concat_cmd, temp_paths = mr.segmented_mp4_commands(
+            "ffmpeg", os.path.join(directory.name, "f_%04d.png"), 11, 10, 25.0, ["-c:v", "libx264"], output, 3)
+        starts = [int(cmd[cmd.index('-start_number') + 1]) for cmd, frames in segments]
+        counts = [int(cmd[cmd.index('-frames:v') + 1]) for cmd, frames in segments]
+        self.assertEqual((starts, counts), ([11, 15, 18], [4, 3, 3]))
+        self.assertEqual([frames for cmd, frames in segments], counts)
+        self.assertTrue(all('+cgop' in cmd for cmd, frames in segments))
+        self.assertEqual(concat_cmd[-1], output)
+        self.assertIn('copy', concat_cmd)
+        list_path = temp_paths[-1]
+        self.assertEqual(concat_cmd[concat_cmd.index('-i') + 1], list_path)
+        with open(list_path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], "ffconcat version 1.0")
+        self.assertEqual(lines[1:3], ["file '.shot_segment_000.mp4'", "duration 0.160000"])
+        self.assertEqual([os.path.basename(path) for path in temp_paths[:-1]],
+                         [f".shot_segment_{i:03d}.mp4" for i in range(3)])
+
+
+class RenderCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.scene = bpy_stub.make_context(bpy, mr, 1, object_count=0).scene
+        self.scene.render.filepath = os.path.join(self.directory.name, "f_####")
+
+    def render(self, cache, frames, content="frame"):
+        for frame in frames:
+            with open(self.scene.render.frame_path(frame=frame), 'w') as f:
+                f.write(content)
+            mr.record_cached_frame(cache, self.scene, frame)
+        mr.save_render_cache(cache["path"], cache["data"])
+
+    def prepare(self):
+        return mr.prepare_render_cache(self.scene, 1, 4, 'FILE', log=lambda message: None)
+
+    def test_unchanged_frames_are_skipped(self):
+        self.render(self.prepare(), range(1, 5))
+        self.assertEqual(self.prepare()["skip"], {1, 2, 3, 4})
+
+    def test_changed_or_missing_output_is_rendered(self):
+        self.render(self.prepare(), range(1, 5))
+        with open(self.scene.render.frame_path(frame=2), 'w') as f:
+            f.write("truncated")
+        os.remove(self.scene.render.frame_path(frame=3))
+        self.assertEqual(self.prepare()["skip"], {1, 4})
+
+    def test_changed_inputs_invalidate_every_frame(self):
+        self.render(self.prepare(), range(1, 5))
+        self.scene.render.resolution_percentage = 50
+        self.assertEqual(self.prepare()["skip"], set())
+
+    def test_concurrent_writers_are_merged(self):
+        first, second = self.prepare(), self.prepare()
+        self.render(first, [1, 2])
+        self.render(second, [3, 4])
+        self.assertEqual(self.prepare()["skip"], {1, 2, 3, 4})
+
+
+class JobManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        context = bpy_stub.make_context(bpy, mr, 2, object_count=0)
+        self.scene = context.scene
+        self.settings = self.scene.multi_render_settings
+        self.settings.common_output_path = self.directory.name + "/"
+        self.settings.chunk_mode = 'SIZE'
+        self.settings.chunk_size = 40
+        self.settings.profiles[1].start_frame = 101
+        self.settings.profiles[1].end_frame = 120
+
+    def test_profiles_chunks_and_history(self):
+        profile = self.settings.profiles[0]
+        output_path = bpy.path.abspath(mr.resolve_output_path(self.settings.common_output_path, profile.output_path))
+        os.makedirs(os.path.dirname(output_path))
+        with open(mr.timing_log_path(output_path), 'w', encoding='utf-8') as f:
+            for wall_s in (2.0, 4.0):
+                f.write(json.dumps({"profile": profile.name, "camera": profile.camera_name, "frame": 1,
+                                    "wall_s": wall_s, "peak_mem_mb": 1500.0}) + "\n")
+        manifest = mr.build_job_manifest(self.scene, self.settings, list(enumerate(self.settings.profiles)))
+        self.assertEqual(manifest["version"], mr.MANIFEST_VERSION)
+        self.assertEqual(manifest["blend"], bpy.data.filepath)
+        first, second = manifest["profiles"]
+        self.assertEqual(first["chunks"], [[1, 40], [41, 80], [81, 100]])
+        self.assertEqual((second["start"], second["end"], second["chunks"]), (101, 120, [[101, 120]]))
+        self.assertEqual((first["frame_cost"], first["peak_mem_mb"]), (3.0, 1500.0))
+        self.assertEqual((second["frame_cost"], second["peak_mem_mb"]), (None, None))
+        self.assertEqual(first["output_path_abs"], output_path)
+        self.assertEqual(os.path.basename(second["first_frame_path"]), "frame_0101.png")
+
+    def test_runner_jobs_from_manifest(self):
+        manifest = json.loads(json.dumps(
+            mr.build_job_manifest(self.scene, self.settings, list(enumerate(self.settings.profiles)))))
+        jobs = mr.manifest_jobs(manifest, blender_path="blender")
+        self.assertEqual([(job["profile_index"], job["start"], job["end"]) for job in jobs],
+                         [(0, 1, 40), (0, 41, 80), (0, 81, 100), (1, 101, 120)])
+        rechunked = mr.manifest_jobs(manifest, chunk_count=2)
+        self.assertEqual([(job["start"], job["end"]) for job in rechunked],
+                         [(1, 50), (51, 100), (101, 110), (111, 120)])
+
+
+class ChunkCoordinatorTest(unittest.TestCase):
+    def coordinator(self, count=2, lease_seconds=60, max_attempts=2):
+        jobs = [mr.make_render_job(f"Shot [{i * 10 + 1}-{i * 10 + 10}]", "scene.blend", 0, camera_name="Camera",
+                                   output_path="//out/f_####", start_frame=i * 10 + 1, end_frame=i * 10 + 10)
+                for i in range(count)]
+        return mr.ChunkCoordinator(jobs, lease_seconds=lease_seconds, max_attempts=max_attempts,
+                                   log=lambda message: None)
+
+    def test_lease_until_done(self):
+        coordinator = self.coordinator()
+        first = coordinator.lease("a")["chunk"]
+        second = coordinator.lease("b")["chunk"]
+        self.assertEqual((first["start"], second["start"]), (1, 11))
+        self.assertIn("wait", coordinator.lease("c"))
+        self.assertTrue(coordinator.complete(first["lease_id"], True))
+        self.assertTrue(coordinator.complete(second["lease_id"], True))
+        self.assertFalse(coordinator.complete(second["lease_id"], True))
+        self.assertEqual(coordinator.lease("c"), {"done": True})
+        self.assertTrue(coordinator.finished)
+
+    def test_heartbeat_keeps_the_lease(self):
+        coordinator = self.coordinator(count=1, lease_seconds=0.05)
+        lease_id = coordinator.lease("a")["chunk"]["lease_id"]
+        for _ in range(4):
+            time.sleep(0.02)
+            self.assertTrue(coordinator.heartbeat(lease_id))
+        self.assertIn("wait", coordinator.lease("b"))
+
+    def test_expired_lease_is_requeued(self):
+        coordinator = self.coordinator(count=1, lease_seconds=0.01)
+        old = coordinator.lease("a")["chunk"]["lease_id"]
+        time.sleep(0.03)
+        new = coordinator.lease("b")["chunk"]["lease_id"]
+        self.assertNotEqual(old, new)
+        self.assertFalse(coordinator.heartbeat(old))
+        self.assertFalse(coordinator.complete(old, True))
+        self.assertTrue(coordinator.complete(new, True))
+        self.assertTrue(coordinator.finished)
+
+    def test_failed_chunk_is_retried_up_to_max_attempts(self):
+        coordinator = self.coordinator(count=1, max_attempts=2)
+        coordinator.complete(coordinator.lease("a")["chunk"]["lease_id"], False)
+        self.assertEqual(coordinator.chunks[0]["state"], 'QUEUED')
+        coordinator.complete(coordinator.lease("a")["chunk"]["lease_id"], False)
+        self.assertEqual(coordinator.chunks[0]["state"], 'FAILED')
+        self.assertEqual(coordinator.lease("a"), {"done": True})
+
+    def test_expiring_chunk_gives_up_after_max_attempts(self):
+        coordinator = self.coordinator(count=1, lease_seconds=0.01, max_attempts=2)
+        leases = 0
+        while "chunk" in coordinator.lease("a"):
+            leases += 1
+            self.assertLessEqual(leases, 2)
+            time.sleep(0.03)
+        self.assertEqual(coordinator.chunks[0]["state"], 'FAILED')
+        self.assertEqual(coordinator.chunks[0]["attempts"], 2)
+        self.assertTrue(coordinator.finished)
+
+    def test_http_server_with_two_workers(self):
+        coordinator = self.coordinator(count=6)
+        server = mr.serve_coordinator(coordinator, "127.0.0.1", 0)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        rendered = {"w1": [], "w2": []}
+
+        def worker(name):
+            while True:
+                reply = mr.coordinator_request(url, "/lease", {"worker": name}, timeout=5.0)
+                if reply.get("done"):
+                    return
+                if "wait" in reply:
+                    time.sleep(0.01)
+                    continue
+                chunk = reply["chunk"]
+                mr.coordinator_request(url, "/heartbeat", {"lease_id": chunk["lease_id"]}, timeout=5.0)
+                rendered[name].append(chunk["start"])
+                mr.coordinator_request(url, "/complete", {"lease_id": chunk["lease_id"], "ok": True}, timeout=5.0)
+
+        threads = [threading.Thread(target=worker, args=(name,)) for name in rendered]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10.0)
+        self.assertEqual(sorted(rendered["w1"] + rendered["w2"]), [1, 11, 21, 31, 41, 51])
+        self.assertTrue(coordinator.finished)
+        status = json_get(url + "/status")
+        self.assertEqual(status["counts"], {'DONE': 6})
+
+
+def json_get(url):
+    import json
+    import urllib.request
+    with urllib.request.urlopen(url, timeout=5.0) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+# フレームの進捗の行を出力するBlenderの代用品。.blendの名前で動作を変える
+STUB_BLENDER = """\
+import os, sys, time
+argv = sys.argv[1:]
+blend = argv[argv.index("-b") + 1]
+mode = os.path.splitext(os.path.basename(blend))[0]
+resume = "--resume" in argv
+def frame(number, finish=True):
+    path = os.path.join(os.path.dirname(blend), f"f_{number}.png")
+    print(f"MultiRenders: frame start {number} {path}", flush=True)
+    with open(path, "w") as f:
+        f.write("partial")
+    if finish:
+        print(f"MultiRenders: frame done {number}", flush=True)
+if mode == "hang_once" and not resume:
+    frame(1, finish=False)
+    # 標準出力を開いたままの子プロセス（レンダーファームのラッパーなど）
+    import subprocess
+    subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    time.sleep(30)
+if mode == "crash_once" and not resume:
+    frame(1)
+    frame(2, finish=False)
+    sys.exit(3)
+if mode == "crash":
+    frame(1, finish=False)
+    sys.exit(3)
+for number in (1, 2):
+    frame(number)
+"""
+
+
+class RenderJobPoolWatchdogTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.blender = os.path.join(self.directory.name, "blender")
+        with open(self.blender, 'w') as f:
+            f.write(f"#!{sys.executable}\n" + STUB_BLENDER)
+        os.chmod(self.blender, 0o755)
+        self.messages = []
+
+    def run_pool(self, mode, max_retries):
+        job = mr.make_render_job(mode, os.path.join(self.directory.name, f"{mode}.blend"), 0,
+                                 start_frame=1, end_frame=2, blender_path=self.blender)
+        pool = mr.RenderJobPool([job], 1, log_dir=os.path.join(self.directory.name, "logs"),
+                                log=self.messages.append, frame_timeout=1.0, startup_timeout=1.0,
+                                max_retries=max_retries)
+        started = time.time()
+        exit_code = pool.run(0.05)
+        return pool, exit_code, time.time() - started
+
+    def test_hang_is_killed_and_retried_with_resume(self):
+        pool, exit_code, elapsed = self.run_pool("hang_once", max_retries=1)
+        self.assertEqual(exit_code, 0)
+        self.assertLess(elapsed, 10.0)
+        self.assertTrue(any("no progress" in message for message in self.messages))
+        self.assertTrue(any("attempt 2/2" in message for message in self.messages))
+        self.assertEqual(pool.failures, [])
+
+    def test_crash_is_retried_and_partial_frame_removed(self):
+        removed = []
+        original_retry = mr.RenderJobPool._retry
+
+        def retry(pool, job, reason):
+            result = original_retry(pool, job, reason)
+            removed.append((reason, os.path.exists(os.path.join(self.directory.name, "f_2.png"))))
+            return result
+
+        with unittest.mock.patch.object(mr.RenderJobPool, "_retry", retry):
+            pool, exit_code, elapsed = self.run_pool("crash_once", max_retries=1)
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(removed, [("crashed on frame 2 (exit code 3)", False)])
+
+    def test_retries_exhausted_are_reported(self):
+        pool, exit_code, elapsed = self.run_pool("crash", max_retries=2)
+        self.assertEqual(exit_code, 1)
+        self.assertEqual(len(pool.failures), 1)
+        failure = pool.failures[0]
+        self.assertEqual((failure["attempts"], failure["frame"]), (3, 1))
+        self.assertEqual(failure["reason"], "crashed on frame 1 (exit code 3)")
+        self.assertTrue(os.path.exists(failure["log"]))
+        report = pool.failure_report()
+        self.assertEqual(report["failed_jobs"], 1)
+        self.assertEqual(list(report["profiles"]), ["crash"])
+
+
+class CameraNamesCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.objects = bpy.data.objects
+        bpy.data.objects = bpy_stub.IDCollection([bpy_stub.Object("Camera"), bpy_stub.Object("Cube")])
+        bpy.data.objects[0].type = 'CAMERA'
+        mr.invalidate_camera_cache()
+
+    def tearDown(self):
+        bpy.data.objects = self.objects
+        mr.invalidate_camera_cache()
+
+    def update(self, *ids):
+        depsgraph = types.SimpleNamespace(updates=[types.SimpleNamespace(id=obj) for obj in ids])
+        mr._on_depsgraph_update_post(None, depsgraph)
+
+    def test_delete_camera_and_add_object_with_same_count(self):
+        self.assertEqual(mr.camera_names(), {"Camera"})
+        light = bpy_stub.Object("Light", 'LIGHT')
+        bpy.data.objects = bpy_stub.IDCollection([light, bpy.data.objects["Cube"]])
+        self.update(light)
+        self.assertEqual(mr.camera_names(), set())
+
+    def test_added_and_renamed_cameras(self):
+        self.assertEqual(mr.camera_names(), {"Camera"})
+        camera = bpy_stub.Object("Camera.001", 'CAMERA')
+        bpy.data.objects = bpy_stub.IDCollection(list(bpy.data.objects) + [camera])
+        self.update(camera)
+        self.assertEqual(mr.camera_names(), {"Camera", "Camera.001"})
+        camera.name = "Closeup"
+        bpy.data.objects = bpy_stub.IDCollection(list(bpy.data.objects))
+        self.update(camera)
+        self.assertEqual(mr.camera_names(), {"Camera", "Closeup"})
+
+    def test_unrelated_update_keeps_cache(self):
+        names = mr.camera_names()
+        self.update(bpy.data.objects["Cube"])
+        self.assertIs(mr.camera_names(), names)
+
+
+class ExportBatchFileTest(unittest.TestCase):
+    def export(self, chunk_mode):
+        context = bpy_stub.make_context(bpy, mr, 3)
+        settings = context.scene.multi_render_settings
+        settings.chunk_mode = chunk_mode
+        settings.chunk_size = 10
+        settings.chunk_count = 2
+        settings.write_manifest = True
+        settings.profiles[1].end_frame = settings.profiles[1].start_frame - 1
+        directory = tempfile.mkdtemp()
+        op = mr.RENDER_OT_export_batch_file()
+        op.filepath = os.path.join(directory, "render.sh")
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = op.execute(context)
+        return op, result, directory
+
+    def test_empty_frame_range_is_skipped(self):
+        for chunk_mode in ('NONE', 'SIZE', 'COUNT', 'HISTORY'):
+            with self.subTest(chunk_mode=chunk_mode):
+                op, result, directory = self.export(chunk_mode)
+                self.assertEqual(result, {'FINISHED'})
+                if chunk_mode != 'NONE':
+                    self.assertIn("empty frame range", " ".join(message for kind, message in op.reports))
+                self.assertTrue(os.path.exists(os.path.join(directory, "render.json")))
+
+
+if __name__ == "__main__":
+    unittest.main()